@@ -0,0 +1,73 @@
+"""
+Микробенчмарк поиска в индексе частых вопросов
+
+Индекс на 50000 случайных вопросов: время построения, загрузки с диска,
+добавления и удаления одного вопроса и поиска с numpy и без него.
+Запрос - часть слов одного из вопросов.
+
+Запуск: python benchmarks/bench_faq.py
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from max_bot.utils import faq
+from max_bot.utils.faq import FAQIndex
+
+
+ENTRIES = 50_000
+
+
+def make_questions(count: int):
+    """Случайные вопросы из 4-10 слов"""
+    rng = random.Random(1)
+    alphabet = "абвгдежзиклмнопрстуфхцчшщэюя"
+    vocabulary = [
+        "".join(rng.choice(alphabet) for _ in range(rng.randint(3, 10))) for _ in range(20_000)
+    ]
+    return [" ".join(rng.choice(vocabulary) for _ in range(rng.randint(4, 10))) for _ in range(count)]
+
+
+def measure(func, iterations: int) -> float:
+    """Среднее время в микросекундах"""
+    func()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main():
+    questions = make_questions(ENTRIES)
+    query = " ".join(questions[123].split()[:4])
+    backends = [False] + ([True] if faq.np is not None else [])
+    path = os.path.join(tempfile.mkdtemp(), "faq.idx")
+    for use_numpy in backends:
+        started = time.perf_counter()
+        index = FAQIndex(use_numpy=use_numpy)
+        index.add_many((question, i) for i, question in enumerate(questions))
+        built = time.perf_counter()
+        index.save(path)
+        started_load = time.perf_counter()
+        FAQIndex.load(path, use_numpy=use_numpy)
+        loaded = time.perf_counter()
+        search = measure(lambda: index.search(query), 200 if use_numpy else 20)
+
+        def update():
+            index.remove(index.add(questions[7], -1))
+            index.search(query)
+        updated = measure(update, 200 if use_numpy else 20) - search
+        print(
+            f"{'numpy' if use_numpy else 'python':>7}: build {built - started:.2f} s, "
+            f"load {loaded - started_load:.2f} s, search {search:.0f} us, "
+            f"add+remove {updated:.0f} us"
+        )
+
+
+if __name__ == "__main__":
+    main()
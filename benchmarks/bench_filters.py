@@ -0,0 +1,85 @@
+"""
+Микробенчмарк проверки фильтров обработчиков
+
+Сравнивает прежние асинхронные фильтры (корутина на каждую проверку)
+с синхронными SyncFilter: роутер из 50 обработчиков с фильтрами
+пользователя, типа чата и текста, обновление доходит до последнего.
+
+Запуск: python benchmarks/bench_filters.py
+"""
+
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from max_bot.core.router import Router
+from max_bot.core.types import Chat, Message, Update, User
+from max_bot.filters.base import BaseFilter, ChatTypeFilter, TextFilter, UserFilter
+
+
+ITERATIONS = 5_000
+HANDLERS = 50
+
+
+class AsyncOnly(BaseFilter):
+    """Прежняя реализация: асинхронная обертка над фильтром"""
+
+    def __init__(self, inner):
+        self.inner = inner
+
+    async def check(self, update: Update) -> bool:
+        return self.inner.check_sync(update)
+
+
+def make_router(wrap) -> Router:
+    """Роутер, в котором подходит только последний обработчик"""
+    router = Router()
+    for index in range(HANDLERS):
+        async def handler(message):
+            return True
+        router.message_handler([
+            wrap(UserFilter(1)),
+            wrap(ChatTypeFilter("private")),
+            wrap(TextFilter(f"text{index}")),
+        ])(handler)
+    return router
+
+
+def make_update(text: str) -> Update:
+    return Update(
+        update_id=1,
+        message=Message(
+            message_id=1,
+            date=datetime.now(),
+            chat=Chat(id=1, type="private"),
+            from_user=User(id=1),
+            text=text
+        )
+    )
+
+
+async def measure(router: Router, update: Update) -> float:
+    """Среднее время обработки обновления в микросекундах"""
+    for _ in range(100):
+        await router.handle(update)
+    started = time.perf_counter()
+    for _ in range(ITERATIONS):
+        await router.handle(update)
+    return (time.perf_counter() - started) / ITERATIONS * 1e6
+
+
+async def main():
+    update = make_update(f"text{HANDLERS - 1}")
+    before = await measure(make_router(AsyncOnly), update)
+    after = await measure(make_router(lambda f: f), update)
+    print(f"{'filters':>8} {'update, us':>11}")
+    print(f"{'async':>8} {before:>11.2f}")
+    print(f"{'sync':>8} {after:>11.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,54 @@
+"""
+Микробенчмарк времени импорта
+
+Измеряет import max_bot и первое обращение к max_bot.Dispatcher
+в отдельных процессах: медиана по нескольким запускам и модули,
+загруженные к этому моменту.
+
+Запуск: python benchmarks/bench_import.py
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUNS = 10
+
+CASES = [
+    ("import max_bot", "import max_bot"),
+    ("max_bot.Dispatcher", "import max_bot; max_bot.Dispatcher"),
+    ("max_bot.core.host", "import max_bot.core.host"),
+]
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+{code}
+elapsed = time.perf_counter() - start
+print(elapsed, 'asyncio' in sys.modules, 'aiohttp' in sys.modules)
+"""
+
+
+def measure(code: str):
+    times = []
+    for _ in range(RUNS):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE.format(code=code)],
+            cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.split()
+        times.append(float(output[0]))
+    return statistics.median(times), output[1] == "True", output[2] == "True"
+
+
+def main():
+    print(f"{'case':<22} {'median':>10}  asyncio  aiohttp")
+    for name, code in CASES:
+        elapsed, has_asyncio, has_aiohttp = measure(code)
+        print(f"{name:<22} {elapsed * 1000:>7.1f} ms  {has_asyncio!s:<7}  {has_aiohttp!s:<7}")
+
+
+if __name__ == "__main__":
+    main()
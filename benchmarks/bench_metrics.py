@@ -0,0 +1,125 @@
+"""
+Микробенчмарк накладных расходов метрик и трассировки
+
+Сравнивает Dispatcher.process_update с отключенными и включенными
+метриками и трассировкой с разной долей выборки, а также стоимость
+отдельных операций записи и число выделений памяти на одно обновление.
+
+Запуск: python benchmarks/bench_metrics.py
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from max_bot.core.dispatcher import Dispatcher
+from max_bot.core.types import Chat, Message, Update, User
+from max_bot.metrics.registry import MetricsRegistry
+from max_bot.middleware.base import BaseMiddleware
+from max_bot.tracing.exporters import RingBufferExporter
+from max_bot.tracing.tracer import Tracer
+
+
+ITERATIONS = 50_000
+
+
+class PassMiddleware(BaseMiddleware):
+    """Middleware без собственной работы"""
+
+    async def __call__(self, handler, update):
+        return await handler(update)
+
+
+def make_dispatcher(metrics, tracer=None) -> Dispatcher:
+    """Диспетчер с одним обработчиком и тремя middleware"""
+    dp = Dispatcher(metrics=metrics, dedup_window=0, tracer=tracer)
+
+    @dp.message_handler()
+    async def handler(message):
+        return True
+
+    for _ in range(3):
+        dp.add_middleware(PassMiddleware())
+    dp.build_pipeline()
+    return dp
+
+
+async def measure(dp: Dispatcher, update: Update) -> float:
+    """Среднее время обработки одного обновления в микросекундах"""
+    for _ in range(1000):
+        await dp.process_update(update)
+    started = time.perf_counter()
+    for _ in range(ITERATIONS):
+        await dp.process_update(update)
+    return (time.perf_counter() - started) / ITERATIONS * 1e6
+
+
+async def allocations(dp: Dispatcher, update: Update) -> float:
+    """Прирост занятых блоков памяти на одно обновление"""
+    for _ in range(1000):
+        await dp.process_update(update)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for _ in range(10_000):
+        await dp.process_update(update)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    growth = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+    return growth / 10_000
+
+
+def measure_ops() -> tuple:
+    """Стоимость inc и observe в наносекундах"""
+    registry = MetricsRegistry()
+    counter = registry.counter("c_total", "C").labels()
+    histogram = registry.histogram("h_seconds", "H").labels()
+    value = 0.003
+
+    started = time.perf_counter()
+    for _ in range(ITERATIONS):
+        counter.inc()
+    inc = (time.perf_counter() - started) / ITERATIONS * 1e9
+
+    started = time.perf_counter()
+    for _ in range(ITERATIONS):
+        histogram.observe(value)
+    observe = (time.perf_counter() - started) / ITERATIONS * 1e9
+    return inc, observe
+
+
+async def main():
+    logging.disable(logging.CRITICAL)
+    update = Update(
+        update_id=1,
+        message=Message(
+            message_id=1,
+            date=datetime.now(),
+            chat=Chat(id=1, type="private"),
+            from_user=User(id=1),
+            text="hello"
+        )
+    )
+
+    variants = (
+        ("off", make_dispatcher(False)),
+        ("metrics", make_dispatcher(MetricsRegistry())),
+        ("trace 0%", make_dispatcher(False, Tracer([RingBufferExporter()], sample_rate=0))),
+        ("trace 1%", make_dispatcher(False, Tracer([RingBufferExporter()], sample_rate=0.01))),
+        ("trace 100%", make_dispatcher(False, Tracer([RingBufferExporter()]))),
+    )
+    print(f"{'variant':>10} {'us/update':>10} {'blocks/update':>14}")
+    for name, dp in variants:
+        print(f"{name:>10} {await measure(dp, update):>10.2f} {await allocations(dp, update):>14.3f}")
+
+    inc, observe = measure_ops()
+    print(f"counter.inc: {inc:.0f} ns, histogram.observe: {observe:.0f} ns")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,103 @@
+"""
+Микробенчмарк накладных расходов цепочки middleware в Dispatcher.process_update
+
+Сравнивает прежнюю сборку цепочки из lambda на каждое обновление
+с цепочкой, собранной один раз при запуске диспетчера. Отсев повторов
+и метрики отключены: одно и то же обновление иначе отсеивалось бы
+как повтор, не доходя до цепочки.
+
+Запуск: python benchmarks/bench_middleware.py
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from max_bot.core.dispatcher import Dispatcher
+from max_bot.core.types import Chat, Message, Update, User
+from max_bot.middleware.base import BaseMiddleware
+
+
+ITERATIONS = 50_000
+
+
+class PassMiddleware(BaseMiddleware):
+    """Middleware без собственной работы"""
+
+    async def __call__(self, handler, update):
+        return await handler(update)
+
+
+async def legacy_process_update(dp: Dispatcher, update: Update):
+    """Прежняя реализация: цепочка из lambda на каждое обновление
+
+    В исходном варианте lambda принимали обновление в параметр h и
+    падали при первом же middleware, здесь эта ошибка исправлена,
+    чтобы сравнивать только стоимость сборки цепочки.
+    """
+    dp.logger.debug(f"Processing update {update.update_id}")
+
+    handler = dp.router._handle_handlers
+    for middleware in reversed(dp.middlewares):
+        handler = lambda u, h=handler, m=middleware: m(h, u)
+
+    try:
+        result = await handler(update)
+        dp.logger.debug(f"Update {update.update_id} processed successfully")
+        return result
+    except Exception as e:
+        dp.logger.error(f"Error processing update {update.update_id}: {e}")
+        raise
+
+
+def make_dispatcher(middlewares: int) -> Dispatcher:
+    """Диспетчер с одним обработчиком и заданным числом middleware"""
+    dp = Dispatcher(metrics=False, dedup_window=0)
+
+    @dp.message_handler()
+    async def handler(message):
+        return True
+
+    for _ in range(middlewares):
+        dp.add_middleware(PassMiddleware())
+    return dp
+
+
+async def measure(process, dp: Dispatcher, update: Update) -> float:
+    """Среднее время обработки одного обновления в микросекундах"""
+    for _ in range(1000):
+        await process(dp, update)
+    started = time.perf_counter()
+    for _ in range(ITERATIONS):
+        await process(dp, update)
+    return (time.perf_counter() - started) / ITERATIONS * 1e6
+
+
+async def main():
+    logging.disable(logging.CRITICAL)
+    update = Update(
+        update_id=1,
+        message=Message(
+            message_id=1,
+            date=datetime.now(),
+            chat=Chat(id=1, type="private"),
+            from_user=User(id=1),
+            text="hello"
+        )
+    )
+
+    print(f"{'middlewares':>12} {'before, us':>12} {'after, us':>12}")
+    for count in (0, 3, 10):
+        dp = make_dispatcher(count)
+        before = await measure(legacy_process_update, dp, update)
+        after = await measure(Dispatcher.process_update, dp, update)
+        print(f"{count:>12} {before:>12.2f} {after:>12.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
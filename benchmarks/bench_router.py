@@ -0,0 +1,129 @@
+"""
+Микробенчмарк поиска обработчика команды в Router
+
+Сравнивает прежний линейный обход всех обработчиков с индексом
+команд для 10/100/1000 команд. Сообщение с последней командой -
+худший случай для обхода, обычный текст доходит до обработчика
+по умолчанию. Вторая таблица - то же для кнопок: по обработчику на
+товар с фильтром callback_data против одного префикса CallbackData.
+
+Запуск: python benchmarks/bench_router.py
+"""
+
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from max_bot.core.router import Router
+from max_bot.core.types import CallbackQuery, Chat, Message, Update, User
+from max_bot.filters.base import callback_data, command
+from max_bot.filters.callback_data import CallbackData
+
+
+ITERATIONS = 2_000
+
+
+async def linear_handle(router: Router, update: Update):
+    """Прежняя реализация: проверка всех обработчиков по порядку"""
+    for handler in router.handlers:
+        result = await handler.handle(update)
+        if result is not None:
+            return result
+    return None
+
+
+async def indexed_handle(router: Router, update: Update):
+    return await router._handle_handlers(update)
+
+
+def make_router(commands: int) -> Router:
+    """Роутер с заданным числом команд и обработчиком по умолчанию"""
+    router = Router()
+    for index in range(commands):
+        async def handler(message):
+            return True
+        router.message_handler(command([f"cmd{index}", f"alias{index}"]))(handler)
+
+    @router.message_handler()
+    async def default(message):
+        return True
+
+    return router
+
+
+def make_update(text: str) -> Update:
+    return Update(
+        update_id=1,
+        message=Message(
+            message_id=1,
+            date=datetime.now(),
+            chat=Chat(id=1, type="private"),
+            from_user=User(id=1),
+            text=text
+        )
+    )
+
+
+def make_callback_router(products: int, factory: CallbackData) -> Router:
+    """Роутер с обработчиком на каждый товар и общим обработчиком фабрики"""
+    router = Router()
+    for index in range(products):
+        async def handler(callback_query):
+            return True
+        router.callback_query_handler(callback_data(f"item:{index}"))(handler)
+
+    @router.callback_query_handler(factory.filter())
+    async def product(callback_query, callback_data):
+        return callback_data.id
+
+    return router
+
+
+def make_callback(data: str) -> Update:
+    return Update(
+        update_id=1,
+        callback_query=CallbackQuery(id="1", from_user=User(id=1), data=data)
+    )
+
+
+async def measure(handle, router: Router, update: Update) -> float:
+    """Среднее время поиска обработчика в микросекундах"""
+    for _ in range(100):
+        await handle(router, update)
+    started = time.perf_counter()
+    for _ in range(ITERATIONS):
+        await handle(router, update)
+    return (time.perf_counter() - started) / ITERATIONS * 1e6
+
+
+async def main():
+    print(f"{'commands':>9} {'message':>10} {'linear, us':>11} {'index, us':>10}")
+    for count in (10, 100, 1000):
+        router = make_router(count)
+        for name, update in (
+            ("command", make_update(f"/cmd{count - 1} arg")),
+            ("text", make_update("hello")),
+        ):
+            before = await measure(linear_handle, router, update)
+            after = await measure(indexed_handle, router, update)
+            print(f"{count:>9} {name:>10} {before:>11.2f} {after:>10.2f}")
+
+    factory = CallbackData("product", action=str, id=int)
+    print(f"\n{'products':>9} {'button':>10} {'linear, us':>11} {'trie, us':>10}")
+    for count in (10, 100, 1000):
+        router = make_callback_router(count, factory)
+        for name, update in (
+            ("item", make_callback(f"item:{count - 1}")),
+            ("factory", make_callback(factory.new(action="buy", id=count))),
+        ):
+            before = await measure(linear_handle, router, update)
+            after = await measure(indexed_handle, router, update)
+            print(f"{count:>9} {name:>10} {before:>11.2f} {after:>10.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
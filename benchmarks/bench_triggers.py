@@ -0,0 +1,87 @@
+"""
+Микробенчмарк поиска ключевых слов в сообщении
+
+Сравнивает прежний перебор ключевых слов с проверкой вхождения
+подстроки (как в examples/faq_bot.py) с TriggerSet для 10/100/1000/10000
+ключевых фраз, а также поиск TriggerSet по каждому слову с автоматом
+Ахо-Корасик. Сообщение не содержит ни одной фразы - худший случай
+для перебора.
+
+Запуск: python benchmarks/bench_triggers.py
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from max_bot.core.text import normalize_text
+from max_bot.filters import triggers as triggers_module
+from max_bot.filters.triggers import TriggerSet
+
+
+ITERATIONS = 500
+TEXT = (
+    "Здравствуйте! Подскажите, пожалуйста, можно ли оформить заказ сегодня "
+    "вечером и получить его завтра утром в пункте выдачи рядом с домом?"
+)
+
+
+def make_keywords(count: int):
+    """Случайные фразы из двух слов"""
+    rng = random.Random(count)
+    alphabet = "абвгдежзиклмнопрстуфхцчшщэюя"
+    def word():
+        return "".join(rng.choice(alphabet) for _ in range(rng.randint(4, 9)))
+    return [f"{word()} {word()}" for _ in range(count)]
+
+
+def linear_match(keywords, text: str):
+    """Прежняя реализация: проверка каждого ключевого слова"""
+    text = text.lower().strip()
+    for keyword in keywords:
+        if keyword in text:
+            return keyword
+    return None
+
+
+def measure(func, *args) -> float:
+    """Среднее время поиска в микросекундах"""
+    func(*args)
+    started = time.perf_counter()
+    for _ in range(ITERATIONS):
+        func(*args)
+    return (time.perf_counter() - started) / ITERATIONS * 1e6
+
+
+def measure_triggers(keywords, linear_scan_limit: int) -> float:
+    """Время TriggerSet.best при заданном пороге перехода на автомат"""
+    default = triggers_module.LINEAR_SCAN_LIMIT
+    triggers_module.LINEAR_SCAN_LIMIT = linear_scan_limit
+    try:
+        triggers = TriggerSet()
+        triggers.filter(keywords)
+        triggers.best("")  # сборка автомата
+        return measure(lambda text: triggers.best(normalize_text(text)), TEXT)
+    finally:
+        triggers_module.LINEAR_SCAN_LIMIT = default
+
+
+def main():
+    print(
+        f"{'keywords':>9} {'linear, us':>11} {'TriggerSet, us':>15}"
+        f" {'find, us':>9} {'automaton, us':>14}"
+    )
+    for count in (10, 100, 1000, 10000):
+        keywords = make_keywords(count)
+        before = measure(linear_match, keywords, TEXT)
+        after = measure_triggers(keywords, triggers_module.LINEAR_SCAN_LIMIT)
+        find = measure_triggers(keywords, count)
+        automaton = measure_triggers(keywords, 0)
+        print(f"{count:>9} {before:>11.2f} {after:>15.2f} {find:>9.2f} {automaton:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
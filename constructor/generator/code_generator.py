@@ -74,6 +74,11 @@ async def {command_name}_command(message):
             
             handlers.append(handler_code)
         
+        # Боты с частыми вопросами ищут ответ в индексе FAQ
+        if config.settings.get("faq_enabled") and config.settings.get("faq_entries"):
+            handlers.append(CodeGenerator._generate_faq_handler(config))
+            return '\n'.join(handlers)
+        
         # Добавляем обработчик по умолчанию
         default_handler = '''
 @dp.message_handler()
@@ -86,6 +91,38 @@ async def default_handler(message):
         
         return '\n'.join(handlers)
     
+    @staticmethod
+    def _generate_faq_handler(config: BotConfig) -> str:
+        """Генерация поиска ответов по индексу FAQ"""
+        settings = config.settings
+        default = config.responses.get("default", "Извините, я не знаю ответ на этот вопрос.")
+        suggest = (
+            '''
+    suggestions = [m.question for m in matches if m.score >= FAQ_THRESHOLD / 3]
+    if suggestions:
+        await message.answer("Возможно, вы имели в виду:\\n" + "\\n".join(suggestions))
+        return'''
+            if settings.get("auto_suggest") else ""
+        )
+        return f'''
+from max_bot.utils.faq import FAQIndex
+
+FAQ_ENTRIES = {settings["faq_entries"]!r}
+FAQ_THRESHOLD = {settings.get("faq_threshold", 0.4)!r}
+
+faq_index = FAQIndex()
+faq_index.add_many(FAQ_ENTRIES.items())
+
+
+@dp.message_handler()
+async def faq_handler(message):
+    """Поиск ответа среди частых вопросов"""
+    matches = faq_index.search(message.text or "", k=3)
+    if matches and matches[0].score >= FAQ_THRESHOLD:
+        await message.answer(matches[0].answer)
+        return{suggest}
+    await message.answer({default!r})'''
+    
     @staticmethod
     def _generate_main_block() -> str:
         """Генерация основного блока"""
@@ -89,7 +89,13 @@ class BotTemplates:
             },
             "settings": {
                 "faq_enabled": True,
-                "auto_suggest": True
+                "auto_suggest": True,
+                "faq_threshold": 0.4,
+                "faq_entries": {
+                    "Как работает бот?": "Бот ищет ответ среди частых вопросов. Просто задайте вопрос!",
+                    "Где получить помощь?": "Обратитесь к администратору или используйте команду /help",
+                    "Контакты поддержки": "Email: support@example.com"
+                }
             }
         }
     
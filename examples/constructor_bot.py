@@ -2,11 +2,14 @@
 Пример запуска бота-конструктора
 """
 
+from max_bot import setup_logging
 from constructor.dialog.constructor_bot import ConstructorBot
 
 
 def main():
     """Запуск бота-конструктора"""
+    setup_logging()
+
     # Замените на ваш токен
     token = "YOUR_CONSTRUCTOR_BOT_TOKEN"
     
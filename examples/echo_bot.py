@@ -2,7 +2,7 @@
 Пример эхо-бота с использованием MAX Bot Library
 """
 
-from max_bot import Dispatcher
+from max_bot import Dispatcher, setup_logging
 from max_bot.filters.base import command, text
 from max_bot.middleware.base import LoggingMiddleware, ThrottlingMiddleware
 
@@ -53,6 +53,8 @@ async def echo_handler(message):
 
 
 if __name__ == "__main__":
+    setup_logging()
+
     # Добавляем middleware
     dp.add_middleware(LoggingMiddleware())
     dp.add_middleware(ThrottlingMiddleware(rate_limit=1.0))
@@ -2,11 +2,14 @@
 Пример расширенного бота-конструктора
 """
 
+from max_bot import setup_logging
 from constructor.dialog.enhanced_constructor import EnhancedConstructorBot
 
 
 def main():
     """Запуск расширенного бота-конструктора"""
+    setup_logging()
+
     # Замените на ваш токен
     token = "YOUR_ENHANCED_CONSTRUCTOR_BOT_TOKEN"
     
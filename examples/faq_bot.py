@@ -2,8 +2,10 @@
 Пример FAQ бота с использованием MAX Bot Library
 """
 
-from max_bot import Dispatcher
+from max_bot import Dispatcher, setup_logging
 from max_bot.filters.base import command, text
+from max_bot.filters.triggers import triggers
+from max_bot.utils.faq import FAQIndex
 from max_bot.middleware.base import LoggingMiddleware
 
 
@@ -21,6 +23,10 @@ faq_database = {
     "возврат": "Возврат товара возможен в течение 14 дней с момента покупки"
 }
 
+# Индекс для перефразированных вопросов и вопросов с опечатками
+faq_index = FAQIndex()
+faq_index.add_many(faq_database.items())
+
 
 @dp.message_handler(command("start"))
 async def start_command(message):
@@ -61,22 +67,32 @@ async def ask_command(message):
     await message.answer("Введите ваш вопрос:")
 
 
+# Все вопросы базы ищутся в сообщении за один проход
+@dp.message_handler(triggers(list(faq_database)))
+async def question_handler(message, trigger):
+    """Обработчик вопросов из базы знаний"""
+    await message.answer(faq_database[trigger.keyword])
+
+
 @dp.message_handler()
-async def question_handler(message):
-    """Обработчик вопросов"""
-    question = message.text.lower().strip()
+async def search_question_handler(message):
+    """Поиск похожих вопросов"""
+    matches = faq_index.search(message.text, k=3)
+    if matches and matches[0].score >= 0.4:
+        await message.answer(matches[0].answer)
+        return
     
-    # Ищем ответ в базе знаний
-    for key, answer in faq_database.items():
-        if key in question or question in key:
-            await message.answer(answer)
-            return
+    suggestions = [m.question for m in matches if m.score >= 0.15]
+    if suggestions:
+        await message.answer("Возможно, вы имели в виду:\n" + "\n".join(f"• {q}" for q in suggestions))
+        return
     
-    # Если ответ не найден
     await message.answer("Извините, я не знаю ответ на этот вопрос. Обратитесь к администратору или попробуйте переформулировать вопрос.")
 
 
 if __name__ == "__main__":
+    setup_logging()
+
     # Добавляем middleware
     dp.add_middleware(LoggingMiddleware())
     
@@ -0,0 +1,36 @@
+"""
+Пример запуска нескольких ботов в одном процессе
+"""
+
+from max_bot import setup_logging
+from max_bot.core.host import BotHost
+from max_bot.core.router import Router
+from max_bot.filters.base import command
+
+
+def create_router() -> Router:
+    """Общие обработчики: у каждого бота свой экземпляр роутера"""
+    router = Router("common")
+
+    @router.message_handler(command("start"))
+    async def start_command(message):
+        """Обработчик команды /start"""
+        await message.answer("Привет! Я один из ботов на общем хосте.")
+
+    @router.message_handler()
+    async def echo_handler(message):
+        """Эхо-обработчик"""
+        await message.answer(f"Вы сказали: {message.text}")
+
+    return router
+
+
+if __name__ == "__main__":
+    setup_logging()
+    host = BotHost(concurrency=100, bot_concurrency=4)
+
+    # Каждый бот получает свой диспетчер, свои роутеры и свой offset
+    for token in ["FIRST_BOT_TOKEN", "SECOND_BOT_TOKEN", "THIRD_BOT_TOKEN"]:
+        host.add_router(token, create_router)
+
+    host.run()
@@ -2,7 +2,7 @@
 Пример магазин-бота с использованием MAX Bot Library
 """
 
-from max_bot import Dispatcher
+from max_bot import Dispatcher, setup_logging
 from max_bot.filters.base import command, text, callback_data
 from max_bot.middleware.base import LoggingMiddleware
 
@@ -163,6 +163,8 @@ async def default_handler(message):
 
 
 if __name__ == "__main__":
+    setup_logging()
+
     # Добавляем middleware
     dp.add_middleware(LoggingMiddleware())
     
@@ -3,7 +3,7 @@
 """
 
 import asyncio
-from max_bot import Dispatcher
+from max_bot import Dispatcher, setup_logging
 from max_bot.filters.base import command, text
 
 
@@ -55,5 +55,7 @@ async def echo_handler(message):
 
 
 if __name__ == "__main__":
+    setup_logging()
+
     # Запускаем бота
     dp.run()
@@ -3,25 +3,53 @@ MAX Bot Library - аналог aiogram для платформы MAX
 
 Основная библиотека для создания ботов в приложении MAX
 с поддержкой асинхронных методов и модульной архитектуры.
+
+Атрибуты пакета загружаются при первом обращении: import max_bot
+не импортирует диспетчер, asyncio и aiohttp, пока они не нужны.
 """
 
-from .core.dispatcher import Dispatcher
-from .core.router import Router
-from .core.handler import Handler
-from .core.types import Update, Message, CallbackQuery
-from .filters.base import BaseFilter
-from .middleware.base import BaseMiddleware
+from importlib import import_module
+
+# Без импорта typing: он один занимает больше времени, чем весь пакет
+TYPE_CHECKING = False
 
 __version__ = "0.1.0"
 __author__ = "maksimmerlin"
 
-__all__ = [
-    "Dispatcher",
-    "Router", 
-    "Handler",
-    "Update",
-    "Message",
-    "CallbackQuery",
-    "BaseFilter",
-    "BaseMiddleware"
-]
+# Имя атрибута -> модуль, в котором он определен
+_LAZY_ATTRIBUTES = {
+    "Dispatcher": ".core.dispatcher",
+    "Router": ".core.router",
+    "Handler": ".core.handler",
+    "Update": ".core.types",
+    "Message": ".core.types",
+    "CallbackQuery": ".core.types",
+    "BaseFilter": ".filters.base",
+    "SyncFilter": ".filters.base",
+    "BaseMiddleware": ".middleware.base",
+    "setup_logging": ".utils.log",
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+if TYPE_CHECKING:
+    from .core.dispatcher import Dispatcher
+    from .core.router import Router
+    from .core.handler import Handler
+    from .core.types import Update, Message, CallbackQuery
+    from .filters.base import BaseFilter, SyncFilter
+    from .middleware.base import BaseMiddleware
+    from .utils.log import setup_logging
+
+
+def __getattr__(name: str):
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -4,93 +4,482 @@
 
 import asyncio
 import logging
-from typing import List, Optional, Dict, Any
+import time
+from typing import List, Optional, Dict, Any, Awaitable, Callable, Union, TYPE_CHECKING
+from .handler import HandlerTimeoutError, wait_for_deadline
 from .router import Router
+from .polling import PollingPolicy, PollingStats
+from .scheduler import UpdateScheduler
 from .types import Update, BotInfo
-from ..middleware.base import BaseMiddleware
+from ..metrics.bot import BotMetrics
+from ..metrics.registry import REGISTRY, MetricsRegistry
+from ..middleware.base import BaseMiddleware, build_middleware_chain
+from ..tracing.tracer import Tracer
+from ..storage.dedup import BaseDedupStore, MemoryDedupStore
+from ..storage.offset import BaseOffsetStore, OffsetCheckpointer, offset_key
 from ..utils.http_client import MaxAPIClient
+from ..utils.loop import LoopSettings, run as run_loop
+
+if TYPE_CHECKING:
+    import aiohttp
 
 
 class Dispatcher:
-    """Основной диспетчер для управления ботом"""
+    """Основной диспетчер для управления ботом
+    
+    update_timeout - общее ограничение времени обработки одного
+    обновления в секундах (включая middleware). Ограничение для
+    отдельного обработчика задается в декораторе: timeout=...
+    
+    Повторно доставленные обновления (повтор webhook, перезапуск)
+    отсеиваются до маршрутизации по последним dedup_window update_id.
+    Для нескольких экземпляров бота передается общее dedup_store,
+    dedup_window=0 отключает проверку.
+    
+    metrics - реестр метрик (по умолчанию общий REGISTRY из
+    max_bot.metrics.registry), False отключает сбор метрик. Метрики
+    бота помечаются меткой bot со значением name.
     
-    def __init__(self, token: str = None):
+    tracer - трассировщик (max_bot.tracing.tracer.Tracer): для
+    обновлений из выборки записываются отрезки middleware, фильтров,
+    обработчиков и запросов к API.
+    """
+    
+    def __init__(
+        self,
+        token: str = None,
+        update_timeout: Optional[float] = None,
+        dedup_store: Optional[BaseDedupStore] = None,
+        dedup_window: int = 10000,
+        metrics: Union[MetricsRegistry, bool] = True,
+        name: Optional[str] = None,
+        tracer: Optional[Tracer] = None
+    ):
         self.token = token
+        self.name = name
+        self.update_timeout = update_timeout
+        if dedup_store is None and dedup_window:
+            dedup_store = MemoryDedupStore(dedup_window)
+        self.dedup_store = dedup_store
+        self.duplicates = 0
+        if metrics is True:
+            metrics = REGISTRY
+        self.metrics_registry: Optional[MetricsRegistry] = metrics or None
+        self.metrics: Optional[BotMetrics] = None
+        self.tracer = tracer
+        self.timeouts = 0
+        self._timeout_callback: Optional[
+            Callable[[Update, HandlerTimeoutError], Awaitable[Any]]
+        ] = None
         self.router = Router("main")
         self.middlewares: List[BaseMiddleware] = []
+        self._pipeline: Optional[Callable[[Update], Awaitable[Any]]] = None
+        self._traced_pipeline: Optional[Callable[[Update], Awaitable[Any]]] = None
         self.logger = logging.getLogger(__name__)
         self._running = False
         self.api_client: Optional[MaxAPIClient] = None
-        
-        # Настройка логирования
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        )
+        self.scheduler: Optional[UpdateScheduler] = None
+        self._fetch_task: Optional[asyncio.Task] = None
+        self.polling_policy: Optional[PollingPolicy] = None
+        self.polling_stats = PollingStats()
+        self.webhook_server = None
+        self.reloader = None
     
-    def include_router(self, router: Router):
-        """Включение роутера"""
+    def include_router(self, router: Union[Router, str]):
+        """Включение роутера или пути импорта роутера ("bot.admin:router"),
+        который загружается при сборке цепочки обработки"""
         self.router.include_router(router)
+        self._pipeline = None
+    
+    def enable_reload(self, packages=(), interval: float = 1.0, **kwargs):
+        """Перезагрузка роутеров, включенных по пути импорта, при изменении
+        их модулей (max_bot.core.reload.RouterReloader)
+        
+        Проверка изменений запускается вместе с polling или webhook.
+        """
+        from .reload import RouterReloader
+        
+        self.reloader = RouterReloader(self, packages, interval, **kwargs)
+        return self.reloader
     
     def add_middleware(self, middleware: BaseMiddleware):
         """Добавление middleware"""
         self.middlewares.append(middleware)
+        self._pipeline = None
+    
+    def build_pipeline(self) -> Callable[[Update], Awaitable[Any]]:
+        """Сборка цепочки middleware диспетчера и роутера
+        
+        Вызывается при запуске и после изменения набора middleware
+        или роутеров, обработка обновлений использует готовую цепочку.
+        """
+        if self.metrics_registry is not None:
+            self.metrics = BotMetrics(self.metrics_registry, self.bot_label)
+            self.metrics.bind_gauges(
+                lambda: self.scheduler.pending if self.scheduler else 0,
+                lambda: self.scheduler.in_flight if self.scheduler else 0,
+                self._queue_depth
+            )
+            self.metrics.bind_lanes(lambda: self.scheduler.lanes if self.scheduler else None)
+        self._pipeline = build_middleware_chain(
+            self.middlewares, self.router.build_chain(self.metrics), self.metrics
+        )
+        if self.tracer is not None:
+            # Отдельная цепочка с отрезками трассы, чтобы обновления
+            # вне выборки не платили за трассировку middleware
+            self._traced_pipeline = build_middleware_chain(
+                self.middlewares,
+                self.router.build_chain(self.metrics, tracing=True),
+                self.metrics,
+                tracing=True
+            )
+        return self._pipeline
+    
+    @property
+    def bot_label(self) -> str:
+        """Значение метки bot в метриках"""
+        if self.name:
+            return self.name
+        return offset_key(self.token) if self.token else "default"
+    
+    def _queue_depth(self) -> int:
+        """Обновления и пачки, ожидающие передачи в обработку"""
+        if self.webhook_server is not None:
+            return self.webhook_server.queue.qsize()
+        return self.polling_stats.queue_depth
+    
+    def _dedup_key(self) -> str:
+        """Ключ бота в хранилище полученных update_id"""
+        return offset_key(self.token) if self.token else "default"
     
     async def process_update(self, update: Update) -> Any:
         """Обработка обновления"""
-        self.logger.debug(f"Processing update {update.update_id}")
+        # Цепочки берутся один раз: после перезагрузки роутеров
+        # начатое обновление дорабатывает на прежнем дереве
+        pipeline = self._pipeline or self.build_pipeline()
+        traced_pipeline = self._traced_pipeline
+        metrics = self.metrics
+        if metrics is not None:
+            metrics.received[update.event_type or "unknown"].inc()
         
-        # Применяем middleware
-        handler = self.router.handle
-        for middleware in reversed(self.middlewares):
-            handler = lambda h=handler, m=middleware: m(h, update)
+        if self.dedup_store is not None:
+            if not await self.dedup_store.add(self._dedup_key(), update.update_id):
+                self.duplicates += 1
+                if metrics is not None:
+                    metrics.duplicates.inc()
+                self.logger.debug("Duplicate update %s skipped", update.update_id)
+                return None
+        self.logger.debug("Processing update %s", update.update_id)
         
+        root = self.tracer.start_trace(update) if self.tracer is not None else None
+        if root is None:
+            return await self._process_recorded(pipeline, update)
+        update.context["trace_id"] = root.trace_id
+        if traced_pipeline is None:
+            # Трассировщик назначен после сборки цепочки
+            self.build_pipeline()
+            traced_pipeline = self._traced_pipeline
+        try:
+            with root:
+                return await self._process_recorded(traced_pipeline, update)
+        finally:
+            self.tracer.finish_trace(root)
+    
+    async def _process_recorded(
+        self,
+        pipeline: Callable[[Update], Awaitable[Any]],
+        update: Update
+    ) -> Any:
+        """Обработка с записью метрик"""
+        metrics = self.metrics
+        if metrics is None:
+            return await self._process(pipeline, update)
+        event_type = update.event_type or "unknown"
+        started = time.perf_counter()
+        try:
+            result = await self._process(pipeline, update)
+        except Exception:
+            metrics.failed[event_type].inc()
+            raise
+        metrics.processed[event_type].inc()
+        metrics.latency[event_type].observe(time.perf_counter() - started)
+        return result
+    
+    async def _process(self, pipeline: Callable[[Update], Awaitable[Any]], update: Update) -> Any:
+        """Прохождение обновления через цепочку с учетом ограничения времени"""
         try:
-            result = await handler(update)
-            self.logger.debug(f"Update {update.update_id} processed successfully")
+            if self.update_timeout is None:
+                result = await pipeline(update)
+            else:
+                result = await wait_for_deadline(pipeline(update), self.update_timeout)
+            self.logger.debug("Update %s processed successfully", update.update_id)
             return result
+        except HandlerTimeoutError as e:
+            return await self._handle_timeout(update, e)
+        except asyncio.CancelledError:
+            # Прерванное при остановке обновление придет снова и должно быть обработано
+            if self.dedup_store is not None:
+                await asyncio.shield(self.dedup_store.discard(self._dedup_key(), update.update_id))
+            raise
         except Exception as e:
             self.logger.error(f"Error processing update {update.update_id}: {e}")
             raise
     
-    async def start_polling(self, timeout: int = 30, limit: int = 100):
-        """Запуск polling для получения обновлений"""
+    async def _handle_timeout(self, update: Update, error: HandlerTimeoutError) -> Any:
+        """Учет превышения времени обработки и вызов обработчика таймаута"""
+        self.timeouts += 1
+        if self.metrics is not None:
+            self.metrics.timeouts.inc()
+        self.logger.warning(f"Update {update.update_id}: {error}")
+        if self._timeout_callback is not None:
+            return await self._timeout_callback(update, error)
+        return None
+    
+    def timeout_handler(self):
+        """Декоратор для обработчика превышения времени
+        
+        Вызывается с обновлением и HandlerTimeoutError, например,
+        чтобы ответить пользователю "попробуйте позже".
+        """
+        def decorator(func):
+            self._timeout_callback = func
+            return func
+        return decorator
+    
+    async def start_polling(
+        self,
+        timeout: int = 30,
+        limit: int = 100,
+        concurrency: int = 1,
+        max_pending: int = 1000,
+        policy: Optional[PollingPolicy] = None,
+        prefetch: int = 2,
+        session: Optional['aiohttp.ClientSession'] = None,
+        limiter: Optional[asyncio.Semaphore] = None,
+        offset_store: Optional[BaseOffsetStore] = None,
+        checkpoint_interval: float = 1.0,
+        drain_timeout: float = 30.0,
+        lanes: Optional[Dict[str, int]] = None
+    ):
+        """Запуск polling для получения обновлений
+        
+        timeout - время long polling на стороне сервера (0 - обычный polling),
+        limit - максимальный размер пачки обновлений.
+        concurrency - сколько обновлений разных чатов обрабатывается
+        одновременно, max_pending - сколько принятых обновлений может
+        ожидать обработки. Обновления одного чата всегда обрабатываются
+        по порядку.
+        prefetch - сколько пачек может быть загружено заранее: получение
+        следующей пачки идет параллельно с обработкой предыдущей.
+        session и limiter позволяют нескольким ботам в одном процессе
+        использовать общий пул соединений и общий лимит обработки.
+        offset_store - хранилище, в которое раз в checkpoint_interval секунд
+        сохраняется offset полностью обработанных обновлений; после
+        перезапуска polling продолжится с него.
+        После stop_polling получение обновлений прекращается, а принятые
+        обновления обрабатываются не дольше drain_timeout секунд.
+        lanes - веса приоритетных полос (DEFAULT_LANE_WEIGHTS из
+        max_bot.core.lanes), при нехватке слотов нажатия кнопок
+        и команды обрабатываются раньше обычных сообщений.
+        """
         if not self.token:
             raise ValueError("Token is required for polling")
+        if prefetch < 1:
+            raise ValueError("prefetch must be positive")
         
         self._running = True
-        self.logger.info("Starting polling...")
+        self.build_pipeline()
         
-        async with MaxAPIClient(self.token) as self.api_client:
-            offset = 0
+        offset = 0
+        checkpointer = None
+        if offset_store is not None:
+            checkpointer = OffsetCheckpointer(
+                offset_store,
+                offset_key(self.token),
+                lambda: self.scheduler.offset,
+                checkpoint_interval
+            )
+            offset = await checkpointer.load()
+        self.logger.info(
+            f"Starting polling (timeout={timeout}, concurrency={concurrency}, offset={offset})..."
+        )
+        
+        self.polling_policy = policy or PollingPolicy(timeout=timeout, limit=limit)
+        self.polling_stats = PollingStats()
+        self.scheduler = UpdateScheduler(
+            self.process_update,
+            max_concurrency=concurrency,
+            max_pending=max_pending,
+            offset=offset,
+            limiter=limiter,
+            lanes=lanes
+        )
+        batches: asyncio.Queue = asyncio.Queue(maxsize=prefetch)
+        if self.reloader is not None:
+            self.reloader.start()
+        async with MaxAPIClient(self.token, session=session, metrics=self.metrics) as self.api_client:
+            self._fetch_task = asyncio.create_task(self._fetch_updates(batches))
+            tasks = [self._fetch_task, asyncio.create_task(self._dispatch_batches(batches))]
+            if checkpointer is not None:
+                tasks.append(asyncio.create_task(checkpointer.run()))
             try:
-                while self._running:
-                    try:
-                        # Получаем обновления
-                        updates = await self.api_client.get_updates(offset=offset, limit=limit)
-                        
-                        for update in updates:
-                            await self.process_update(update)
-                            offset = update.update_id + 1
-                        
-                        if not updates:
-                            await asyncio.sleep(1)
-                        else:
-                            await asyncio.sleep(0.1)
-                            
-                    except Exception as e:
-                        self.logger.error(f"Polling error: {e}")
-                        await asyncio.sleep(5)
+                await asyncio.gather(self._fetch_task, return_exceptions=True)
+                await batches.put(None)
+                await tasks[1]
+                await self._drain(drain_timeout)
             except KeyboardInterrupt:
                 self.logger.info("Polling stopped by user")
             finally:
                 self._running = False
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                self._fetch_task = None
+                if self.reloader is not None:
+                    await self.reloader.stop()
+                if checkpointer is not None:
+                    await self._commit_offset(checkpointer)
+    
+    async def _drain(self, timeout: float):
+        """Обработка принятых обновлений перед остановкой"""
+        try:
+            await asyncio.wait_for(self.scheduler.join(), timeout)
+        except asyncio.TimeoutError:
+            self.logger.warning(
+                f"{self.scheduler.pending} updates not processed in {timeout}s, cancelling"
+            )
+            await self.scheduler.cancel()
+    
+    async def _commit_offset(self, checkpointer: OffsetCheckpointer):
+        """Сохранение итогового offset"""
+        try:
+            await checkpointer.commit()
+            self.logger.info(f"Offset {checkpointer.committed} committed")
+        except Exception as e:
+            self.logger.error(f"Failed to commit offset: {e}")
+    
+    async def _fetch_updates(self, batches: asyncio.Queue):
+        """Загрузка пачек обновлений в очередь
+        
+        Когда очередь заполнена, загрузка приостанавливается.
+        """
+        while self._running:
+            try:
+                batch = await self._fetch_once()
+            except Exception as e:
+                self.polling_stats.record_error()
+                if self.metrics is not None:
+                    self.metrics.poll_errors.inc()
+                delay = self.polling_policy.on_error()
+                self.logger.error(f"Polling error: {e}, retry in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+            
+            if batch:
+                await batches.put(batch)
+                self.polling_stats.record_queue_depth(batches.qsize())
+    
+    async def _fetch_once(self) -> List[Update]:
+        """Один запрос getUpdates, возвращает только новые обновления"""
+        policy = self.polling_policy
+        scheduler = self.scheduler
+        
+        if not scheduler.free_capacity:
+            await scheduler.wait_progress()
+        limit = policy.next_limit(scheduler.free_capacity)
+        
+        # Offset продвигается только за обработанные обновления,
+        # поэтому уже принятые обновления могут прийти повторно
+        started = time.monotonic()
+        updates = await self.api_client.get_updates(
+            offset=scheduler.offset, limit=limit, timeout=policy.timeout
+        )
+        self.polling_stats.record(len(updates), time.monotonic() - started)
+        if self.metrics is not None:
+            self.metrics.poll_batch_size.observe(len(updates))
+        policy.on_success()
+        
+        batch = [update for update in updates if scheduler.accept(update)]
+        if updates and not batch:
+            # Все обновления уже в работе: ждем, пока offset сдвинется
+            await scheduler.wait_progress()
+        elif not updates:
+            delay = policy.empty_delay()
+            if delay:
+                await asyncio.sleep(delay)
+        return batch
+    
+    async def _dispatch_batches(self, batches: asyncio.Queue):
+        """Передача загруженных пачек в обработку"""
+        while True:
+            batch = await batches.get()
+            if batch is None:
+                break
+            self.polling_stats.record_queue_depth(batches.qsize())
+            for update in batch:
+                await self.scheduler.submit(update, accepted=True)
     
     def stop_polling(self):
-        """Остановка polling"""
+        """Остановка polling
+        
+        Текущий запрос getUpdates прерывается, уже принятые
+        обновления дорабатываются внутри start_polling.
+        """
         self._running = False
+        if self._fetch_task is not None and self._fetch_task is not asyncio.current_task():
+            self._fetch_task.cancel()
         self.logger.info("Polling stopped")
     
+    async def start_webhook(
+        self,
+        host: str = "0.0.0.0",
+        port: int = 8080,
+        path: str = "/webhook",
+        secret: str = None,
+        queue_size: int = 1000,
+        concurrency: int = 10,
+        drain_timeout: float = 30.0,
+        lanes: Optional[Dict[str, int]] = None
+    ):
+        """Запуск приема обновлений через webhook
+        
+        Работает до вызова stop_webhook, после чего дожидается
+        обработки принятых обновлений (не дольше drain_timeout).
+        """
+        from ..webhook.server import WebhookServer
+        
+        self._running = True
+        self.build_pipeline()
+        self.webhook_server = WebhookServer(
+            self,
+            path=path,
+            secret=secret,
+            host=host,
+            port=port,
+            queue_size=queue_size,
+            concurrency=concurrency,
+            lanes=lanes
+        )
+        self.scheduler = self.webhook_server.scheduler
+        if self.reloader is not None:
+            self.reloader.start()
+        try:
+            if self.token:
+                async with MaxAPIClient(self.token, metrics=self.metrics) as self.api_client:
+                    await self.webhook_server.serve(drain_timeout)
+            else:
+                await self.webhook_server.serve(drain_timeout)
+        finally:
+            self._running = False
+            if self.reloader is not None:
+                await self.reloader.stop()
+    
+    def stop_webhook(self):
+        """Остановка webhook сервера"""
+        if self.webhook_server:
+            self.webhook_server.shutdown()
+        self._running = False
+    
     async def get_me(self) -> Optional[BotInfo]:
         """Получение информации о боте"""
         if not self.token:
@@ -102,16 +491,32 @@ class Dispatcher:
         else:
             return await self.api_client.get_me()
     
-    def message_handler(self, filters=None):
+    def message_handler(self, filters=None, timeout: Optional[float] = None):
         """Декоратор для регистрации обработчика сообщений"""
-        return self.router.message_handler(filters)
+        return self.router.message_handler(filters, timeout)
     
-    def callback_query_handler(self, filters=None):
+    def callback_query_handler(self, filters=None, timeout: Optional[float] = None):
         """Декоратор для регистрации обработчика callback запросов"""
-        return self.router.callback_query_handler(filters)
+        return self.router.callback_query_handler(filters, timeout)
+    
+    def edited_message_handler(self, filters=None, timeout: Optional[float] = None):
+        """Декоратор для регистрации обработчика измененных сообщений"""
+        return self.router.edited_message_handler(filters, timeout)
     
-    def run(self, token: str = None):
-        """Запуск бота"""
+    def channel_post_handler(self, filters=None, timeout: Optional[float] = None):
+        """Декоратор для регистрации обработчика публикаций в канале"""
+        return self.router.channel_post_handler(filters, timeout)
+    
+    def edited_channel_post_handler(self, filters=None, timeout: Optional[float] = None):
+        """Декоратор для регистрации обработчика измененных публикаций в канале"""
+        return self.router.edited_channel_post_handler(filters, timeout)
+    
+    def run(self, token: str = None, loop_settings: Optional[LoopSettings] = None, **polling_kwargs):
+        """Запуск бота
+        
+        loop_settings - настройки цикла событий; по умолчанию используется
+        uvloop, если он установлен.
+        """
         if token:
             self.token = token
         
@@ -119,6 +524,13 @@ class Dispatcher:
             raise ValueError("Token is required")
         
         try:
-            asyncio.run(self.start_polling())
+            run_loop(self.start_polling(**polling_kwargs), loop_settings)
+        except KeyboardInterrupt:
+            self.logger.info("Bot stopped")
+    
+    def run_webhook(self, loop_settings: Optional[LoopSettings] = None, **webhook_kwargs):
+        """Запуск бота в режиме webhook"""
+        try:
+            run_loop(self.start_webhook(**webhook_kwargs), loop_settings)
         except KeyboardInterrupt:
             self.logger.info("Bot stopped")
@@ -3,82 +3,347 @@
 """
 
 import asyncio
-from typing import Callable, Any, Awaitable, Union, List
+import inspect
+import time
+from typing import Callable, Any, Awaitable, Optional, Union, List, Dict, Tuple
 from .types import Update, Message, CallbackQuery
-from ..filters.base import BaseFilter
+from ..filters.base import BaseFilter, by_cost, filter_checks
+from ..tracing.tracer import current_span, span
+
+
+class HandlerTimeoutError(TimeoutError):
+    """Обработка не уложилась в отведенное время
+    
+    handler - обработчик с собственным ограничением времени
+    или None, если истекло общее время обработки обновления.
+    """
+    
+    def __init__(self, handler: Optional['Handler'], timeout: float):
+        self.handler = handler
+        self.timeout = timeout
+        name = f"Handler {handler.name}" if handler else "Update processing"
+        super().__init__(f"{name} timed out after {timeout}s")
+
+
+async def wait_for_deadline(
+    awaitable: Awaitable[Any], timeout: float, handler: Optional['Handler'] = None
+) -> Any:
+    """Ожидание с ограничением времени
+
+    HandlerTimeoutError выбрасывается, только если истекло само
+    ограничение; TimeoutError, выброшенный внутри (например, таймаут
+    запроса к API), пробрасывается без изменений.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError as e:
+        if isinstance(e, HandlerTimeoutError) or loop.time() < deadline:
+            raise
+        raise HandlerTimeoutError(handler, timeout) from None
 
 
 class Handler:
-    """Базовый класс для обработчиков"""
+    """Базовый класс для обработчиков
+    
+    update_type - тип события (поле Update), которое получает обработчик;
+    None - обработчик получает все обновления целиком.
+    
+    timeout - ограничение времени работы обработчика в секундах:
+    по его истечении обработчик отменяется и возникает HandlerTimeoutError.
+    Метрики подключаются диспетчером через instrument при сборке цепочки.
+    
+    Фильтры проверяются по возрастанию стоимости (cost). Синхронные
+    фильтры (SyncFilter) вызываются напрямую, await нужен только
+    асинхронным. Список проверок собирается в instrument, поэтому
+    фильтры, добавленные после сборки цепочки, учитываются после ее
+    пересборки.
+    """
+    
+    update_type: Optional[str] = None
     
     def __init__(
         self,
         callback: Callable[[Update], Awaitable[Any]],
-        filters: Union[BaseFilter, List[BaseFilter]] = None
+        filters: Union[BaseFilter, List[BaseFilter]] = None,
+        timeout: Optional[float] = None
     ):
         self.callback = callback
         self.filters = filters if isinstance(filters, list) else [filters] if filters else []
+        self.timeout = timeout
+        self.timeouts = 0
+        self._context_params, self._accepts_context = self._inspect_callback(callback)
+        self.instrument()
+    
+    @property
+    def name(self) -> str:
+        """Имя обработчика"""
+        return getattr(self.callback, "__qualname__", repr(self.callback))
+    
+    @staticmethod
+    def _inspect_callback(callback: Callable) -> Tuple[Tuple[str, ...], bool]:
+        """Параметры обработчика, получаемые из update.context"""
+        try:
+            parameters = list(inspect.signature(callback).parameters.values())
+        except (TypeError, ValueError):
+            return (), False
+        accepts_all = any(p.kind is p.VAR_KEYWORD for p in parameters)
+        names = tuple(
+            p.name for p in parameters[1:]
+            if p.kind in (p.POSITIONAL_OR_KEYWORD, p.KEYWORD_ONLY)
+        )
+        return names, accepts_all
+    
+    def _context_kwargs(self, update: Update) -> Dict[str, Any]:
+        """Данные контекста, запрошенные обработчиком"""
+        context = update.context
+        if self._accepts_context:
+            return context
+        return {name: context[name] for name in self._context_params if name in context}
+    
+    def instrument(self, metrics=None):
+        """Подключение метрик (BotMetrics)
+        
+        Отрезки трассы записываются только для обновлений из выборки.
+        """
+        self.latency = metrics.handler_latency(self.name) if metrics is not None else None
+        self._span_name = f"handler {self.name}"
+        filters = by_cost(self.filters)
+        self._filter_span_names = [f"filter {type(f).__name__}" for f in filters]
+        self._checks = filter_checks(filters)
+        # Только синхронные фильтры проверяются без корутины check
+        self._sync_checks = (
+            tuple(check for _, check in self._checks)
+            if all(is_sync for is_sync, _ in self._checks) else None
+        )
+    
+    async def _call(self, event: Any, update: Update) -> Any:
+        """Вызов обработчика с учетом времени работы"""
+        if current_span() is not None:
+            return await self._call_traced(event, update)
+        if self.latency is None:
+            return await self._invoke(event, update)
+        started = time.perf_counter()
+        try:
+            return await self._invoke(event, update)
+        finally:
+            self.latency.observe(time.perf_counter() - started)
+    
+    async def _call_traced(self, event: Any, update: Update) -> Any:
+        """Вызов обработчика с отрезком трассы"""
+        started = time.perf_counter()
+        try:
+            with span(self._span_name):
+                return await self._invoke(event, update)
+        finally:
+            if self.latency is not None:
+                self.latency.observe(time.perf_counter() - started)
+    
+    async def _invoke(self, event: Any, update: Update) -> Any:
+        """Вызов обработчика с данными контекста"""
+        if (self._context_params or self._accepts_context) and update.context:
+            coro = self.callback(event, **self._context_kwargs(update))
+        else:
+            coro = self.callback(event)
+        if self.timeout is None:
+            return await coro
+        
+        try:
+            return await wait_for_deadline(coro, self.timeout, self)
+        except HandlerTimeoutError as e:
+            if e.handler is self:
+                self.timeouts += 1
+            raise
     
     async def check(self, update: Update) -> bool:
         """Проверка фильтров"""
-        if not self.filters:
+        if not self._checks:
             return True
         
-        for filter_obj in self.filters:
-            if not await filter_obj.check(update):
+        if current_span() is not None:
+            return await self._check_traced(update)
+        for is_sync, check in self._checks:
+            if is_sync:
+                if not check(update):
+                    return False
+            elif not await check(update):
+                return False
+        return True
+    
+    async def _check_traced(self, update: Update) -> bool:
+        """Проверка фильтров с отрезком трассы на каждый фильтр"""
+        for (is_sync, check), name in zip(self._checks, self._filter_span_names):
+            with span(name) as filter_span:
+                passed = check(update) if is_sync else await check(update)
+                filter_span.set_attribute("passed", passed)
+            if not passed:
                 return False
         return True
     
     async def handle(self, update: Update) -> Any:
         """Обработка обновления"""
         if await self.check(update):
-            return await self.callback(update)
+            return await self._call(update, update)
         return None
+    
+    async def process(self, event: Any, update: Update) -> Any:
+        """Обработка события, уже выбранного роутером по типу обновления"""
+        sync_checks = self._sync_checks
+        if sync_checks is not None and current_span() is None:
+            for check in sync_checks:
+                if not check(update):
+                    return None
+        elif not await self.check(update):
+            return None
+        return await self._call(update if self.update_type is None else event, update)
 
 
 class MessageHandler(Handler):
     """Обработчик сообщений"""
     
+    update_type = "message"
+    
     def __init__(
         self,
         callback: Callable[[Message], Awaitable[Any]],
-        filters: Union[BaseFilter, List[BaseFilter]] = None
+        filters: Union[BaseFilter, List[BaseFilter]] = None,
+        timeout: Optional[float] = None
     ):
-        super().__init__(callback, filters)
+        super().__init__(callback, filters, timeout)
     
     async def handle(self, update: Update) -> Any:
         """Обработка сообщения"""
         if update.message and await self.check(update):
-            return await self.callback(update.message)
+            return await self._call(update.message, update)
         return None
 
 
 class CallbackQueryHandler(Handler):
     """Обработчик callback запросов"""
     
+    update_type = "callback_query"
+    
     def __init__(
         self,
         callback: Callable[[CallbackQuery], Awaitable[Any]],
-        filters: Union[BaseFilter, List[BaseFilter]] = None
+        filters: Union[BaseFilter, List[BaseFilter]] = None,
+        timeout: Optional[float] = None
     ):
-        super().__init__(callback, filters)
+        super().__init__(callback, filters, timeout)
     
     async def handle(self, update: Update) -> Any:
         """Обработка callback запроса"""
         if update.callback_query and await self.check(update):
-            return await self.callback(update.callback_query)
+            return await self._call(update.callback_query, update)
+        return None
+
+
+class EditedMessageHandler(Handler):
+    """Обработчик измененных сообщений"""
+    
+    update_type = "edited_message"
+    
+    def __init__(
+        self,
+        callback: Callable[[Message], Awaitable[Any]],
+        filters: Union[BaseFilter, List[BaseFilter]] = None,
+        timeout: Optional[float] = None
+    ):
+        super().__init__(callback, filters, timeout)
+    
+    async def handle(self, update: Update) -> Any:
+        """Обработка измененного сообщения"""
+        if update.edited_message and await self.check(update):
+            return await self._call(update.edited_message, update)
+        return None
+
+
+class ChannelPostHandler(Handler):
+    """Обработчик публикаций в канале"""
+    
+    update_type = "channel_post"
+    
+    def __init__(
+        self,
+        callback: Callable[[Message], Awaitable[Any]],
+        filters: Union[BaseFilter, List[BaseFilter]] = None,
+        timeout: Optional[float] = None
+    ):
+        super().__init__(callback, filters, timeout)
+    
+    async def handle(self, update: Update) -> Any:
+        """Обработка публикации в канале"""
+        if update.channel_post and await self.check(update):
+            return await self._call(update.channel_post, update)
+        return None
+
+
+class EditedChannelPostHandler(Handler):
+    """Обработчик измененных публикаций в канале"""
+    
+    update_type = "edited_channel_post"
+    
+    def __init__(
+        self,
+        callback: Callable[[Message], Awaitable[Any]],
+        filters: Union[BaseFilter, List[BaseFilter]] = None,
+        timeout: Optional[float] = None
+    ):
+        super().__init__(callback, filters, timeout)
+    
+    async def handle(self, update: Update) -> Any:
+        """Обработка измененной публикации в канале"""
+        if update.edited_channel_post and await self.check(update):
+            return await self._call(update.edited_channel_post, update)
         return None
 
 
-def message_handler(filters: Union[BaseFilter, List[BaseFilter]] = None):
+def message_handler(
+    filters: Union[BaseFilter, List[BaseFilter]] = None,
+    timeout: Optional[float] = None
+):
     """Декоратор для обработчиков сообщений"""
     def decorator(func: Callable[[Message], Awaitable[Any]]) -> MessageHandler:
-        return MessageHandler(func, filters)
+        return MessageHandler(func, filters, timeout)
     return decorator
 
 
-def callback_query_handler(filters: Union[BaseFilter, List[BaseFilter]] = None):
+def callback_query_handler(
+    filters: Union[BaseFilter, List[BaseFilter]] = None,
+    timeout: Optional[float] = None
+):
     """Декоратор для обработчиков callback запросов"""
     def decorator(func: Callable[[CallbackQuery], Awaitable[Any]]) -> CallbackQueryHandler:
-        return CallbackQueryHandler(func, filters)
+        return CallbackQueryHandler(func, filters, timeout)
+    return decorator
+
+
+def edited_message_handler(
+    filters: Union[BaseFilter, List[BaseFilter]] = None,
+    timeout: Optional[float] = None
+):
+    """Декоратор для обработчиков измененных сообщений"""
+    def decorator(func: Callable[[Message], Awaitable[Any]]) -> EditedMessageHandler:
+        return EditedMessageHandler(func, filters, timeout)
+    return decorator
+
+
+def channel_post_handler(
+    filters: Union[BaseFilter, List[BaseFilter]] = None,
+    timeout: Optional[float] = None
+):
+    """Декоратор для обработчиков публикаций в канале"""
+    def decorator(func: Callable[[Message], Awaitable[Any]]) -> ChannelPostHandler:
+        return ChannelPostHandler(func, filters, timeout)
+    return decorator
+
+
+def edited_channel_post_handler(
+    filters: Union[BaseFilter, List[BaseFilter]] = None,
+    timeout: Optional[float] = None
+):
+    """Декоратор для обработчиков измененных публикаций в канале"""
+    def decorator(func: Callable[[Message], Awaitable[Any]]) -> EditedChannelPostHandler:
+        return EditedChannelPostHandler(func, filters, timeout)
     return decorator
@@ -0,0 +1,234 @@
+"""
+Запуск множества ботов в одном процессе
+"""
+
+import asyncio
+import hashlib
+import logging
+from typing import Callable, Dict, Optional, Union, TYPE_CHECKING
+from .dispatcher import Dispatcher
+from .polling import PollingPolicy
+from .router import Router
+from ..utils.http_client import MaxAPIClient
+from ..utils.loop import LoopSettings, run as run_loop
+
+if TYPE_CHECKING:
+    import aiohttp
+
+
+class BotHost:
+    """Хост для множества ботов
+
+    Все боты работают в одном цикле событий и используют общий пул
+    HTTP соединений. У каждого бота свой набор роутеров и свой offset.
+    Обработка обновлений ограничена общим лимитом concurrency, а доля
+    одного бота в нем - bot_concurrency, поэтому активный бот не может
+    занять все слоты и задержать остальных.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = 100,
+        bot_concurrency: int = 4,
+        max_pending: int = 100,
+        connection_limit: Optional[int] = None
+    ):
+        self.concurrency = concurrency
+        self.bot_concurrency = bot_concurrency
+        self.max_pending = max_pending
+        self.connection_limit = connection_limit
+        self.bots: Dict[str, Dispatcher] = {}
+        self.logger = logging.getLogger(__name__)
+
+        self.session: Optional['aiohttp.ClientSession'] = None
+        self.limiter: Optional[asyncio.Semaphore] = None
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._webhooks: Dict[str, object] = {}
+        self._closing: Optional[asyncio.Event] = None
+
+    @staticmethod
+    def bot_name(token: str) -> str:
+        """Имя бота по умолчанию, не раскрывающее токен"""
+        return hashlib.sha256(token.encode()).hexdigest()[:16]
+
+    def add_bot(
+        self,
+        token: str,
+        dispatcher: Optional[Dispatcher] = None,
+        name: Optional[str] = None
+    ) -> Dispatcher:
+        """Добавление бота
+
+        Можно передать готовый диспетчер или настроить возвращенный:
+        dp = host.add_bot(token); dp.include_router(router)
+        """
+        if dispatcher is None:
+            dispatcher = Dispatcher(token)
+        dispatcher.token = token
+        name = name or self.bot_name(token)
+        if name in self.bots:
+            raise ValueError(f"Bot {name!r} is already registered")
+        dispatcher.name = dispatcher.name or name
+        self.bots[name] = dispatcher
+        return dispatcher
+
+    def add_router(
+        self,
+        token: str,
+        *routers: Union[Router, Callable[[], Router]],
+        name: Optional[str] = None
+    ) -> Dispatcher:
+        """Добавление бота с набором роутеров
+
+        Роутер можно включить только в одного бота, поэтому для общих
+        обработчиков передается фабрика: функция, которая создает новый
+        Router при каждом вызове. Пути импорта не принимаются: они
+        указывают на один роутер модуля, который достался бы только
+        первому боту. Если роутер уже включен в другого бота, ValueError
+        выбрасывается сразу, и бот не добавляется.
+        """
+        created = []
+        for router in routers:
+            if isinstance(router, str):
+                raise TypeError(
+                    f"BotHost.add_router does not accept import paths ({router!r}), "
+                    "pass a Router or a factory that creates one"
+                )
+            if callable(router) and not isinstance(router, Router):
+                router = router()
+            if router.parent is not None:
+                raise ValueError(
+                    f"Router {router.name!r} is already included in {router.parent.name!r}"
+                )
+            if any(router is other for other in created):
+                raise ValueError(f"Router {router.name!r} is passed twice")
+            created.append(router)
+
+        dispatcher = self.add_bot(token, name=name)
+        for router in created:
+            dispatcher.include_router(router)
+        return dispatcher
+
+    def _create_session(self) -> 'aiohttp.ClientSession':
+        """Общая HTTP сессия
+
+        Каждый long polling запрос занимает соединение на все время
+        ожидания, поэтому по умолчанию пул рассчитан на все боты
+        плюс запросы из обработчиков.
+        """
+        import aiohttp
+        limit = self.connection_limit or len(self.bots) + self.concurrency
+        return aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=limit))
+
+    async def _run_bot(self, name: str, dispatcher: Dispatcher, **polling_kwargs):
+        """Polling одного бота"""
+        try:
+            await dispatcher.start_polling(
+                concurrency=self.bot_concurrency,
+                max_pending=self.max_pending,
+                session=self.session,
+                limiter=self.limiter,
+                **polling_kwargs
+            )
+        except Exception as e:
+            self.logger.error(f"Bot {name} stopped with error: {e}")
+
+    async def start_polling(self, timeout: int = 30, limit: int = 100, prefetch: int = 1):
+        """Запуск polling для всех ботов"""
+        if not self.bots:
+            raise ValueError("No bots registered")
+
+        self.limiter = asyncio.Semaphore(self.concurrency)
+        async with self._create_session() as self.session:
+            for name, dispatcher in self.bots.items():
+                self._tasks[name] = asyncio.create_task(self._run_bot(
+                    name,
+                    dispatcher,
+                    policy=PollingPolicy(timeout=timeout, limit=limit),
+                    prefetch=prefetch
+                ))
+            self.logger.info(f"Polling started for {len(self.bots)} bots")
+            try:
+                await asyncio.gather(*self._tasks.values())
+            finally:
+                for dispatcher in self.bots.values():
+                    dispatcher.stop_polling()
+                self._tasks.clear()
+
+    async def start_webhook(
+        self,
+        host: str = "0.0.0.0",
+        port: int = 8080,
+        path_prefix: str = "/webhook",
+        secret: Optional[str] = None,
+        queue_size: int = 1000,
+        drain_timeout: float = 30.0
+    ):
+        """Прием обновлений всех ботов одним webhook сервером
+
+        Обновления бота принимаются по адресу {path_prefix}/{name}.
+        """
+        from aiohttp import web
+        from ..webhook.server import WebhookServer
+
+        if not self.bots:
+            raise ValueError("No bots registered")
+
+        self.limiter = asyncio.Semaphore(self.concurrency)
+        self._closing = asyncio.Event()
+        app = web.Application()
+        async with self._create_session() as self.session:
+            for name, dispatcher in self.bots.items():
+                server = WebhookServer(
+                    dispatcher,
+                    path=f"{path_prefix.rstrip('/')}/{name}",
+                    secret=secret,
+                    queue_size=queue_size,
+                    concurrency=self.bot_concurrency,
+                    max_pending=self.max_pending,
+                    limiter=self.limiter
+                )
+                dispatcher.webhook_server = server
+                dispatcher.scheduler = server.scheduler
+                dispatcher.build_pipeline()
+                dispatcher.api_client = MaxAPIClient(
+                    dispatcher.token, session=self.session, metrics=dispatcher.metrics
+                )
+                app.router.add_post(server.path, server.handle)
+                self._webhooks[name] = server
+
+            runner = web.AppRunner(app)
+            await runner.setup()
+            await web.TCPSite(runner, host, port).start()
+            for server in self._webhooks.values():
+                server.start_processing()
+            self.logger.info(f"Webhook server for {len(self.bots)} bots listening on {host}:{port}")
+            try:
+                await self._closing.wait()
+            finally:
+                await asyncio.gather(*(
+                    server.stop_processing(drain_timeout) for server in self._webhooks.values()
+                ))
+                await runner.cleanup()
+                self._webhooks.clear()
+
+    def stop(self):
+        """Остановка всех ботов"""
+        for dispatcher in self.bots.values():
+            dispatcher.stop_polling()
+        if self._closing is not None:
+            self._closing.set()
+
+    def run(self, loop_settings: Optional[LoopSettings] = None, **polling_kwargs):
+        """Запуск polling для всех ботов"""
+        try:
+            run_loop(self.start_polling(**polling_kwargs), loop_settings)
+        except KeyboardInterrupt:
+            self.logger.info("Bot host stopped")
+
+    def run_webhook(self, loop_settings: Optional[LoopSettings] = None, **webhook_kwargs):
+        """Запуск webhook сервера для всех ботов"""
+        try:
+            run_loop(self.start_webhook(**webhook_kwargs), loop_settings)
+        except KeyboardInterrupt:
+            self.logger.info("Bot host stopped")
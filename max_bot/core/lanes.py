@@ -0,0 +1,180 @@
+"""
+Приоритетные полосы обработки обновлений
+"""
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Deque, Dict, Optional, Tuple
+from .types import Update
+
+
+# Полосы в порядке убывания срочности и их веса по умолчанию
+DEFAULT_LANE_WEIGHTS: Dict[str, int] = {
+    "callback_query": 8,
+    "command": 4,
+    "message": 2,
+    "edited_message": 1,
+    "channel_post": 1,
+    "edited_channel_post": 1,
+}
+
+
+def get_update_lane(update: Update) -> str:
+    """Полоса обработки для обновления"""
+    if update.callback_query is not None:
+        return "callback_query"
+    if update.message is not None:
+        text = update.message.text
+        if text and text.startswith("/"):
+            return "command"
+        return "message"
+    if update.edited_message is not None:
+        return "edited_message"
+    if update.edited_channel_post is not None:
+        return "edited_channel_post"
+    return "channel_post"
+
+
+@dataclass
+class LaneStats:
+    """Статистика ожидания в полосе"""
+    acquired: int = 0
+    waiting: int = 0
+    total_wait_time: float = 0.0
+    max_wait_time: float = 0.0
+    starvation_grants: int = 0
+
+    def record(self, wait_time: float):
+        """Учет выданного слота"""
+        self.acquired += 1
+        self.total_wait_time += wait_time
+        if wait_time > self.max_wait_time:
+            self.max_wait_time = wait_time
+
+    @property
+    def avg_wait_time(self) -> float:
+        """Среднее время ожидания слота"""
+        return self.total_wait_time / self.acquired if self.acquired else 0.0
+
+
+class PriorityLimiter:
+    """Ограничение одновременной обработки с приоритетными полосами
+
+    Освободившийся слот отдается ожидающим полосам по взвешенному
+    циклическому алгоритму (smooth weighted round-robin): полоса с весом 8
+    получает слоты в 8 раз чаще полосы с весом 1, но не забирает их все.
+    Если первый ожидающий в какой-либо полосе ждет дольше max_wait
+    секунд, слот отдается ему вне очереди, так что полосы с малым
+    весом не голодают.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        weights: Optional[Dict[str, int]] = None,
+        max_wait: float = 5.0
+    ):
+        if capacity < 1:
+            raise ValueError("capacity must be positive")
+
+        self.capacity = capacity
+        self.weights = dict(weights or DEFAULT_LANE_WEIGHTS)
+        if any(weight < 1 for weight in self.weights.values()):
+            raise ValueError("Lane weights must be positive")
+        self.max_wait = max_wait
+        self.stats: Dict[str, LaneStats] = {lane: LaneStats() for lane in self.weights}
+
+        self._free = capacity
+        self._waiters: Dict[str, Deque[Tuple[float, asyncio.Future]]] = {
+            lane: deque() for lane in self.weights
+        }
+        self._current: Dict[str, int] = {lane: 0 for lane in self.weights}
+
+    def _lane(self, lane: str) -> str:
+        """Регистрация неизвестной полосы с весом 1"""
+        if lane not in self.weights:
+            self.weights[lane] = 1
+            self.stats[lane] = LaneStats()
+            self._waiters[lane] = deque()
+            self._current[lane] = 0
+        return lane
+
+    @property
+    def in_use(self) -> int:
+        """Количество занятых слотов"""
+        return self.capacity - self._free
+
+    async def acquire(self, lane: str):
+        """Получение слота для полосы"""
+        lane = self._lane(lane)
+        stats = self.stats[lane]
+        if self._free and not any(self._waiters.values()):
+            self._free -= 1
+            stats.record(0.0)
+            return
+
+        started = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        waiter = (started, future)
+        self._waiters[lane].append(waiter)
+        stats.waiting += 1
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Слот уже был выдан, возвращаем его
+                self.release()
+            elif waiter in self._waiters[lane]:
+                self._waiters[lane].remove(waiter)
+            raise
+        finally:
+            stats.waiting -= 1
+        stats.record(time.monotonic() - started)
+
+    def release(self):
+        """Освобождение слота"""
+        while True:
+            lane = self._next_lane()
+            if lane is None:
+                self._free += 1
+                return
+            _, future = self._waiters[lane].popleft()
+            # Отмененный, но еще не снятый с очереди ожидающий пропускается
+            if not future.done():
+                future.set_result(None)
+                return
+
+    def _next_lane(self) -> Optional[str]:
+        """Выбор полосы, которой достанется освободившийся слот"""
+        active = [lane for lane, waiters in self._waiters.items() if waiters]
+        if not active:
+            return None
+
+        now = time.monotonic()
+        oldest = min(active, key=lambda lane: self._waiters[lane][0][0])
+        if now - self._waiters[oldest][0][0] >= self.max_wait:
+            self.stats[oldest].starvation_grants += 1
+            return oldest
+
+        total = 0
+        best = None
+        for lane in active:
+            weight = self.weights[lane]
+            self._current[lane] += weight
+            total += weight
+            if best is None or self._current[lane] > self._current[best]:
+                best = lane
+        self._current[best] -= total
+        return best
+
+    @asynccontextmanager
+    async def slot(self, lane: str):
+        """Слот обработки на время блока async with"""
+        await self.acquire(lane)
+        try:
+            yield
+        finally:
+            self.release()
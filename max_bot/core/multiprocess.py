@@ -0,0 +1,425 @@
+"""
+Многопроцессный запуск бота с распределением обновлений по чатам
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import time
+import zlib
+from contextlib import asynccontextmanager
+from multiprocessing.connection import Connection, wait
+from typing import Any, Callable, Dict, List, Optional, Union
+from .polling import PollingPolicy, PollingStats
+from .scheduler import OffsetTracker, UpdateScheduler, get_update_key
+from .types import Update
+from ..storage.offset import BaseOffsetStore, OffsetCheckpointer, offset_key
+from ..utils.http_client import MaxAPIClient
+from ..utils.imports import import_object
+from ..utils.loop import LoopSettings, run as run_loop
+
+
+DispatcherFactory = Union[str, Callable[[], Any]]
+
+
+def load_dispatcher(factory: DispatcherFactory):
+    """Создание диспетчера по фабрике или пути импорта
+
+    Путь может указывать как на готовый Dispatcher, так и на функцию,
+    которая его создает.
+    """
+    obj = import_object(factory) if isinstance(factory, str) else factory
+    if callable(obj) and not hasattr(obj, "process_update"):
+        obj = obj()
+    return obj
+
+
+def get_shard(update: Update, shards: int) -> int:
+    """Номер рабочего процесса для обновления
+
+    Хеш стабилен между запусками, поэтому обновления одного чата
+    всегда попадают в один процесс.
+    """
+    key = get_update_key(update)
+    return zlib.crc32(repr(key).encode()) % shards
+
+
+def _worker_main(
+    index: int,
+    factory: DispatcherFactory,
+    concurrency: int,
+    inbox: multiprocessing.Queue,
+    acks: Connection,
+    counters,
+    loop_settings: Optional[LoopSettings] = None
+):
+    """Точка входа рабочего процесса"""
+    run_loop(_worker_loop(index, factory, concurrency, inbox, acks, counters), loop_settings)
+
+
+async def _worker_loop(index, factory, concurrency, inbox, acks, counters):
+    """Обработка обновлений, полученных от главного процесса"""
+    dp = load_dispatcher(factory)
+    dp.build_pipeline()
+    logger = logging.getLogger(__name__)
+    loop = asyncio.get_running_loop()
+
+    async def process(update: Update):
+        try:
+            await dp.process_update(update)
+        finally:
+            counters[index] += 1
+            acks.send(update.update_id)
+
+    scheduler = UpdateScheduler(process, max_concurrency=concurrency, track_offset=False)
+
+    async def consume():
+        while True:
+            update = await loop.run_in_executor(None, inbox.get)
+            if update is None:
+                break
+            await scheduler.submit(update)
+        await scheduler.join()
+
+    logger.info(f"Worker {index} started")
+    if dp.token:
+        async with MaxAPIClient(dp.token) as dp.api_client:
+            await consume()
+    else:
+        await consume()
+    logger.info(f"Worker {index} stopped")
+
+
+class ShardedRunner:
+    """Многопроцессный запуск одного бота
+
+    Главный процесс получает обновления и распределяет их по рабочим
+    процессам по хешу чата, поэтому порядок внутри чата сохраняется.
+    Каждый рабочий процесс создает свой диспетчер через factory - функцию
+    или путь импорта вида "package.module:create_dispatcher", доступный
+    в дочернем процессе. Упавшие процессы перезапускаются, а
+    неподтвержденные ими обновления передаются новому процессу.
+
+    start получает обновления через long polling. Обновления из своего
+    webhook обработчика передаются процессам через feed внутри блока
+    async with runner.running().
+    """
+
+    def __init__(
+        self,
+        factory: DispatcherFactory,
+        token: str,
+        workers: int = None,
+        concurrency: int = 10,
+        max_pending: int = 1000,
+        policy: Optional[PollingPolicy] = None,
+        check_interval: float = 1.0,
+        report_interval: float = 60.0,
+        offset_store: Optional[BaseOffsetStore] = None,
+        checkpoint_interval: float = 1.0,
+        loop_settings: Optional[LoopSettings] = None
+    ):
+        if not token:
+            raise ValueError("Token is required")
+
+        self.factory = factory
+        self.token = token
+        self.workers = workers or multiprocessing.cpu_count()
+        self.concurrency = concurrency
+        self.max_pending = max_pending
+        self.policy = policy or PollingPolicy()
+        self.check_interval = check_interval
+        self.report_interval = report_interval
+        self.offset_store = offset_store
+        self.checkpoint_interval = checkpoint_interval
+        self.loop_settings = loop_settings
+        self.logger = logging.getLogger(__name__)
+
+        self.tracker = OffsetTracker()
+        self.polling_stats = PollingStats()
+        self.restarts = 0
+
+        self._context = multiprocessing.get_context("spawn")
+        # У каждого процесса свой канал подтверждений: процесс, упавший
+        # во время записи в общую очередь, оставил бы ее заблокированной
+        self._acks: List[Optional[Connection]] = []
+        self._counters = self._context.Array("q", self.workers, lock=False)
+        self._inboxes: List[multiprocessing.Queue] = []
+        self._processes: List[multiprocessing.Process] = []
+        self._unacked: List[Dict[int, Update]] = [{} for _ in range(self.workers)]
+        self._progress = asyncio.Event()
+        self._request: Optional[asyncio.Task] = None
+        self._running = False
+        self._stopping = False
+
+    def _spawn(self, index: int):
+        """Запуск рабочего процесса с новой очередью"""
+        inbox = self._context.Queue()
+        acks, worker_acks = self._context.Pipe(duplex=False)
+        process = self._context.Process(
+            target=_worker_main,
+            args=(
+                index, self.factory, self.concurrency, inbox, worker_acks, self._counters,
+                self.loop_settings
+            ),
+            name=f"max-bot-worker-{index}",
+            daemon=True
+        )
+        process.start()
+        worker_acks.close()
+        if index < len(self._processes):
+            self._inboxes[index] = inbox
+            self._acks[index] = acks
+            self._processes[index] = process
+        else:
+            self._inboxes.append(inbox)
+            self._acks.append(acks)
+            self._processes.append(process)
+
+    def start_workers(self):
+        """Запуск всех рабочих процессов"""
+        for index in range(self.workers):
+            self._spawn(index)
+        self.logger.info(f"Started {self.workers} worker processes")
+
+    def _restart(self, index: int):
+        """Перезапуск упавшего процесса
+
+        Новый процесс получает чистую очередь, в которую заново
+        отправляются все неподтвержденные обновления шарда по порядку.
+        """
+        old_inbox = self._inboxes[index]
+        old_inbox.cancel_join_thread()
+        old_inbox.close()
+        self._read_acks(index)
+        if self._acks[index] is not None:
+            self._acks[index].close()
+
+        self.restarts += 1
+        self.logger.warning(
+            f"Worker {index} exited with code {self._processes[index].exitcode}, restarting"
+        )
+        self._spawn(index)
+        for update_id in sorted(self._unacked[index]):
+            self._inboxes[index].put(self._unacked[index][update_id])
+
+    async def feed(self, update: Update) -> bool:
+        """Передача обновления рабочему процессу"""
+        if not self.tracker.register(update.update_id):
+            return False
+        while self.tracker.pending > self.max_pending:
+            self._progress.clear()
+            await self._progress.wait()
+
+        shard = get_shard(update, self.workers)
+        self._unacked[shard][update.update_id] = update
+        self._inboxes[shard].put(update)
+        return True
+
+    def _ack(self, update_id: int):
+        """Учет обработанного обновления"""
+        for unacked in self._unacked:
+            if unacked.pop(update_id, None) is not None:
+                break
+        self.tracker.done(update_id)
+        self._progress.set()
+
+    def _read_acks(self, index: int):
+        """Чтение всех доступных подтверждений процесса
+
+        Канал завершившегося процесса закрывается, новый создается
+        при перезапуске.
+        """
+        connection = self._acks[index]
+        if connection is None:
+            return
+        try:
+            while connection.poll():
+                self._ack(connection.recv())
+        except (EOFError, OSError):
+            connection.close()
+            self._acks[index] = None
+
+    async def _collect_acks(self):
+        """Получение подтверждений от рабочих процессов"""
+        loop = asyncio.get_running_loop()
+        while True:
+            connections = [c for c in self._acks if c is not None]
+            if not connections:
+                await asyncio.sleep(self.check_interval)
+                continue
+            try:
+                ready = await loop.run_in_executor(None, wait, connections, 0.5)
+            except (OSError, ValueError):
+                # Канал закрыт при перезапуске процесса во время ожидания
+                continue
+            for index, connection in enumerate(self._acks):
+                if connection is not None and connection in ready:
+                    self._read_acks(index)
+
+    async def _supervise(self):
+        """Перезапуск упавших рабочих процессов"""
+        while True:
+            await asyncio.sleep(self.check_interval)
+            if self._stopping:
+                continue
+            for index, process in enumerate(self._processes):
+                if not process.is_alive():
+                    self._restart(index)
+
+    async def _report(self):
+        """Периодический отчет о пропускной способности процессов"""
+        previous = list(self._counters)
+        started = time.monotonic()
+        while True:
+            await asyncio.sleep(self.report_interval)
+            now = time.monotonic()
+            current = list(self._counters)
+            rates = [
+                (c - p) / (now - started) for c, p in zip(current, previous)
+            ]
+            self.logger.info(
+                "Worker throughput, updates/s: "
+                + ", ".join(f"#{i}={rate:.1f}" for i, rate in enumerate(rates))
+            )
+            previous, started = current, now
+
+    def worker_stats(self) -> List[int]:
+        """Количество обработанных обновлений по процессам"""
+        return list(self._counters)
+
+    async def _poll(self):
+        """Получение обновлений через long polling"""
+        async with MaxAPIClient(self.token) as client:
+            while self._running:
+                try:
+                    started = time.monotonic()
+                    self._request = asyncio.ensure_future(client.get_updates(
+                        offset=self.tracker.offset,
+                        limit=self.policy.next_limit(self.max_pending - self.tracker.pending),
+                        timeout=self.policy.timeout
+                    ))
+                    try:
+                        updates = await self._request
+                    finally:
+                        self._request = None
+                    self.polling_stats.record(len(updates), time.monotonic() - started)
+                    self.policy.on_success()
+                except asyncio.CancelledError:
+                    # Запрос прерван в stop, отмена самого _poll пробрасывается
+                    if self._running:
+                        raise
+                    break
+                except Exception as e:
+                    self.polling_stats.record_error()
+                    delay = self.policy.on_error()
+                    self.logger.error(f"Polling error: {e}, retry in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+                    continue
+
+                accepted = 0
+                for update in updates:
+                    if await self.feed(update):
+                        accepted += 1
+                if updates and not accepted and self.tracker.pending:
+                    self._progress.clear()
+                    await self._progress.wait()
+                elif not updates:
+                    delay = self.policy.empty_delay()
+                    if delay:
+                        await asyncio.sleep(delay)
+
+    @asynccontextmanager
+    async def running(self, drain_timeout: float = 30.0):
+        """Рабочие процессы на время блока async with
+
+        Внутри блока обновления передаются процессам через feed, например,
+        из webhook обработчика. На выходе процессы дорабатывают
+        отправленные им обновления (не дольше drain_timeout секунд).
+        """
+        self._stopping = False
+        self.start_workers()
+        background = [
+            asyncio.create_task(self._collect_acks()),
+            asyncio.create_task(self._supervise()),
+            asyncio.create_task(self._report()),
+        ]
+        try:
+            yield self
+        finally:
+            await self.shutdown(drain_timeout)
+            for task in background:
+                task.cancel()
+            await asyncio.gather(*background, return_exceptions=True)
+            self._drain_acks()
+
+    async def start(self, drain_timeout: float = 30.0):
+        """Запуск рабочих процессов и получения обновлений"""
+        checkpointer = None
+        if self.offset_store is not None:
+            checkpointer = OffsetCheckpointer(
+                self.offset_store,
+                offset_key(self.token),
+                lambda: self.tracker.offset,
+                self.checkpoint_interval
+            )
+            self.tracker = OffsetTracker(await checkpointer.load())
+
+        self._running = True
+        checkpoint_task = None
+        if checkpointer is not None:
+            checkpoint_task = asyncio.create_task(checkpointer.run())
+        try:
+            async with self.running(drain_timeout):
+                await self._poll()
+        finally:
+            if checkpoint_task is not None:
+                checkpoint_task.cancel()
+                await asyncio.gather(checkpoint_task, return_exceptions=True)
+                await checkpointer.commit()
+                self.logger.info(f"Offset {checkpointer.committed} committed")
+
+    def _drain_acks(self):
+        """Учет подтверждений, оставшихся в каналах после остановки"""
+        for index in range(len(self._acks)):
+            self._read_acks(index)
+
+    def stop(self):
+        """Запрос остановки
+
+        Текущий запрос getUpdates прерывается, не дожидаясь таймаута
+        long polling, после чего процессы останавливаются в start.
+        """
+        self._running = False
+        if self._request is not None:
+            self._request.cancel()
+
+    async def shutdown(self, timeout: float = 30.0):
+        """Согласованная остановка рабочих процессов
+
+        Процессы получают сигнал остановки после всех отправленных
+        обновлений и завершаются, обработав их; не успевшие за
+        timeout секунд процессы принудительно останавливаются.
+        """
+        self._running = False
+        self._stopping = True
+        for inbox in self._inboxes:
+            inbox.put(None)
+
+        deadline = time.monotonic() + timeout
+        loop = asyncio.get_running_loop()
+        for index, process in enumerate(self._processes):
+            remaining = max(deadline - time.monotonic(), 0)
+            await loop.run_in_executor(None, process.join, remaining)
+            if process.is_alive():
+                self.logger.warning(f"Worker {index} did not stop in time, terminating")
+                process.terminate()
+                await loop.run_in_executor(None, process.join)
+        self.logger.info(f"Workers stopped, processed: {self.worker_stats()}")
+
+    def run(self, drain_timeout: float = 30.0):
+        """Запуск в текущем процессе до прерывания"""
+        try:
+            run_loop(self.start(drain_timeout), self.loop_settings)
+        except KeyboardInterrupt:
+            self.logger.info("Sharded runner stopped")
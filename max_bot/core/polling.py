@@ -0,0 +1,111 @@
+"""
+Политика long polling и статистика запросов getUpdates
+"""
+
+import random
+from dataclasses import dataclass
+
+
+@dataclass
+class PollingStats:
+    """Статистика запросов getUpdates"""
+    polls: int = 0
+    empty_polls: int = 0
+    errors: int = 0
+    updates: int = 0
+    last_batch_size: int = 0
+    last_wait_time: float = 0.0
+    total_wait_time: float = 0.0
+    queue_depth: int = 0
+    max_queue_depth: int = 0
+
+    def record(self, batch_size: int, wait_time: float):
+        """Учет успешного запроса"""
+        self.polls += 1
+        self.updates += batch_size
+        self.last_batch_size = batch_size
+        self.last_wait_time = wait_time
+        self.total_wait_time += wait_time
+        if not batch_size:
+            self.empty_polls += 1
+
+    def record_queue_depth(self, depth: int):
+        """Учет глубины очереди предзагруженных пачек"""
+        self.queue_depth = depth
+        if depth > self.max_queue_depth:
+            self.max_queue_depth = depth
+
+    def record_error(self):
+        """Учет неудачного запроса"""
+        self.errors += 1
+
+    @property
+    def empty_ratio(self) -> float:
+        """Доля пустых ответов"""
+        return self.empty_polls / self.polls if self.polls else 0.0
+
+    @property
+    def avg_batch_size(self) -> float:
+        """Средний размер пачки обновлений"""
+        return self.updates / self.polls if self.polls else 0.0
+
+    @property
+    def avg_wait_time(self) -> float:
+        """Среднее время ожидания ответа"""
+        return self.total_wait_time / self.polls if self.polls else 0.0
+
+
+class PollingPolicy:
+    """Политика запросов getUpdates
+
+    timeout передается серверу для long polling, поэтому при отсутствии
+    обновлений ожидание происходит на стороне сервера, а не в цикле.
+    limit подстраивается под свободное место в очереди обработки:
+    не запрашиваем больше обновлений, чем можем принять без ожидания.
+    После ошибок применяется экспоненциальная задержка с разбросом.
+    """
+
+    def __init__(
+        self,
+        timeout: int = 30,
+        limit: int = 100,
+        min_limit: int = 1,
+        idle_delay: float = 1.0,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0
+    ):
+        if not 1 <= min_limit <= limit:
+            raise ValueError("min_limit must be between 1 and limit")
+
+        self.timeout = timeout
+        self.max_limit = limit
+        self.min_limit = min_limit
+        self.idle_delay = idle_delay
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._failures = 0
+
+    def next_limit(self, capacity: int = None) -> int:
+        """Лимит для следующего запроса"""
+        limit = self.max_limit
+        if capacity is not None:
+            limit = min(limit, capacity)
+        return max(limit, self.min_limit)
+
+    def on_success(self):
+        """Сброс задержки после успешного запроса"""
+        self._failures = 0
+
+    def on_error(self) -> float:
+        """Задержка перед повтором после ошибки"""
+        delay = min(self.backoff_base * 2 ** self._failures, self.backoff_max)
+        self._failures += 1
+        return delay * random.uniform(0.5, 1.0)
+
+    def empty_delay(self) -> float:
+        """Задержка после пустого ответа
+
+        При long polling сервер сам ждет обновлений, задержка нужна
+        только при timeout=0.
+        """
+        return 0.0 if self.timeout > 0 else self.idle_delay
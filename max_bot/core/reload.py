@@ -0,0 +1,237 @@
+"""
+Перезагрузка роутеров без остановки бота
+"""
+
+import asyncio
+import importlib
+import logging
+import os
+import signal
+import sys
+from types import ModuleType
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from .router import Router
+from ..utils.imports import import_object, split_import_path
+
+
+# Сигнал перезагрузки по умолчанию (на Windows его нет)
+DEFAULT_SIGNAL = getattr(signal, "SIGHUP", None)
+
+
+class RouterReloader:
+    """Замена роутеров, включенных по пути импорта, после изменения их модулей
+
+    Отслеживаются пакеты с модулями роутеров, включенных в диспетчер
+    по пути ("bot.admin:router" - пакет bot), и пакеты из packages. Измененные
+    модули и модули, которые импортируют из них объекты, загружаются
+    заново, из них собирается новое дерево и новая цепочка обработки.
+    Цепочка диспетчера заменяется одним присваиванием: обновления,
+    которые уже в обработке, дорабатывают на старом дереве со старыми
+    модулями, новые идут в новое. Если загрузка или сборка не удалась,
+    модули, дерево и цепочка остаются прежними.
+
+    Состояние middleware диспетчера, offset и хранилища не затрагиваются.
+    Данные в глобальных переменных перезагруженных модулей создаются
+    заново, поэтому долгоживущее состояние (DialogManager и т.п.) стоит
+    держать вне модулей с обработчиками.
+
+    Проверка изменений - по времени изменения файлов раз в interval
+    секунд (0 - без опроса) и по сигналу signal (SIGHUP по умолчанию,
+    None - без сигнала).
+    """
+
+    def __init__(
+        self,
+        dispatcher,
+        packages: Iterable[str] = (),
+        interval: float = 1.0,
+        signal: Optional[int] = DEFAULT_SIGNAL
+    ):
+        self.dispatcher = dispatcher
+        self.packages = list(packages)
+        self.interval = interval
+        self.signal = signal
+        self.reloads = 0
+        self.failures = 0
+        self.last_error: Optional[BaseException] = None
+        self.logger = logging.getLogger(__name__)
+        self._mtimes: Dict[str, Optional[int]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._signal_loop: Optional[asyncio.AbstractEventLoop] = None
+        self.snapshot()
+
+    def watched_packages(self) -> Set[str]:
+        """Пакеты и модули, изменения в которых отслеживаются"""
+        packages = set(self.packages)
+        for router in self.dispatcher.router.iter_routers():
+            paths = [path for _, path in router._lazy_children]
+            paths.extend(child.import_path for child in router.children if child.import_path)
+            for path in paths:
+                # Пакет модуля роутера: обработчики обычно импортируют
+                # клавиатуры и тексты из соседних модулей
+                module_name = split_import_path(path)[0]
+                packages.add(module_name.rpartition(".")[0] or module_name)
+        return packages
+
+    def watched_modules(self) -> Dict[str, ModuleType]:
+        """Загруженные модули отслеживаемых пакетов"""
+        packages = self.watched_packages()
+        return {
+            name: module for name, module in list(sys.modules.items())
+            if module is not None and getattr(module, "__file__", None)
+            and (name in packages or any(name.startswith(p + ".") for p in packages))
+        }
+
+    @staticmethod
+    def _mtime(module: ModuleType) -> Optional[int]:
+        try:
+            return os.stat(module.__file__).st_mtime_ns
+        except OSError:
+            return None
+
+    def snapshot(self):
+        """Запоминание времени изменения отслеживаемых модулей"""
+        self._mtimes = {
+            name: self._mtime(module) for name, module in self.watched_modules().items()
+        }
+
+    def changed_modules(self) -> List[str]:
+        """Модули, файлы которых изменились после последней проверки"""
+        return [
+            name for name, module in self.watched_modules().items()
+            if name in self._mtimes and self._mtime(module) != self._mtimes[name]
+        ]
+
+    @staticmethod
+    def _dependents(modules: Dict[str, ModuleType], changed: Set[str]) -> Set[str]:
+        """Измененные модули и модули, которые ссылаются на них или их объекты"""
+        result = set(changed)
+        added = True
+        while added:
+            added = False
+            for name, module in modules.items():
+                if name in result:
+                    continue
+                for value in list(vars(module).values()):
+                    if isinstance(value, ModuleType):
+                        source = value.__name__
+                    else:
+                        source = getattr(value, "__module__", None)
+                    if source in result:
+                        result.add(name)
+                        added = True
+                        break
+        return result
+
+    def check(self) -> bool:
+        """Перезагрузка, если отслеживаемые модули изменились"""
+        changed = self.changed_modules()
+        if not changed:
+            return False
+        return self.reload(changed)
+
+    def reload(self, modules: Optional[Iterable[str]] = None) -> bool:
+        """Загрузка модулей заново и замена дерева роутеров
+
+        modules - имена измененных модулей, по умолчанию найденные
+        по времени изменения файлов. Возвращает False, если
+        перезагрузка не удалась и было восстановлено прежнее состояние.
+        """
+        watched = self.watched_modules()
+        changed = set(self.changed_modules() if modules is None else modules)
+        dependents = self._dependents(watched, changed)
+        names = [name for name in watched if name in dependents]
+        saved_modules = {name: watched[name] for name in names}
+        saved_children: List[Tuple[Router, List[Router]]] = []
+        dispatcher = self.dispatcher
+        saved_pipelines = (dispatcher._pipeline, dispatcher._traced_pipeline)
+
+        try:
+            for name in names:
+                del sys.modules[name]
+            importlib.invalidate_caches()
+            for name in names:
+                importlib.import_module(name)
+            self._swap_children(dispatcher.router, saved_children)
+            dispatcher.build_pipeline()
+        except Exception as e:
+            self._restore_modules(saved_modules)
+            for router, children in saved_children:
+                router.children[:] = children
+                router._chain = None
+            dispatcher._pipeline, dispatcher._traced_pipeline = saved_pipelines
+            self.failures += 1
+            self.last_error = e
+            self.logger.exception("Router reload failed, keeping the previous routers")
+            return False
+        finally:
+            # Неудачная версия не перезагружается повторно до следующего изменения
+            self.snapshot()
+
+        self.reloads += 1
+        self.last_error = None
+        self.logger.info(f"Routers reloaded ({', '.join(names) or 'no modules'})")
+        return True
+
+    def _swap_children(self, router: Router, saved: List[Tuple[Router, List[Router]]]):
+        """Замена дочерних роутеров объектами из загруженных заново модулей"""
+        children = list(router.children)
+        for position, child in enumerate(children):
+            if child.import_path is None:
+                continue
+            new_child = import_object(child.import_path)
+            if new_child is child:
+                continue
+            if not isinstance(new_child, Router):
+                raise TypeError(f"{child.import_path!r} is not a Router: {new_child!r}")
+            router._check_child(new_child)
+            new_child.parent = router
+            new_child.import_path = child.import_path
+            if not saved or saved[-1][0] is not router:
+                saved.append((router, children))
+            router.children[position] = new_child
+            router._chain = None
+        for child in router.children:
+            self._swap_children(child, saved)
+
+    @staticmethod
+    def _restore_modules(saved: Dict[str, ModuleType]):
+        """Возврат прежних модулей в sys.modules и в атрибуты пакетов"""
+        for name, module in saved.items():
+            sys.modules[name] = module
+            parent, _, attribute = name.rpartition(".")
+            if parent in sys.modules:
+                setattr(sys.modules[parent], attribute, module)
+
+    async def watch(self):
+        """Периодическая проверка изменений"""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.check()
+            except Exception as e:
+                self.logger.error(f"Router reload check failed: {e}")
+
+    def start(self):
+        """Запуск проверки изменений и обработчика сигнала в текущем цикле"""
+        self.snapshot()
+        loop = asyncio.get_running_loop()
+        if self.interval and self._task is None:
+            self._task = loop.create_task(self.watch())
+        if self.signal is not None and self._signal_loop is None:
+            try:
+                loop.add_signal_handler(self.signal, self.reload)
+                self._signal_loop = loop
+            except (NotImplementedError, RuntimeError, ValueError) as e:
+                # Сигналы недоступны на Windows и вне главного потока
+                self.logger.warning(f"Reload signal handler not installed: {e}")
+
+    async def stop(self):
+        """Остановка проверки изменений"""
+        if self._signal_loop is not None:
+            self._signal_loop.remove_signal_handler(self.signal)
+            self._signal_loop = None
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
@@ -2,58 +2,372 @@
 Роутер для организации обработчиков
 """
 
-from typing import List, Optional
-from .handler import Handler, MessageHandler, CallbackQueryHandler
-from ..filters.base import BaseFilter
+from functools import partial
+from types import MappingProxyType
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Mapping, Optional, Tuple, Union
+from .handler import (
+    Handler,
+    MessageHandler,
+    CallbackQueryHandler,
+    EditedMessageHandler,
+    ChannelPostHandler,
+    EditedChannelPostHandler,
+)
+from .types import Update, UPDATE_EVENT_TYPES
+from ..filters.base import (
+    BaseFilter,
+    CommandFilter,
+    CallbackDataFilter,
+    by_cost,
+    filter_checks,
+)
+from ..filters.callback_data import CALLBACK_SEPARATOR, CallbackDataFactoryFilter
+from ..middleware.base import build_middleware_chain
+from ..utils.imports import import_object
+
+
+class _CallbackNode:
+    """Узел префиксного дерева данных кнопок
+    
+    Ребра - части данных между разделителями. В узле хранятся готовые
+    кортежи обработчиков: prefix - для данных, начинающихся с пути узла,
+    exact - для данных, совпадающих с ним целиком.
+    """
+    
+    __slots__ = ("children", "prefix_entries", "exact_entries", "prefix", "exact")
+    
+    def __init__(self):
+        self.children: Dict[str, '_CallbackNode'] = {}
+        self.prefix_entries: List[Tuple[int, Handler]] = []
+        self.exact_entries: List[Tuple[int, Handler]] = []
+        self.prefix: Tuple[Handler, ...] = ()
+        self.exact: Tuple[Handler, ...] = ()
+    
+    def insert(self, data: str, entry: Tuple[int, Handler], exact: bool):
+        node = self
+        for part in data.split(CALLBACK_SEPARATOR):
+            node = node.children.setdefault(part, _CallbackNode())
+        (node.exact_entries if exact else node.prefix_entries).append(entry)
+    
+    def finalize(self, inherited: List[Tuple[int, Handler]]):
+        """Сборка кортежей: обработчики узла, его предков и без индекса
+        в порядке регистрации"""
+        inherited = inherited + self.prefix_entries
+        self.prefix = _ordered(inherited)
+        self.exact = _ordered(inherited + self.exact_entries) if self.exact_entries else self.prefix
+        for child in self.children.values():
+            child.finalize(inherited)
+    
+    def lookup(self, data: str) -> Tuple[Handler, ...]:
+        """Обработчики для данных кнопки"""
+        node = self
+        for part in data.split(CALLBACK_SEPARATOR):
+            child = node.children.get(part)
+            if child is None:
+                return node.prefix
+            node = child
+        return node.exact
+
+
+def _ordered(entries: List[Tuple[int, Handler]]) -> Tuple[Handler, ...]:
+    """Обработчики без повторов в порядке регистрации"""
+    return tuple(handler for _, handler in sorted(dict(entries).items(), key=lambda e: e[0]))
 
 
 class Router:
-    """Роутер для организации обработчиков"""
+    """Роутер для организации обработчиков
+    
+    Перед обработкой роутер замораживается: обработчики раскладываются
+    в неизменяемые кортежи по типам обновлений, поэтому нажатие кнопки
+    не проходит через обработчики сообщений. Обработчики сообщений с
+    фильтром команд дополнительно индексируются по именам команд: для
+    команды проверяются только ее обработчики и обработчики без индекса,
+    в порядке регистрации. Обработчики кнопок с фильтрами CallbackData
+    и callback_data индексируются префиксным деревом по частям данных,
+    поэтому выбор обработчика не зависит от числа кнопок. Добавление обработчика сбрасывает таблицы,
+    они собираются заново при следующем обновлении.
     
-    def __init__(self, name: str = None):
+    Роутеры образуют дерево: include_router добавляет дочерний роутер.
+    Фильтры роутера проверяются один раз до его middleware и отсекают
+    все поддерево, middleware роутера применяются только к его поддереву.
+    Обновление проходит через обработчики роутера, затем через дочерние
+    роутеры по порядку, до первого обработчика, вернувшего результат.
+    Дерево собирается до запуска: роутеры, включенные после сборки
+    цепочки родителя, учитываются после ее пересборки. Роутеры,
+    включенные по пути импорта, загружаются при этой сборке.
+    """
+    
+    def __init__(
+        self,
+        name: str = None,
+        filters: Union[BaseFilter, List[BaseFilter]] = None
+    ):
         self.name = name or f"router_{id(self)}"
+        self.filters: List[BaseFilter] = (
+            filters if isinstance(filters, list) else [filters] if filters else []
+        )
         self.handlers: List[Handler] = []
+        self.children: List['Router'] = []
+        # Роутеры по пути импорта: (позиция среди children, путь)
+        self._lazy_children: List[Tuple[int, str]] = []
+        # Путь, по которому роутер был загружен родителем
+        self.import_path: Optional[str] = None
+        self.parent: Optional['Router'] = None
         self.middlewares: List = []
+        self._chain: Optional[Callable[[Update], Awaitable[Any]]] = None
+        self._buckets: Optional[Mapping[Optional[str], Tuple[Handler, ...]]] = None
+        self._commands: Mapping[str, Tuple[Handler, ...]] = {}
+        self._callbacks: Optional[_CallbackNode] = None
     
-    def message_handler(self, filters: BaseFilter = None):
-        """Декоратор для регистрации обработчика сообщений"""
+    def _register(self, handler_class, filters, timeout):
+        """Декоратор, регистрирующий обработчик заданного класса"""
         def decorator(func):
-            handler = MessageHandler(func, filters)
-            self.handlers.append(handler)
+            self.add_handler(handler_class(func, filters, timeout))
             return func
         return decorator
     
-    def callback_query_handler(self, filters: BaseFilter = None):
+    def message_handler(self, filters: BaseFilter = None, timeout: Optional[float] = None):
+        """Декоратор для регистрации обработчика сообщений"""
+        return self._register(MessageHandler, filters, timeout)
+    
+    def callback_query_handler(self, filters: BaseFilter = None, timeout: Optional[float] = None):
         """Декоратор для регистрации обработчика callback запросов"""
-        def decorator(func):
-            handler = CallbackQueryHandler(func, filters)
-            self.handlers.append(handler)
-            return func
-        return decorator
+        return self._register(CallbackQueryHandler, filters, timeout)
+    
+    def edited_message_handler(self, filters: BaseFilter = None, timeout: Optional[float] = None):
+        """Декоратор для регистрации обработчика измененных сообщений"""
+        return self._register(EditedMessageHandler, filters, timeout)
+    
+    def channel_post_handler(self, filters: BaseFilter = None, timeout: Optional[float] = None):
+        """Декоратор для регистрации обработчика публикаций в канале"""
+        return self._register(ChannelPostHandler, filters, timeout)
+    
+    def edited_channel_post_handler(
+        self,
+        filters: BaseFilter = None,
+        timeout: Optional[float] = None
+    ):
+        """Декоратор для регистрации обработчика измененных публикаций в канале"""
+        return self._register(EditedChannelPostHandler, filters, timeout)
     
-    def include_router(self, router: 'Router'):
-        """Включение другого роутера"""
-        self.handlers.extend(router.handlers)
-        self.middlewares.extend(router.middlewares)
+    def include_router(self, router: Union['Router', str]):
+        """Включение дочернего роутера
+        
+        Вместо роутера можно передать путь импорта ("bot.admin:router"):
+        модуль загружается при сборке цепочки. start_polling и start_webhook
+        собирают ее при запуске, поэтому импорт приложения без запуска
+        бота (CLI, миграции, тесты) этот модуль не загружает.
+        """
+        if isinstance(router, str):
+            self._lazy_children.append((len(self.children), router))
+            self._chain = None
+            return
+        self._check_child(router)
+        router.parent = self
+        self.children.append(router)
+        self._chain = None
+    
+    def _check_child(self, router: 'Router'):
+        """Проверка, что роутер не содержит этот роутер и еще никуда не включен
+        
+        Таблицы обработчиков и собранные цепочки хранятся в самом роутере
+        и его обработчиках, поэтому один роутер не может работать в двух
+        деревьях (например, в диспетчерах разных ботов).
+        """
+        if any(node is self for node in router.iter_routers()):
+            raise ValueError(f"Router {router.name!r} already contains {self.name!r}")
+        if router.parent is not None:
+            raise ValueError(
+                f"Router {router.name!r} is already included in {router.parent.name!r}"
+            )
+    
+    def _load_children(self):
+        """Загрузка роутеров, включенных по пути импорта"""
+        lazy_children, self._lazy_children = self._lazy_children, []
+        for position, path in reversed(lazy_children):
+            router = import_object(path)
+            if not isinstance(router, Router):
+                raise TypeError(f"{path!r} is not a Router: {router!r}")
+            self._check_child(router)
+            router.parent = self
+            router.import_path = path
+            self.children.insert(position, router)
+    
+    def add_filter(self, filter_obj: BaseFilter):
+        """Добавление фильтра роутера"""
+        self.filters.append(filter_obj)
+        self._chain = None
+    
+    def iter_routers(self) -> Iterator['Router']:
+        """Роутер и все его потомки в порядке обхода"""
+        yield self
+        for child in self.children:
+            yield from child.iter_routers()
     
     def add_handler(self, handler: Handler):
         """Добавление обработчика"""
         self.handlers.append(handler)
+        self._buckets = None
+    
+    @property
+    def frozen(self) -> bool:
+        """Собраны ли таблицы обработчиков"""
+        return self._buckets is not None
+    
+    @staticmethod
+    def _handler_commands(handler: Handler) -> Optional[List[str]]:
+        """Команды, по которым индексируется обработчик, или None"""
+        for filter_obj in handler.filters:
+            if type(filter_obj) is CommandFilter:
+                return filter_obj.commands
+        return None
+    
+    @staticmethod
+    def _handler_callback_keys(handler: Handler) -> Optional[List[Tuple[str, bool]]]:
+        """Данные кнопок (префикс или точное значение), по которым
+        индексируется обработчик, или None"""
+        for filter_obj in handler.filters:
+            if type(filter_obj) is CallbackDataFactoryFilter:
+                return [(filter_obj.factory.prefix, False)]
+            if type(filter_obj) is CallbackDataFilter:
+                return [(data, True) for data in filter_obj.data_list]
+        return None
+    
+    def _freeze_callbacks(self, bucket: List[Handler]) -> Tuple[List[Handler], Optional[_CallbackNode]]:
+        """Префиксное дерево обработчиков кнопок и обработчики без индекса"""
+        default = []
+        root = _CallbackNode()
+        for position, handler in enumerate(bucket):
+            keys = self._handler_callback_keys(handler)
+            if keys is None:
+                default.append((position, handler))
+                continue
+            for data, exact in keys:
+                root.insert(data, (position, handler), exact)
+        if not root.children:
+            return bucket, None
+        root.prefix_entries = default
+        root.finalize([])
+        return [handler for _, handler in default], root
+    
+    def freeze(self) -> Mapping[Optional[str], Tuple[Handler, ...]]:
+        """Сборка таблиц обработчиков по типам обновлений, командам и данным кнопок
+        
+        Обработчики без типа (базовый Handler) попадают во все таблицы.
+        """
+        buckets: Dict[Optional[str], List[Handler]] = {
+            event_type: [] for event_type in UPDATE_EVENT_TYPES + (None,)
+        }
+        for handler in self.handlers:
+            if handler.update_type is None:
+                for bucket in buckets.values():
+                    bucket.append(handler)
+            elif handler.update_type in buckets:
+                buckets[handler.update_type].append(handler)
+        
+        default = []
+        by_command: Dict[str, List[Tuple[int, Handler]]] = {}
+        for position, handler in enumerate(buckets["message"]):
+            commands = self._handler_commands(handler)
+            if commands is None:
+                default.append((position, handler))
+                continue
+            for command in set(commands):
+                by_command.setdefault(command, []).append((position, handler))
+        buckets["message"] = [handler for _, handler in default]
+        buckets["callback_query"], self._callbacks = self._freeze_callbacks(buckets["callback_query"])
+        
+        self._commands = MappingProxyType({
+            command: tuple(handler for _, handler in sorted(entries + default, key=lambda e: e[0]))
+            for command, entries in by_command.items()
+        })
+        self._buckets = MappingProxyType({
+            event_type: tuple(bucket) for event_type, bucket in buckets.items()
+        })
+        return self._buckets
     
     def add_middleware(self, middleware):
         """Добавление middleware"""
         self.middlewares.append(middleware)
+        self._chain = None
     
-    async def handle(self, update):
-        """Обработка обновления через все обработчики"""
+    def build_chain(self, metrics=None, tracing: bool = False) -> Callable[[Update], Awaitable[Any]]:
+        """Сборка цепочки поддерева: фильтры и middleware роутера вокруг
+        его обработчиков и цепочек дочерних роутеров
+        
+        metrics - метрики бота (BotMetrics), в которые записывается
+        время работы middleware и обработчиков, tracing - записывать
+        отрезки трассы для middleware, фильтров и обработчиков.
+        """
+        if self._lazy_children:
+            self._load_children()
+        self.freeze()
         for handler in self.handlers:
-            result = await handler.handle(update)
+            handler.instrument(metrics)
+        children = tuple(child.build_chain(metrics, tracing) for child in self.children)
+        chain = build_middleware_chain(
+            self.middlewares, partial(self._dispatch, children), metrics, tracing
+        )
+        if self.filters:
+            chain = partial(self._check_filters, filter_checks(by_cost(self.filters)), chain)
+        # Цепочка с трассировкой используется только для обновлений из выборки
+        if not tracing:
+            self._chain = chain
+        return chain
+    
+    async def handle(self, update):
+        """Обработка обновления поддеревом роутера"""
+        chain = self._chain or self.build_chain()
+        return await chain(update)
+    
+    @staticmethod
+    async def _check_filters(checks, chain, update):
+        """Проверка фильтров роутера перед его поддеревом"""
+        for is_sync, check in checks:
+            if is_sync:
+                if not check(update):
+                    return None
+            elif not await check(update):
+                return None
+        return await chain(update)
+    
+    async def _dispatch(self, children, update):
+        """Обработчики роутера, затем дочерние роутеры"""
+        result = await self._handle_handlers(update)
+        if result is not None:
+            return result
+        for child in children:
+            result = await child(update)
+            if result is not None:
+                return result
+        return None
+    
+    async def _handle_handlers(self, update):
+        """Обработка обновления через обработчики его типа"""
+        buckets = self._buckets
+        if buckets is None:
+            buckets = self.freeze()
+        event_type = update.event_type
+        handlers = buckets[event_type]
+        event = None
+        if event_type is not None:
+            event = getattr(update, event_type)
+            if event_type == "message" and self._commands:
+                parsed = update.parsed_text
+                if parsed is not None and parsed.command is not None:
+                    handlers = self._commands.get(parsed.command, handlers)
+            elif event_type == "callback_query" and self._callbacks is not None and event.data:
+                handlers = self._callbacks.lookup(event.data)
+        for handler in handlers:
+            result = await handler.process(event, update)
             if result is not None:
                 return result
         return None
     
     def __len__(self):
-        return len(self.handlers)
+        return sum(len(router.handlers) for router in self.iter_routers())
     
     def __iter__(self):
-        return iter(self.handlers)
+        """Обработчики всего поддерева"""
+        for router in self.iter_routers():
+            yield from router.handlers
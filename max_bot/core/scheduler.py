@@ -0,0 +1,286 @@
+"""
+Конкурентная обработка обновлений с сохранением порядка внутри чата
+"""
+
+import asyncio
+import heapq
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, List, Optional, Set
+from .lanes import PriorityLimiter, get_update_lane
+from .types import Update
+
+
+def get_update_key(update: Update) -> Hashable:
+    """Ключ упорядочивания: чат, затем пользователь, затем само обновление"""
+    chat_id = update.chat_id
+    if chat_id is not None:
+        return ("chat", chat_id)
+    user_id = update.user_id
+    if user_id is not None:
+        return ("user", user_id)
+    return ("update", update.update_id)
+
+
+class OffsetTracker:
+    """Отслеживание offset для getUpdates
+
+    Offset продвигается только за обновления, обработка которых завершена:
+    пока самое раннее обновление не обработано, offset стоит на нем.
+    """
+
+    def __init__(self, offset: int = 0):
+        self._next = offset
+        self._pending: Set[int] = set()
+        self._heap: List[int] = []
+
+    def is_known(self, update_id: int) -> bool:
+        """Было ли обновление уже принято в обработку"""
+        return update_id < self._next
+
+    def register(self, update_id: int) -> bool:
+        """Регистрация принятого обновления"""
+        if self.is_known(update_id):
+            return False
+        self._pending.add(update_id)
+        heapq.heappush(self._heap, update_id)
+        self._next = update_id + 1
+        return True
+
+    def done(self, update_id: int):
+        """Отметка о завершении обработки обновления"""
+        self._pending.discard(update_id)
+        while self._heap and self._heap[0] not in self._pending:
+            heapq.heappop(self._heap)
+
+    @property
+    def offset(self) -> int:
+        """Offset, до которого все обновления обработаны"""
+        return self._heap[0] if self._heap else self._next
+
+    @property
+    def pending(self) -> int:
+        """Количество незавершенных обновлений"""
+        return len(self._pending)
+
+
+@dataclass
+class SchedulerStats:
+    """Статистика обработки обновлений"""
+    processed: int = 0
+    failed: int = 0
+    total_processing_time: float = 0.0
+    max_processing_time: float = 0.0
+
+    def record(self, processing_time: float, failed: bool = False):
+        """Учет обработанного обновления"""
+        self.processed += 1
+        if failed:
+            self.failed += 1
+        self.total_processing_time += processing_time
+        if processing_time > self.max_processing_time:
+            self.max_processing_time = processing_time
+
+    @property
+    def avg_processing_time(self) -> float:
+        """Среднее время обработки обновления"""
+        return self.total_processing_time / self.processed if self.processed else 0.0
+
+
+class UpdateScheduler:
+    """Планировщик обработки обновлений
+
+    Обновления одного чата обрабатываются строго по порядку,
+    обновления разных чатов - параллельно, но не более
+    max_concurrency одновременно. Не более max_pending обновлений
+    могут ожидать обработки: submit блокируется, пока место не освободится.
+    limiter - общий семафор для нескольких планировщиков (например,
+    нескольких ботов в одном процессе): max_concurrency ограничивает долю
+    одного планировщика в общем пуле.
+    lanes - веса приоритетных полос (см. PriorityLimiter): когда все
+    слоты заняты, освободившийся слот получает полоса, выбранная по весам,
+    например, нажатия кнопок раньше обычных сообщений.
+    """
+
+    def __init__(
+        self,
+        process: Callable[[Update], Awaitable[Any]],
+        max_concurrency: int = 10,
+        max_pending: int = 1000,
+        key_func: Callable[[Update], Hashable] = get_update_key,
+        offset: int = 0,
+        track_offset: bool = True,
+        limiter: Optional[asyncio.Semaphore] = None,
+        lanes: Optional[Dict[str, int]] = None,
+        lane_func: Callable[[Update], str] = get_update_lane,
+        max_lane_wait: float = 5.0
+    ):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be positive")
+        if max_pending < 1:
+            raise ValueError("max_pending must be positive")
+
+        self.process = process
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending
+        self.key_func = key_func
+        # Без отслеживания offset (webhook) обновления принимаются в любом порядке
+        self.tracker = OffsetTracker(offset) if track_offset else None
+        self.stats = SchedulerStats()
+        self.logger = logging.getLogger(__name__)
+
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self.lane_func = lane_func
+        self.lanes: Optional[PriorityLimiter] = (
+            PriorityLimiter(max_concurrency, lanes, max_lane_wait) if lanes is not None else None
+        )
+        # Общий для нескольких планировщиков лимит одновременной обработки
+        self._limiter = limiter
+        self._capacity = asyncio.Semaphore(max_pending)
+        self._queues: Dict[Hashable, Deque[Update]] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._pending = 0
+        self._in_flight = 0
+        self._progress = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    @property
+    def offset(self) -> Optional[int]:
+        """Offset для следующего запроса getUpdates"""
+        return self.tracker.offset if self.tracker is not None else None
+
+    @property
+    def pending(self) -> int:
+        """Количество принятых, но еще не обработанных обновлений"""
+        return self._pending
+
+    @property
+    def in_flight(self) -> int:
+        """Количество обновлений, обрабатываемых прямо сейчас"""
+        return self._in_flight
+
+    @property
+    def free_capacity(self) -> int:
+        """Сколько обновлений можно принять без ожидания
+
+        Учитываются и обновления, принятые через accept,
+        но еще не переданные в submit.
+        """
+        pending = self.tracker.pending if self.tracker is not None else self._pending
+        return max(self.max_pending - pending, 0)
+
+    def is_known(self, update_id: int) -> bool:
+        """Было ли обновление уже принято в обработку"""
+        return self.tracker is not None and self.tracker.is_known(update_id)
+
+    def accept(self, update: Update) -> bool:
+        """Регистрация полученного обновления в offset трекере
+
+        Возвращает False для уже принятых обновлений. С момента
+        регистрации offset не продвинется за обновление, пока оно
+        не будет обработано.
+        """
+        if self.tracker is None:
+            return True
+        return self.tracker.register(update.update_id)
+
+    async def submit(self, update: Update, accepted: bool = False) -> bool:
+        """Постановка обновления в очередь обработки"""
+        if not accepted and not self.accept(update):
+            return False
+
+        await self._capacity.acquire()
+        self._pending += 1
+        self._idle.clear()
+
+        key = self.key_func(update)
+        queue = self._queues.get(key)
+        if queue is not None:
+            queue.append(update)
+            return True
+
+        self._queues[key] = deque([update])
+        task = asyncio.create_task(self._run_key(key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    async def _run_key(self, key: Hashable):
+        """Последовательная обработка очереди одного чата"""
+        queue = self._queues[key]
+        try:
+            while queue:
+                update = queue[0]
+                try:
+                    if self.lanes is not None:
+                        async with self.lanes.slot(self.lane_func(update)):
+                            await self._process_limited(update)
+                    else:
+                        async with self._slots:
+                            await self._process_limited(update)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.logger.error(f"Update {update.update_id} failed: {e}")
+                queue.popleft()
+                self._finish(update)
+        finally:
+            if self._queues.get(key) is queue:
+                del self._queues[key]
+            # Отмененные обновления не считаются обработанными:
+            # offset остановится на них, и после перезапуска они придут снова
+            for update in queue:
+                self._finish(update, completed=False)
+            queue.clear()
+
+    async def _process_limited(self, update: Update):
+        """Обработка с учетом общего лимита"""
+        if self._limiter is not None:
+            async with self._limiter:
+                await self._process(update)
+        else:
+            await self._process(update)
+
+    async def _process(self, update: Update):
+        """Обработка обновления с учетом статистики"""
+        self._in_flight += 1
+        started = time.monotonic()
+        failed = True
+        try:
+            await self.process(update)
+            failed = False
+        finally:
+            self._in_flight -= 1
+            self.stats.record(time.monotonic() - started, failed)
+
+    def _finish(self, update: Update, completed: bool = True):
+        """Учет завершения обработки обновления"""
+        self._pending -= 1
+        if self.tracker is not None and completed:
+            self.tracker.done(update.update_id)
+        self._capacity.release()
+        self._progress.set()
+        if not self._pending:
+            self._idle.set()
+
+    async def wait_progress(self):
+        """Ожидание завершения хотя бы одного обновления"""
+        pending = self.tracker.pending if self.tracker is not None else self._pending
+        if not pending:
+            return
+        self._progress.clear()
+        await self._progress.wait()
+
+    async def join(self):
+        """Ожидание обработки всех принятых обновлений"""
+        await self._idle.wait()
+
+    async def cancel(self):
+        """Отмена всех незавершенных обработок"""
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
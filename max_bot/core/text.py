@@ -0,0 +1,69 @@
+"""
+Разобранный текст сообщения
+"""
+
+import re
+from functools import cached_property
+from typing import List, Optional
+
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def normalize_text(text: str) -> str:
+    """Текст без регистра, с е вместо ё и одиночными пробелами"""
+    return " ".join(text.casefold().replace("ё", "е").split())
+
+
+class ParsedText:
+    """Разобранный текст сообщения
+
+    Команда, упоминание бота и аргументы выделяются сразу, нижний
+    регистр, нормализованный текст и слова - при первом обращении.
+    Обновление создает объект один раз (Update.parsed_text), и все
+    фильтры и обработчики работают с одним разбором.
+
+        "/start@my_bot ref 42" -> command="start", mention="my_bot",
+                                 args="ref 42", arg_list=["ref", "42"]
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.command: Optional[str] = None
+        self.mention: Optional[str] = None
+        self.args = ""
+        stripped = text.strip()
+        if stripped.startswith("/"):
+            parts = stripped.split(None, 1)
+            command, _, mention = parts[0][1:].partition("@")
+            self.command = command
+            self.mention = mention or None
+            if len(parts) > 1:
+                self.args = parts[1]
+
+    @property
+    def is_command(self) -> bool:
+        return self.command is not None
+
+    @cached_property
+    def arg_list(self) -> List[str]:
+        """Аргументы команды по словам"""
+        return self.args.split()
+
+    @cached_property
+    def lower(self) -> str:
+        """Текст в нижнем регистре"""
+        return self.text.lower()
+
+    @cached_property
+    def normalized(self) -> str:
+        """Нормализованный текст для сравнения без учета регистра"""
+        return normalize_text(self.text)
+
+    @cached_property
+    def tokens(self) -> List[str]:
+        """Слова нормализованного текста"""
+        return _TOKEN_RE.findall(self.normalized)
+
+    def __repr__(self) -> str:
+        return f"ParsedText({self.text!r})"
@@ -2,9 +2,10 @@
 Базовые типы данных для MAX Bot Library
 """
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Optional, Dict, Any, List
 from datetime import datetime
+from .text import ParsedText
 
 
 @dataclass
@@ -15,6 +16,17 @@ class User:
     first_name: Optional[str] = None
     last_name: Optional[str] = None
     is_bot: bool = False
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'User':
+        """Создание из данных API"""
+        return cls(
+            id=data["id"],
+            username=data.get("username"),
+            first_name=data.get("first_name"),
+            last_name=data.get("last_name"),
+            is_bot=data.get("is_bot", False)
+        )
 
 
 @dataclass
@@ -24,6 +36,16 @@ class Chat:
     type: str  # 'private', 'group', 'supergroup', 'channel'
     title: Optional[str] = None
     username: Optional[str] = None
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Chat':
+        """Создание из данных API"""
+        return cls(
+            id=data["id"],
+            type=data.get("type", "private"),
+            title=data.get("title"),
+            username=data.get("username")
+        )
 
 
 @dataclass
@@ -38,6 +60,25 @@ class Message:
     reply_to_message: Optional['Message'] = None
     entities: List[Dict[str, Any]] = None
     
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Message':
+        """Создание из данных API"""
+        date = data.get("date")
+        if isinstance(date, (int, float)):
+            date = datetime.fromtimestamp(date)
+        from_user = data.get("from_user", data.get("from"))
+        reply = data.get("reply_to_message")
+        return cls(
+            message_id=data["message_id"],
+            date=date,
+            chat=Chat.from_dict(data["chat"]),
+            from_user=User.from_dict(from_user) if from_user else None,
+            text=data.get("text"),
+            caption=data.get("caption"),
+            reply_to_message=cls.from_dict(reply) if reply else None,
+            entities=data.get("entities")
+        )
+    
     async def answer(self, text: str, **kwargs) -> Dict[str, Any]:
         """Ответ на сообщение"""
         from ..utils.http_client import MaxAPIClient
@@ -53,6 +94,18 @@ class CallbackQuery:
     message: Optional[Message] = None
     data: Optional[str] = None
     
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'CallbackQuery':
+        """Создание из данных API"""
+        from_user = data.get("from_user", data.get("from"))
+        message = data.get("message")
+        return cls(
+            id=str(data["id"]),
+            from_user=User.from_dict(from_user),
+            message=Message.from_dict(message) if message else None,
+            data=data.get("data")
+        )
+    
     async def answer(self, text: str = None) -> Dict[str, Any]:
         """Ответ на callback запрос"""
         from ..utils.http_client import MaxAPIClient
@@ -69,6 +122,75 @@ class Update:
     edited_message: Optional[Message] = None
     channel_post: Optional[Message] = None
     edited_channel_post: Optional[Message] = None
+    # Данные, передаваемые middleware дальше по цепочке и в обработчики
+    context: Dict[str, Any] = field(default_factory=dict, repr=False, compare=False)
+    # Запомненные результаты фильтров и общих проверок по id объекта
+    filter_results: Dict[int, Any] = field(default_factory=dict, repr=False, compare=False)
+    _parsed_text: Optional[ParsedText] = field(default=None, init=False, repr=False, compare=False)
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Update':
+        """Создание из данных API"""
+        update = cls(update_id=data["update_id"])
+        for name in UPDATE_EVENT_TYPES:
+            event = data.get(name)
+            if event:
+                parser = CallbackQuery if name == "callback_query" else Message
+                setattr(update, name, parser.from_dict(event))
+        return update
+    
+    @property
+    def event_type(self) -> Optional[str]:
+        """Тип события, содержащегося в обновлении"""
+        for name in UPDATE_EVENT_TYPES:
+            if getattr(self, name) is not None:
+                return name
+        return None
+    
+    @property
+    def event(self) -> Optional[Any]:
+        """Событие, содержащееся в обновлении"""
+        event_type = self.event_type
+        return getattr(self, event_type) if event_type else None
+    
+    @property
+    def parsed_text(self) -> Optional[ParsedText]:
+        """Разобранный текст сообщения, создается один раз на обновление"""
+        parsed = self._parsed_text
+        if parsed is None:
+            text = getattr(self.event, "text", None)
+            if not text:
+                return None
+            parsed = self._parsed_text = ParsedText(text)
+        return parsed
+    
+    @property
+    def chat_id(self) -> Optional[int]:
+        """ID чата, к которому относится обновление"""
+        event = self.event
+        if isinstance(event, CallbackQuery):
+            event = event.message
+        if event is not None and event.chat is not None:
+            return event.chat.id
+        return None
+    
+    @property
+    def user_id(self) -> Optional[int]:
+        """ID пользователя, отправившего обновление"""
+        event = self.event
+        if event is not None and event.from_user is not None:
+            return event.from_user.id
+        return None
+
+
+# Порядок проверки типов событий в обновлении
+UPDATE_EVENT_TYPES = (
+    "message",
+    "callback_query",
+    "edited_message",
+    "channel_post",
+    "edited_channel_post",
+)
 
 
 @dataclass
@@ -3,80 +3,286 @@
 """
 
 from abc import ABC, abstractmethod
-from typing import Union, List
+from functools import partial
+from typing import Any, Callable, List, Optional, Tuple, Union
+from ..core.text import normalize_text
 from ..core.types import Update, Message, CallbackQuery
 
 
 class BaseFilter(ABC):
-    """Базовый класс для фильтров"""
+    """Базовый класс для фильтров
+    
+    Фильтры с вводом-выводом реализуют асинхронный check. Фильтры,
+    которым достаточно данных обновления, наследуют SyncFilter.
+    
+    Фильтры объединяются операторами & (И), | (ИЛИ) и ~ (НЕ), проверка
+    выражения останавливается, как только известен результат.
+    cost - относительная стоимость проверки: в выражениях и в списке
+    фильтров обработчика дешевые фильтры проверяются первыми.
+    memoize - фильтр без побочных эффектов: результат запоминается на
+    время обработки обновления, и экземпляр фильтра проверяется не больше
+    одного раза, сколько бы обработчиков на него ни ссылалось. Асинхронные
+    фильтры без memoize выполняются каждый раз и в порядке записи:
+    другие фильтры не переставляются через них.
+    """
+    
+    is_sync = False
+    cost = 10
+    memoize = False
     
     @abstractmethod
     async def check(self, update: Update) -> bool:
         """Проверка фильтра"""
         pass
+    
+    def __and__(self, other: 'BaseFilter') -> 'AndFilter':
+        if not isinstance(other, BaseFilter):
+            return NotImplemented
+        return AndFilter(self, other)
+    
+    def __or__(self, other: 'BaseFilter') -> 'OrFilter':
+        if not isinstance(other, BaseFilter):
+            return NotImplemented
+        return OrFilter(self, other)
+    
+    def __invert__(self) -> 'NotFilter':
+        return NotFilter(self)
 
 
-class TextFilter(BaseFilter):
-    """Фильтр по тексту сообщения"""
+class SyncFilter(BaseFilter):
+    """Базовый класс для синхронных фильтров
     
-    def __init__(self, text: Union[str, List[str]]):
-        self.texts = [text] if isinstance(text, str) else text
+    Обработчики вызывают check_sync напрямую, без создания корутины;
+    check оставлен для совместимости с кодом, который ждет фильтр.
+    Синхронные фильтры дешевы, поэтому их результат не запоминается.
+    """
+    
+    is_sync = True
+    cost = 1
+    memoize = False
+    
+    @abstractmethod
+    def check_sync(self, update: Update) -> bool:
+        """Проверка фильтра без ожидания"""
+        pass
     
     async def check(self, update: Update) -> bool:
+        return self.check_sync(update)
+
+
+def _memoized_sync(filter_obj: BaseFilter, update: Update) -> bool:
+    """Синхронная проверка с запоминанием результата в обновлении"""
+    results = update.filter_results
+    result = results.get(id(filter_obj))
+    if result is None:
+        result = results[id(filter_obj)] = bool(filter_obj.check_sync(update))
+    return result
+
+
+async def _memoized_async(filter_obj: BaseFilter, update: Update) -> bool:
+    """Асинхронная проверка с запоминанием результата в обновлении"""
+    results = update.filter_results
+    result = results.get(id(filter_obj))
+    if result is None:
+        result = results[id(filter_obj)] = bool(await filter_obj.check(update))
+    return result
+
+
+def _cost(filter_obj: BaseFilter) -> float:
+    return filter_obj.cost
+
+
+def by_cost(filters: List[BaseFilter]) -> List[BaseFilter]:
+    """Фильтры по возрастанию стоимости, равные - в исходном порядке
+    
+    Асинхронные фильтры без memoize могут иметь побочные эффекты, поэтому
+    остаются на своих местах: сортируются только фильтры между ними.
+    """
+    result: List[BaseFilter] = []
+    segment: List[BaseFilter] = []
+    for f in filters:
+        if f.is_sync or f.memoize:
+            segment.append(f)
+            continue
+        result.extend(sorted(segment, key=_cost))
+        result.append(f)
+        segment = []
+    result.extend(sorted(segment, key=_cost))
+    return result
+
+
+def filter_checks(filters: List[BaseFilter]) -> Tuple[Tuple[bool, Callable[[Update], Any]], ...]:
+    """Проверки фильтров: (синхронная ли, функция проверки)"""
+    checks = []
+    for f in filters:
+        if f.is_sync:
+            check = partial(_memoized_sync, f) if f.memoize else f.check_sync
+        else:
+            check = partial(_memoized_async, f) if f.memoize else f.check
+        checks.append((f.is_sync, check))
+    return tuple(checks)
+
+
+class _FilterGroup(BaseFilter):
+    """Группа фильтров выражения
+    
+    Вложенные группы того же вида разворачиваются, фильтры сортируются
+    по стоимости. Группа синхронна, если синхронны все ее фильтры,
+    и запоминается, если запоминаются все ее асинхронные фильтры.
+    """
+    
+    def __init__(self, *filters: BaseFilter):
+        flat: List[BaseFilter] = []
+        for f in filters:
+            flat.extend(f.filters if type(f) is type(self) else [f])
+        self.filters = by_cost(flat)
+        self.is_sync = all(f.is_sync for f in self.filters)
+        self.memoize = not self.is_sync and all(f.is_sync or f.memoize for f in self.filters)
+        self.cost = sum(f.cost for f in self.filters)
+        self._checks = filter_checks(self.filters)
+
+
+class AndFilter(_FilterGroup):
+    """Логическое И: проверка до первого ложного фильтра"""
+    
+    def check_sync(self, update: Update) -> bool:
+        for _, check in self._checks:
+            if not check(update):
+                return False
+        return True
+    
+    async def check(self, update: Update) -> bool:
+        for is_sync, check in self._checks:
+            if is_sync:
+                if not check(update):
+                    return False
+            elif not await check(update):
+                return False
+        return True
+
+
+class OrFilter(_FilterGroup):
+    """Логическое ИЛИ: проверка до первого истинного фильтра"""
+    
+    def check_sync(self, update: Update) -> bool:
+        for _, check in self._checks:
+            if check(update):
+                return True
+        return False
+    
+    async def check(self, update: Update) -> bool:
+        for is_sync, check in self._checks:
+            if is_sync:
+                if check(update):
+                    return True
+            elif await check(update):
+                return True
+        return False
+
+
+class NotFilter(BaseFilter):
+    """Логическое НЕ"""
+    
+    def __init__(self, filter_obj: BaseFilter):
+        self.filter = filter_obj
+        self.is_sync = filter_obj.is_sync
+        # Результат запоминает сам фильтр, отрицание лишь наследует его свойства
+        self.memoize = filter_obj.memoize and not filter_obj.is_sync
+        self.cost = filter_obj.cost
+        ((_, self._check),) = filter_checks([filter_obj])
+    
+    def check_sync(self, update: Update) -> bool:
+        return not self._check(update)
+    
+    async def check(self, update: Update) -> bool:
+        if self.is_sync:
+            return not self._check(update)
+        return not await self._check(update)
+
+
+class TextFilter(SyncFilter):
+    """Фильтр по тексту сообщения
+    
+    ignore_case - сравнение нормализованного текста: без регистра,
+    лишних пробелов и различия е/ё.
+    """
+    
+    def __init__(self, text: Union[str, List[str]], ignore_case: bool = False):
+        self.texts = [text] if isinstance(text, str) else text
+        self.ignore_case = ignore_case
+        self._normalized = frozenset(normalize_text(t) for t in self.texts)
+    
+    def check_sync(self, update: Update) -> bool:
         if not update.message or not update.message.text:
             return False
+        if self.ignore_case:
+            return update.parsed_text.normalized in self._normalized
         return update.message.text in self.texts
 
 
-class CommandFilter(BaseFilter):
-    """Фильтр по командам"""
+class CommandFilter(SyncFilter):
+    """Фильтр по командам
     
-    def __init__(self, command: Union[str, List[str]]):
+    Роутер индексирует обработчики с этим фильтром по именам команд,
+    поэтому команда находит свой обработчик одним поиском в словаре.
+    bot_username - имя бота: команды с упоминанием другого бота
+    (/start@other_bot) не проходят. Разобранная команда (ParsedText)
+    и ее аргументы передаются обработчику параметрами command и args.
+    """
+    
+    def __init__(self, command: Union[str, List[str]], bot_username: Optional[str] = None):
         self.commands = [command] if isinstance(command, str) else command
+        self.bot_username = bot_username.lstrip("@").lower() if bot_username else None
     
-    async def check(self, update: Update) -> bool:
-        if not update.message or not update.message.text:
+    def check_sync(self, update: Update) -> bool:
+        if not update.message:
+            return False
+        parsed = update.parsed_text
+        if parsed is None or parsed.command not in self.commands:
             return False
-        
-        text = update.message.text.strip()
-        if not text.startswith('/'):
+        if (
+            parsed.mention is not None
+            and self.bot_username is not None
+            and parsed.mention.lower() != self.bot_username
+        ):
             return False
-        
-        command = text.split()[0][1:]  # Убираем '/'
-        return command in self.commands
+        context = update.context
+        context["command"] = parsed
+        context["args"] = parsed.args
+        return True
 
 
-class CallbackDataFilter(BaseFilter):
+class CallbackDataFilter(SyncFilter):
     """Фильтр по данным callback"""
     
     def __init__(self, data: Union[str, List[str]]):
         self.data_list = [data] if isinstance(data, str) else data
     
-    async def check(self, update: Update) -> bool:
+    def check_sync(self, update: Update) -> bool:
         if not update.callback_query or not update.callback_query.data:
             return False
         return update.callback_query.data in self.data_list
 
 
-class ChatTypeFilter(BaseFilter):
+class ChatTypeFilter(SyncFilter):
     """Фильтр по типу чата"""
     
     def __init__(self, chat_type: Union[str, List[str]]):
         self.chat_types = [chat_type] if isinstance(chat_type, str) else chat_type
     
-    async def check(self, update: Update) -> bool:
+    def check_sync(self, update: Update) -> bool:
         if not update.message or not update.message.chat:
             return False
         return update.message.chat.type in self.chat_types
 
 
-class UserFilter(BaseFilter):
+class UserFilter(SyncFilter):
     """Фильтр по пользователю"""
     
     def __init__(self, user_id: Union[int, List[int]]):
         self.user_ids = [user_id] if isinstance(user_id, int) else user_id
     
-    async def check(self, update: Update) -> bool:
+    def check_sync(self, update: Update) -> bool:
         if update.message and update.message.from_user:
             return update.message.from_user.id in self.user_ids
         if update.callback_query and update.callback_query.from_user:
@@ -85,12 +291,12 @@ class UserFilter(BaseFilter):
 
 
 # Удобные функции для создания фильтров
-def text(text: Union[str, List[str]]) -> TextFilter:
-    return TextFilter(text)
+def text(text: Union[str, List[str]], ignore_case: bool = False) -> TextFilter:
+    return TextFilter(text, ignore_case)
 
 
-def command(command: Union[str, List[str]]) -> CommandFilter:
-    return CommandFilter(command)
+def command(command: Union[str, List[str]], bot_username: Optional[str] = None) -> CommandFilter:
+    return CommandFilter(command, bot_username)
 
 
 def callback_data(data: Union[str, List[str]]) -> CallbackDataFilter:
@@ -0,0 +1,115 @@
+"""
+Структурированные данные кнопок
+"""
+
+from dataclasses import make_dataclass
+from typing import Any, Dict, Optional, Tuple, Type
+from .base import SyncFilter
+from ..core.types import Update
+
+
+# Разделитель частей данных кнопки, по нему же строится индекс роутера
+CALLBACK_SEPARATOR = ":"
+
+# Ключ update.context, в который кладется разобранный объект
+CALLBACK_CONTEXT_KEY = "callback_data"
+
+_FIELD_TYPES = (str, int, float, bool)
+
+
+class CallbackData:
+    """Фабрика данных кнопок
+
+    Описывает префикс и типизированные поля:
+
+        product_cb = CallbackData("product", action=str, id=int)
+        product_cb.new(action="buy", id=42)  # "product:buy:42"
+        product_cb.parse("product:buy:42")   # Product(action='buy', id=42)
+
+    max_length - ограничение длины данных кнопки в байтах.
+    """
+
+    def __init__(self, prefix: str, max_length: int = 64, **fields: Type):
+        if not prefix or CALLBACK_SEPARATOR in prefix:
+            raise ValueError(f"Prefix must be non-empty and must not contain {CALLBACK_SEPARATOR!r}")
+        for name, field_type in fields.items():
+            if field_type not in _FIELD_TYPES:
+                raise TypeError(f"Unsupported type for field {name!r}: {field_type!r}")
+
+        self.prefix = prefix
+        self.max_length = max_length
+        self.fields: Dict[str, Type] = dict(fields)
+        class_name = "".join(part.capitalize() for part in prefix.replace("-", "_").split("_"))
+        self.model = make_dataclass(class_name or "CallbackValue", list(fields.items()), frozen=True)
+
+    def new(self, *args, **values) -> str:
+        """Упаковка значений полей в строку данных кнопки"""
+        return self.pack(self.model(*args, **values))
+
+    def pack(self, value: Any) -> str:
+        """Упаковка объекта модели в строку данных кнопки"""
+        parts = [self.prefix]
+        for name, field_type in self.fields.items():
+            item = getattr(value, name)
+            if field_type is bool:
+                part = "1" if item else "0"
+            else:
+                part = str(field_type(item))
+            if CALLBACK_SEPARATOR in part:
+                raise ValueError(f"Field {name!r} must not contain {CALLBACK_SEPARATOR!r}")
+            parts.append(part)
+
+        data = CALLBACK_SEPARATOR.join(parts)
+        if len(data.encode()) > self.max_length:
+            raise ValueError(f"Callback data is longer than {self.max_length} bytes: {data!r}")
+        return data
+
+    def parse(self, data: Optional[str]) -> Optional[Any]:
+        """Разбор строки данных кнопки, None для чужих или поврежденных данных"""
+        if not data:
+            return None
+        parts = data.split(CALLBACK_SEPARATOR)
+        if parts[0] != self.prefix or len(parts) != len(self.fields) + 1:
+            return None
+        values = {}
+        try:
+            for (name, field_type), part in zip(self.fields.items(), parts[1:]):
+                values[name] = part == "1" if field_type is bool else field_type(part)
+        except ValueError:
+            return None
+        return self.model(**values)
+
+    def filter(self, **conditions) -> 'CallbackDataFactoryFilter':
+        """Фильтр кнопок этой фабрики с необязательными условиями на поля"""
+        unknown = set(conditions) - set(self.fields)
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+        return CallbackDataFactoryFilter(self, conditions)
+
+
+class CallbackDataFactoryFilter(SyncFilter):
+    """Фильтр кнопок фабрики CallbackData
+
+    Разобранный объект кладется в update.context["callback_data"],
+    поэтому обработчик получает его параметром callback_data. Роутер
+    индексирует обработчики с этим фильтром по префиксу фабрики.
+    """
+
+    def __init__(self, factory: CallbackData, conditions: Optional[Dict[str, Any]] = None):
+        self.factory = factory
+        self.conditions: Tuple[Tuple[str, Any], ...] = tuple((conditions or {}).items())
+
+    def check_sync(self, update: Update) -> bool:
+        if not update.callback_query:
+            return False
+        value = update.context.get(CALLBACK_CONTEXT_KEY)
+        if not isinstance(value, self.factory.model):
+            # Данные разбираются один раз на обновление
+            value = self.factory.parse(update.callback_query.data)
+            if value is None:
+                return False
+            update.context[CALLBACK_CONTEXT_KEY] = value
+        for name, expected in self.conditions:
+            if getattr(value, name) != expected:
+                return False
+        return True
@@ -0,0 +1,227 @@
+"""
+Фильтры по ключевым словам на автомате Ахо-Корасик
+"""
+
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+from .base import SyncFilter
+from ..core.text import normalize_text
+from ..core.types import Update
+
+
+# Ключ update.context, в который кладется совпадение
+TRIGGER_CONTEXT_KEY = "trigger"
+
+# До этого числа ключевых слов поиск str.find по каждому быстрее
+# автомата (benchmarks/bench_triggers.py: точка равенства около 200)
+LINEAR_SCAN_LIMIT = 200
+
+_MISSING = object()
+
+
+class AhoCorasick:
+    """Автомат Ахо-Корасик для поиска множества строк за один проход
+
+    Строки добавляются через add, затем автомат собирается build.
+    Поиск находит все вхождения, в том числе перекрывающиеся, за время,
+    линейное по длине текста и числу совпадений.
+    """
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # Собственные строки узла и строки с учетом ссылок неудач
+        self._own: List[Tuple[Tuple[int, Any], ...]] = [()]
+        self._out: List[Tuple[Tuple[int, Any], ...]] = [()]
+        self._built = True
+
+    def add(self, pattern: str, value: Any):
+        """Добавление строки и связанного с ней значения"""
+        if not pattern:
+            raise ValueError("Pattern must not be empty")
+        node = 0
+        for char in pattern:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._own.append(())
+            node = next_node
+        self._own[node] += ((len(pattern), value),)
+        self._built = False
+
+    def build(self):
+        """Вычисление ссылок неудач обходом в ширину"""
+        goto, fail = self._goto, self._fail
+        out = self._out = list(self._own)
+        queue = deque(goto[0].values())
+        for node in queue:
+            fail[node] = 0
+        while queue:
+            node = queue.popleft()
+            for char, child in goto[node].items():
+                queue.append(child)
+                state = fail[node]
+                while state and char not in goto[state]:
+                    state = fail[state]
+                fail[child] = goto[state].get(char, 0)
+                out[child] += out[fail[child]]
+        self._built = True
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, Any]]:
+        """Вхождения: (начало, конец, значение)"""
+        if not self._built:
+            self.build()
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for index, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for length, value in out[node]:
+                yield index - length + 1, index + 1, value
+
+    def __len__(self) -> int:
+        return len(self._goto)
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == "_"
+
+
+@dataclass(frozen=True)
+class TriggerMatch:
+    """Найденное ключевое слово
+
+    start и end - позиции в нормализованном тексте (ParsedText.normalized).
+    """
+    keyword: str
+    start: int
+    end: int
+    trigger_filter: 'TriggerFilter'
+
+    @property
+    def length(self) -> int:
+        return self.end - self.start
+
+
+class TriggerSet:
+    """Общий набор ключевых слов для нескольких обработчиков
+
+    Ключевые слова всех фильтров набора собираются в один автомат,
+    текст сообщения просматривается один раз на обновление. Регистр,
+    лишние пробелы и различие е/ё не учитываются. Обновление получает
+    только обработчик с лучшим совпадением: prefer="longest" - самое
+    длинное ключевое слово, prefer="first" - самое раннее в тексте.
+    whole_words - ключевое слово должно совпадать с целыми словами.
+    Пока ключевых слов не больше LINEAR_SCAN_LIMIT, текст проверяется
+    поиском каждого слова, автомат используется для больших наборов.
+    """
+
+    def __init__(self, prefer: str = "longest", whole_words: bool = True):
+        if prefer not in ("longest", "first"):
+            raise ValueError("prefer must be 'longest' or 'first'")
+        self.prefer = prefer
+        self.whole_words = whole_words
+        self.filters: List['TriggerFilter'] = []
+        self._automaton = AhoCorasick()
+        self._patterns: List[Tuple[str, Tuple[int, str, 'TriggerFilter']]] = []
+
+    def filter(self, keywords: Union[str, List[str]]) -> 'TriggerFilter':
+        """Фильтр обработчика с его ключевыми словами"""
+        filter_obj = TriggerFilter(self)
+        self.filters.append(filter_obj)
+        self.add(keywords, filter_obj)
+        return filter_obj
+
+    def add(self, keywords: Union[str, List[str]], filter_obj: 'TriggerFilter'):
+        """Добавление ключевых слов к фильтру набора"""
+        for keyword in [keywords] if isinstance(keywords, str) else keywords:
+            pattern = normalize_text(keyword)
+            if not pattern:
+                raise ValueError(f"Keyword {keyword!r} is empty after normalization")
+            value = (len(self._patterns), keyword, filter_obj)
+            self._automaton.add(pattern, value)
+            self._patterns.append((pattern, value))
+
+    def _scan(self, text: str) -> Iterator[Tuple[int, int, Tuple[int, str, 'TriggerFilter']]]:
+        """Вхождения ключевых слов: (начало, конец, значение)"""
+        if len(self._patterns) > LINEAR_SCAN_LIMIT:
+            yield from self._automaton.iter_matches(text)
+            return
+        find = text.find
+        for pattern, value in self._patterns:
+            start = find(pattern)
+            while start != -1:
+                yield start, start + len(pattern), value
+                start = find(pattern, start + 1)
+
+    def _iter_matches(self, text: str) -> Iterator[Tuple[int, int, int, str, 'TriggerFilter']]:
+        """Совпадения с учетом границ слов: (начало, конец, порядок, слово, фильтр)"""
+        whole_words = self.whole_words
+        for start, end, (order, keyword, filter_obj) in self._scan(text):
+            if whole_words and (
+                (start > 0 and _is_word_char(text[start - 1]) and _is_word_char(text[start]))
+                or (end < len(text) and _is_word_char(text[end]) and _is_word_char(text[end - 1]))
+            ):
+                continue
+            yield start, end, order, keyword, filter_obj
+
+    def matches(self, text: str) -> List[TriggerMatch]:
+        """Все совпадения в нормализованном тексте по позиции конца"""
+        return [
+            TriggerMatch(keyword, start, end, filter_obj)
+            for start, end, _, keyword, filter_obj in sorted(
+                self._iter_matches(text), key=lambda match: (match[1], match[0], match[2])
+            )
+        ]
+
+    def best(self, text: str) -> Optional[TriggerMatch]:
+        """Лучшее совпадение в нормализованном тексте"""
+        best = None
+        best_key = None
+        longest = self.prefer == "longest"
+        for start, end, order, keyword, filter_obj in self._iter_matches(text):
+            key = (start - end, start, order) if longest else (start, start - end, order)
+            if best_key is None or key < best_key:
+                best_key = key
+                best = TriggerMatch(keyword, start, end, filter_obj)
+        return best
+
+    def best_match(self, update: Update) -> Optional[TriggerMatch]:
+        """Лучшее совпадение для обновления, вычисляется один раз"""
+        results = update.filter_results
+        match = results.get(id(self), _MISSING)
+        if match is _MISSING:
+            parsed = update.parsed_text
+            match = results[id(self)] = self.best(parsed.normalized) if parsed else None
+        return match
+
+
+class TriggerFilter(SyncFilter):
+    """Фильтр по ключевым словам набора TriggerSet
+
+    Проходит, если лучшее совпадение в сообщении принадлежит этому
+    фильтру. Совпадение (TriggerMatch) передается обработчику
+    параметром trigger.
+    """
+
+    def __init__(self, triggers: TriggerSet):
+        self.triggers = triggers
+
+    def check_sync(self, update: Update) -> bool:
+        if not update.message:
+            return False
+        match = self.triggers.best_match(update)
+        if match is None or match.trigger_filter is not self:
+            return False
+        update.context[TRIGGER_CONTEXT_KEY] = match
+        return True
+
+
+def triggers(keywords: Union[str, List[str]], whole_words: bool = True) -> TriggerFilter:
+    """Фильтр с собственным набором ключевых слов"""
+    return TriggerSet(whole_words=whole_words).filter(keywords)
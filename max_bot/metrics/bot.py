@@ -0,0 +1,134 @@
+"""
+Метрики обработки обновлений одного бота
+"""
+
+from typing import Callable, Dict, Optional
+from .registry import BATCH_BUCKETS, MetricsRegistry
+from ..core.lanes import DEFAULT_LANE_WEIGHTS, LaneStats, PriorityLimiter
+from ..core.types import UPDATE_EVENT_TYPES
+
+
+class BotMetrics:
+    """Метрики бота в реестре
+
+    Все значения с меткой bot получаются при создании, а значения
+    для обработчиков, middleware и методов API - один раз при первом
+    обращении, поэтому запись при обработке обновления сводится
+    к поиску в словаре и сложению.
+    """
+
+    def __init__(self, registry: MetricsRegistry, bot: str):
+        self.registry = registry
+        self.bot = bot
+
+        received = registry.counter(
+            "max_bot_updates_received_total", "Updates received", ("bot", "type")
+        )
+        processed = registry.counter(
+            "max_bot_updates_processed_total", "Updates processed successfully", ("bot", "type")
+        )
+        failed = registry.counter(
+            "max_bot_updates_failed_total", "Updates failed with an error", ("bot", "type")
+        )
+        latency = registry.histogram(
+            "max_bot_update_duration_seconds", "Update processing time", ("bot", "type")
+        )
+        types = UPDATE_EVENT_TYPES + ("unknown",)
+        self.received = {t: received.labels(bot, t) for t in types}
+        self.processed = {t: processed.labels(bot, t) for t in types}
+        self.failed = {t: failed.labels(bot, t) for t in types}
+        self.latency = {t: latency.labels(bot, t) for t in types}
+
+        self.duplicates = registry.counter(
+            "max_bot_updates_duplicate_total", "Redelivered updates skipped", ("bot",)
+        ).labels(bot)
+        self.timeouts = registry.counter(
+            "max_bot_updates_timeout_total", "Updates that exceeded a deadline", ("bot",)
+        ).labels(bot)
+
+        self._handlers = registry.histogram(
+            "max_bot_handler_duration_seconds", "Handler callback time", ("bot", "handler")
+        )
+        self._middlewares = registry.histogram(
+            "max_bot_middleware_duration_seconds",
+            "Middleware time including the rest of the chain",
+            ("bot", "middleware")
+        )
+        self._api_latency = registry.histogram(
+            "max_bot_api_request_duration_seconds", "MAX API request time", ("bot", "method")
+        )
+        self._api_errors = registry.counter(
+            "max_bot_api_request_errors_total", "MAX API requests failed", ("bot", "method")
+        )
+        self._api_cache: Dict[str, tuple] = {}
+
+        self.poll_batch_size = registry.histogram(
+            "max_bot_poll_batch_size", "Updates per getUpdates response", ("bot",), BATCH_BUCKETS
+        ).labels(bot)
+        self.poll_errors = registry.counter(
+            "max_bot_poll_errors_total", "Failed getUpdates requests", ("bot",)
+        ).labels(bot)
+        self.pending = registry.gauge(
+            "max_bot_updates_pending", "Accepted updates not yet processed", ("bot",)
+        ).labels(bot)
+        self.in_flight = registry.gauge(
+            "max_bot_updates_in_flight", "Updates being processed right now", ("bot",)
+        ).labels(bot)
+        self.queue_depth = registry.gauge(
+            "max_bot_prefetch_queue_depth", "Prefetched batches waiting for dispatch", ("bot",)
+        ).labels(bot)
+        self._lane_waiting = registry.gauge(
+            "max_bot_lane_waiting", "Updates waiting for a processing slot", ("bot", "lane")
+        )
+        self._lane_wait = registry.gauge(
+            "max_bot_lane_wait_seconds", "Average wait for a processing slot", ("bot", "lane")
+        )
+
+    def handler_latency(self, name: str):
+        """Гистограмма времени работы обработчика"""
+        return self._handlers.labels(self.bot, name)
+
+    def middleware_latency(self, name: str):
+        """Гистограмма времени работы middleware"""
+        return self._middlewares.labels(self.bot, name)
+
+    def api_request(self, method: str) -> tuple:
+        """Гистограмма времени и счетчик ошибок метода API"""
+        metrics = self._api_cache.get(method)
+        if metrics is None:
+            metrics = self._api_cache[method] = (
+                self._api_latency.labels(self.bot, method),
+                self._api_errors.labels(self.bot, method),
+            )
+        return metrics
+
+    def bind_gauges(
+        self,
+        pending: Callable[[], float],
+        in_flight: Callable[[], float],
+        queue_depth: Callable[[], float]
+    ):
+        """Индикаторы, вычисляемые при чтении метрик"""
+        self.pending.set_function(pending)
+        self.in_flight.set_function(in_flight)
+        self.queue_depth.set_function(queue_depth)
+
+    def bind_lanes(self, lanes: Callable[[], Optional[PriorityLimiter]]):
+        """Глубина очереди и среднее время ожидания по приоритетным полосам
+
+        lanes возвращает текущий PriorityLimiter или None, если
+        обновления обрабатываются без полос.
+        """
+        for lane in DEFAULT_LANE_WEIGHTS:
+            self._lane_waiting.labels(self.bot, lane).set_function(
+                lambda lane=lane: self._lane_stats(lanes(), lane).waiting
+            )
+            self._lane_wait.labels(self.bot, lane).set_function(
+                lambda lane=lane: self._lane_stats(lanes(), lane).avg_wait_time
+            )
+
+    @staticmethod
+    def _lane_stats(limiter: Optional[PriorityLimiter], lane: str) -> LaneStats:
+        if limiter is None or lane not in limiter.stats:
+            return LaneStats()
+        return limiter.stats[lane]
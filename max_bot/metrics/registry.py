@@ -0,0 +1,255 @@
+"""
+Реестр метрик с выводом в текстовом формате Prometheus
+"""
+
+from bisect import bisect_left
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+# Границы корзин для времени в секундах: от 0.1 мс до 30 с
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+# Границы корзин для размера пачки обновлений
+BATCH_BUCKETS: Tuple[float, ...] = (0, 1, 2, 5, 10, 25, 50, 100)
+
+
+def _escape(value: str) -> str:
+    """Экранирование значения метки"""
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    """Метки в формате {name="value",...}"""
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    """Число в формате Prometheus"""
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class CounterChild:
+    """Значение счетчика для одного набора меток"""
+
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: int = 1):
+        """Увеличение счетчика"""
+        self.value += amount
+
+    def get(self) -> float:
+        return self.value
+
+
+class GaugeChild:
+    """Значение индикатора для одного набора меток
+
+    Значение можно задавать явно или вычислять функцией при каждом
+    чтении, тогда запись не стоит ничего.
+    """
+
+    __slots__ = ("value", "function")
+
+    def __init__(self):
+        self.value = 0
+        self.function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.value -= amount
+
+    def set_function(self, function: Optional[Callable[[], float]]):
+        """Вычисление значения при чтении"""
+        self.function = function
+
+    def get(self) -> float:
+        if self.function is not None:
+            return self.function()
+        return self.value
+
+
+class HistogramChild:
+    """Гистограмма для одного набора меток
+
+    Корзины заданы заранее, запись - поиск корзины и два сложения
+    без создания объектов.
+    """
+
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts: List[int] = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float, bisect_left=bisect_left):
+        """Учет значения"""
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    @property
+    def count(self) -> int:
+        """Количество учтенных значений"""
+        return sum(self.counts)
+
+    def cumulative(self) -> Iterator[Tuple[float, int]]:
+        """Накопленные значения по корзинам, последняя - +Inf"""
+        total = 0
+        for bound, count in zip(self.bounds + (float("inf"),), self.counts):
+            total += count
+            yield bound, total
+
+
+class Metric:
+    """Семейство метрик с общим именем и набором меток
+
+    Значения для конкретных меток получаются через labels() один раз
+    при настройке и затем обновляются напрямую. Обработка обновлений
+    идет в одном потоке цикла событий, поэтому блокировки не нужны.
+    """
+
+    type = "untyped"
+    child_class = CounterChild
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.children: Dict[Tuple[str, ...], object] = {}
+
+    def _new_child(self):
+        return self.child_class()
+
+    def labels(self, *values) -> object:
+        """Значение для набора меток"""
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        key = tuple(str(value) for value in values)
+        child = self.children.get(key)
+        if child is None:
+            child = self.children[key] = self._new_child()
+        return child
+
+    def samples(self) -> Iterator[Tuple[str, str, float]]:
+        """Строки вывода: суффикс имени, метки, значение"""
+        for values, child in self.children.items():
+            yield "", _format_labels(self.labelnames, values), child.get()
+
+    def render(self) -> List[str]:
+        """Вывод в текстовом формате Prometheus"""
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        for suffix, labels, value in self.samples():
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    """Монотонно растущий счетчик"""
+
+    type = "counter"
+    child_class = CounterChild
+
+
+class Gauge(Metric):
+    """Индикатор текущего значения"""
+
+    type = "gauge"
+    child_class = GaugeChild
+
+
+class Histogram(Metric):
+    """Распределение значений по заранее заданным корзинам"""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return HistogramChild(self.buckets)
+
+    def samples(self) -> Iterator[Tuple[str, str, float]]:
+        for values, child in self.children.items():
+            for bound, total in child.cumulative():
+                labels = _format_labels(self.labelnames, values, f'le="{_format_value(float(bound))}"')
+                yield "_bucket", labels, total
+            labels = _format_labels(self.labelnames, values)
+            yield "_sum", labels, child.sum
+            yield "_count", labels, child.count
+
+
+class MetricsRegistry:
+    """Реестр метрик
+
+    Повторная регистрация метрики с тем же именем возвращает
+    существующую, поэтому несколько ботов пишут в общие семейства
+    с разными значениями метки bot.
+    """
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def _get_or_create(self, cls, name: str, *args, **kwargs) -> Metric:
+        metric = self.metrics.get(name)
+        if metric is None:
+            metric = self.metrics[name] = cls(name, *args, **kwargs)
+        elif not isinstance(metric, cls):
+            raise ValueError(f"Metric {name} is already registered as {metric.type}")
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        """Регистрация счетчика"""
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        """Регистрация индикатора"""
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        """Регистрация гистограммы"""
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets)
+
+    def render(self) -> str:
+        """Все метрики в текстовом формате Prometheus"""
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Реестр по умолчанию для всех диспетчеров процесса
+REGISTRY = MetricsRegistry()
@@ -0,0 +1,64 @@
+"""
+HTTP endpoint для сбора метрик Prometheus
+"""
+
+import logging
+from typing import Awaitable, Callable, Optional
+from aiohttp import web
+from .registry import REGISTRY, MetricsRegistry
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def metrics_handler(
+    registry: MetricsRegistry = REGISTRY
+) -> Callable[[web.Request], Awaitable[web.Response]]:
+    """Обработчик aiohttp, отдающий метрики реестра
+
+    Его можно добавить в существующее приложение, например
+    в webhook сервер: app.router.add_get("/metrics", metrics_handler()).
+    """
+    async def handle(request: web.Request) -> web.Response:
+        return web.Response(
+            body=registry.render().encode(),
+            headers={"Content-Type": CONTENT_TYPE}
+        )
+    return handle
+
+
+class MetricsServer:
+    """Отдельный HTTP сервер с метриками"""
+
+    def __init__(
+        self,
+        registry: MetricsRegistry = REGISTRY,
+        host: str = "0.0.0.0",
+        port: int = 9100,
+        path: str = "/metrics"
+    ):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.path = path
+        self.logger = logging.getLogger(__name__)
+        self._runner: Optional[web.AppRunner] = None
+
+    def create_app(self) -> web.Application:
+        """Создание aiohttp приложения"""
+        app = web.Application()
+        app.router.add_get(self.path, metrics_handler(self.registry))
+        return app
+
+    async def start(self):
+        """Запуск сервера в текущем цикле событий"""
+        self._runner = web.AppRunner(self.create_app())
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        self.logger.info(f"Metrics available on {self.host}:{self.port}{self.path}")
+
+    async def stop(self):
+        """Остановка сервера"""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
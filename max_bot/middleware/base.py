@@ -2,9 +2,12 @@
 Базовые классы для middleware
 """
 
+import time
 from abc import ABC, abstractmethod
-from typing import Any, Awaitable, Callable
+from functools import partial
+from typing import Any, Awaitable, Callable, Optional, Sequence
 from ..core.types import Update
+from ..tracing.tracer import span
 
 
 class BaseMiddleware(ABC):
@@ -20,6 +23,56 @@ class BaseMiddleware(ABC):
         pass
 
 
+async def _timed_middleware(
+    middleware, observe, handler, update: Update, perf_counter=time.perf_counter
+) -> Any:
+    """Вызов middleware с учетом времени работы"""
+    started = perf_counter()
+    try:
+        return await middleware(handler, update)
+    finally:
+        observe(perf_counter() - started)
+
+
+async def _traced_middleware(middleware, name: str, observe, handler, update: Update) -> Any:
+    """Вызов middleware с отрезком трассы"""
+    started = time.perf_counter()
+    try:
+        with span(name):
+            return await middleware(handler, update)
+    finally:
+        if observe is not None:
+            observe(time.perf_counter() - started)
+
+
+def build_middleware_chain(
+    middlewares: Sequence[BaseMiddleware],
+    handler: Callable[[Update], Awaitable[Any]],
+    metrics: Optional[Any] = None,
+    tracing: bool = False
+) -> Callable[[Update], Awaitable[Any]]:
+    """Сборка цепочки middleware вокруг обработчика
+    
+    Цепочка собирается один раз и используется для всех обновлений:
+    первый middleware в списке вызывается первым. Данные для следующих
+    звеньев и обработчиков middleware кладут в update.context.
+    Если переданы метрики бота, время каждого middleware (вместе
+    с остатком цепочки) попадает в гистограмму по имени его класса;
+    гистограмма выбирается при сборке, без метрик звено не оборачивается.
+    С tracing=True для каждого middleware записывается отрезок трассы.
+    """
+    for middleware in reversed(middlewares):
+        name = type(middleware).__name__
+        observe = metrics.middleware_latency(name).observe if metrics is not None else None
+        if tracing:
+            handler = partial(_traced_middleware, middleware, f"middleware {name}", observe, handler)
+        elif observe is not None:
+            handler = partial(_timed_middleware, middleware, observe, handler)
+        else:
+            handler = partial(middleware, handler)
+    return handler
+
+
 class LoggingMiddleware(BaseMiddleware):
     """Middleware для логирования"""
     
@@ -58,7 +111,6 @@ class ThrottlingMiddleware(BaseMiddleware):
         update: Update
     ) -> Any:
         import asyncio
-        import time
         
         # Определяем пользователя
         user_id = None
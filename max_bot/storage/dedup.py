@@ -0,0 +1,155 @@
+"""
+Хранилища для отсева повторно доставленных обновлений
+"""
+
+import asyncio
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+
+class BaseDedupStore(ABC):
+    """Базовый класс для хранилищ недавно полученных update_id
+
+    Хранилище помнит последние window идентификаторов каждого бота.
+    """
+
+    @abstractmethod
+    async def add(self, key: str, update_id: int) -> bool:
+        """Отметка update_id как полученного
+
+        Возвращает False, если обновление уже было получено.
+        """
+        pass
+
+    @abstractmethod
+    async def discard(self, key: str, update_id: int):
+        """Удаление отметки, чтобы обновление можно было обработать снова"""
+        pass
+
+    async def close(self):
+        """Освобождение ресурсов"""
+        pass
+
+
+class DedupWindow:
+    """Окно последних update_id фиксированного размера
+
+    Кольцевой буфер задает порядок вытеснения, словарь update_id -> слот
+    в кольце - проверку за O(1). Память не растет с числом обработанных
+    обновлений.
+    """
+
+    def __init__(self, size: int = 10000):
+        if size < 1:
+            raise ValueError("size must be positive")
+        self.size = size
+        self._ring: List[Optional[int]] = [None] * size
+        self._seen: Dict[int, int] = {}
+        self._position = 0
+
+    def __contains__(self, update_id: int) -> bool:
+        return update_id in self._seen
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    def add(self, update_id: int) -> bool:
+        """Добавление update_id, False для уже известного"""
+        if update_id in self._seen:
+            return False
+        position = self._position
+        evicted = self._ring[position]
+        if evicted is not None:
+            del self._seen[evicted]
+        self._ring[position] = update_id
+        self._seen[update_id] = position
+        self._position = (position + 1) % self.size
+        return True
+
+    def discard(self, update_id: int):
+        """Удаление update_id из окна
+
+        Слот в кольце очищается, поэтому повторно добавленный update_id
+        живет в окне полный срок.
+        """
+        position = self._seen.pop(update_id, None)
+        if position is not None:
+            self._ring[position] = None
+
+
+class MemoryDedupStore(BaseDedupStore):
+    """Хранилище update_id в памяти процесса"""
+
+    def __init__(self, window: int = 10000):
+        self.window = window
+        self.windows: Dict[str, DedupWindow] = {}
+
+    def _window(self, key: str) -> DedupWindow:
+        window = self.windows.get(key)
+        if window is None:
+            window = self.windows[key] = DedupWindow(self.window)
+        return window
+
+    async def add(self, key: str, update_id: int) -> bool:
+        return self._window(key).add(update_id)
+
+    async def discard(self, key: str, update_id: int):
+        self._window(key).discard(update_id)
+
+
+class SQLiteDedupStore(BaseDedupStore):
+    """Хранилище update_id в SQLite, общее для процессов на одной машине
+
+    Идентификаторы старше последних window удаляются пачками.
+    """
+
+    def __init__(self, path: str, window: int = 10000):
+        self.path = path
+        self.window = window
+        self._lock = threading.Lock()
+        self._inserted = 0
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS seen_updates ("
+            "key TEXT NOT NULL, update_id INTEGER NOT NULL, "
+            "PRIMARY KEY (key, update_id))"
+        )
+        self._connection.commit()
+
+    def _add(self, key: str, update_id: int) -> bool:
+        with self._lock:
+            cursor = self._connection.execute(
+                "INSERT OR IGNORE INTO seen_updates (key, update_id) VALUES (?, ?)",
+                (key, update_id)
+            )
+            added = cursor.rowcount == 1
+            if added:
+                self._inserted += 1
+                if self._inserted >= max(self.window // 10, 1):
+                    self._inserted = 0
+                    self._connection.execute(
+                        "DELETE FROM seen_updates WHERE key = ? AND update_id <= ?",
+                        (key, update_id - self.window)
+                    )
+            self._connection.commit()
+        return added
+
+    def _discard(self, key: str, update_id: int):
+        with self._lock:
+            self._connection.execute(
+                "DELETE FROM seen_updates WHERE key = ? AND update_id = ?", (key, update_id)
+            )
+            self._connection.commit()
+
+    async def add(self, key: str, update_id: int) -> bool:
+        return await asyncio.to_thread(self._add, key, update_id)
+
+    async def discard(self, key: str, update_id: int):
+        await asyncio.to_thread(self._discard, key, update_id)
+
+    async def close(self):
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,169 @@
+"""
+Хранилища offset для возобновления polling после перезапуска
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Optional
+
+
+def offset_key(token: str) -> str:
+    """Ключ бота в хранилище, не раскрывающий токен"""
+    return hashlib.sha256(token.encode()).hexdigest()[:16]
+
+
+class BaseOffsetStore(ABC):
+    """Базовый класс для хранилищ offset"""
+
+    @abstractmethod
+    async def load(self, key: str) -> Optional[int]:
+        """Загрузка сохраненного offset"""
+        pass
+
+    @abstractmethod
+    async def save(self, key: str, offset: int):
+        """Сохранение offset"""
+        pass
+
+    async def close(self):
+        """Освобождение ресурсов"""
+        pass
+
+
+class MemoryOffsetStore(BaseOffsetStore):
+    """Хранилище offset в памяти процесса"""
+
+    def __init__(self):
+        self.offsets: Dict[str, int] = {}
+
+    async def load(self, key: str) -> Optional[int]:
+        return self.offsets.get(key)
+
+    async def save(self, key: str, offset: int):
+        self.offsets[key] = offset
+
+
+class FileOffsetStore(BaseOffsetStore):
+    """Хранилище offset в JSON файле
+
+    Файл перезаписывается атомарно через временный файл,
+    поэтому сбой во время записи не портит сохраненные данные.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _read(self) -> Dict[str, int]:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _write(self, key: str, offset: int):
+        with self._lock:
+            offsets = self._read()
+            offsets[key] = offset
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(offsets, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+
+    async def load(self, key: str) -> Optional[int]:
+        offsets = await asyncio.to_thread(self._read)
+        return offsets.get(key)
+
+    async def save(self, key: str, offset: int):
+        await asyncio.to_thread(self._write, key, offset)
+
+
+class SQLiteOffsetStore(BaseOffsetStore):
+    """Хранилище offset в SQLite"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS offsets (key TEXT PRIMARY KEY, offset INTEGER NOT NULL)"
+        )
+        self._connection.commit()
+
+    def _read(self, key: str) -> Optional[int]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT offset FROM offsets WHERE key = ?", (key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def _write(self, key: str, offset: int):
+        with self._lock:
+            self._connection.execute(
+                "INSERT INTO offsets (key, offset) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET offset = excluded.offset",
+                (key, offset)
+            )
+            self._connection.commit()
+
+    async def load(self, key: str) -> Optional[int]:
+        return await asyncio.to_thread(self._read, key)
+
+    async def save(self, key: str, offset: int):
+        await asyncio.to_thread(self._write, key, offset)
+
+    async def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+class OffsetCheckpointer:
+    """Периодическое сохранение offset
+
+    Offset сохраняется не чаще раза в interval секунд и только
+    если он изменился с прошлого сохранения.
+    """
+
+    def __init__(
+        self,
+        store: BaseOffsetStore,
+        key: str,
+        get_offset: Callable[[], Optional[int]],
+        interval: float = 1.0
+    ):
+        self.store = store
+        self.key = key
+        self.get_offset = get_offset
+        self.interval = interval
+        self.committed: Optional[int] = None
+        self.logger = logging.getLogger(__name__)
+
+    async def load(self) -> int:
+        """Загрузка сохраненного offset"""
+        self.committed = await self.store.load(self.key)
+        return self.committed or 0
+
+    async def commit(self):
+        """Сохранение текущего offset, если он изменился"""
+        offset = self.get_offset()
+        if offset is None or offset == self.committed:
+            return
+        await self.store.save(self.key, offset)
+        self.committed = offset
+
+    async def run(self):
+        """Периодическое сохранение до отмены"""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.commit()
+            except Exception as e:
+                self.logger.error(f"Offset checkpoint failed: {e}")
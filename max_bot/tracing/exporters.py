@@ -0,0 +1,191 @@
+"""
+Экспортеры отрезков трассировки
+"""
+
+import json
+import logging
+import queue
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Sequence
+from .tracer import Span
+
+
+logger = logging.getLogger(__name__)
+
+
+class BaseSpanExporter(ABC):
+    """Базовый класс для экспортеров
+
+    export вызывается в цикле событий после обработки обновления
+    и должен работать быстро.
+    """
+
+    @abstractmethod
+    def export(self, spans: Sequence[Span], service_name: str):
+        """Экспорт отрезков одной трассы"""
+        pass
+
+    def close(self):
+        """Освобождение ресурсов"""
+        pass
+
+
+class RingBufferExporter(BaseSpanExporter):
+    """Последние отрезки в памяти процесса
+
+    Удобен для отладки и тестов: буфер не растет больше size.
+    """
+
+    def __init__(self, size: int = 10000):
+        self.spans: Deque[Span] = deque(maxlen=size)
+
+    def export(self, spans: Sequence[Span], service_name: str):
+        self.spans.extend(spans)
+
+    def trace(self, trace_id: str) -> List[Span]:
+        """Отрезки трассы в порядке начала"""
+        return sorted(
+            (s for s in self.spans if s.trace_id == trace_id),
+            key=lambda s: s.start_time
+        )
+
+    def slowest(self, count: int = 10, name: str = "update") -> List[Span]:
+        """Самые долгие отрезки с заданным именем"""
+        candidates = [s for s in self.spans if s.name == name]
+        return sorted(candidates, key=lambda s: s.duration, reverse=True)[:count]
+
+
+class JSONLinesExporter(BaseSpanExporter):
+    """Отрезки в файл, по одному JSON объекту в строке
+
+    export только ставит трассу в очередь: сериализация и запись идут
+    в отдельном потоке, поэтому диск не задерживает обработку обновлений.
+    Файл сбрасывается на диск, когда в буфере набралось buffer_size
+    байт или прошло flush_interval секунд с прошлой записи.
+    """
+
+    def __init__(self, path: str, flush_interval: float = 1.0, buffer_size: int = 64 * 1024):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.buffer_size = buffer_size
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._closing: Optional[threading.Event] = None
+        self._file = open(path, "a", encoding="utf-8")
+        self._thread = threading.Thread(target=self._run, name="max-bot-span-writer", daemon=True)
+        self._thread.start()
+
+    def _format(self, spans: Sequence[Span], service_name: str) -> List[str]:
+        """Строки файла для трассы"""
+        lines = []
+        for s in spans:
+            data = s.to_dict()
+            data["service"] = service_name
+            lines.append(json.dumps(data, ensure_ascii=False, default=str) + "\n")
+        return lines
+
+    def _run(self):
+        """Запись трасс из очереди"""
+        buffer: List[str] = []
+        size = 0
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if isinstance(item, tuple):
+                try:
+                    lines = self._format(*item)
+                except Exception as e:
+                    logger.error(f"Span export failed: {e}")
+                    lines = []
+                for line in lines:
+                    buffer.append(line)
+                    size += len(line)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                if size < self.buffer_size:
+                    continue
+            if buffer:
+                self._file.write("".join(buffer))
+                self._file.flush()
+                buffer.clear()
+                size = 0
+            deadline = None
+            if isinstance(item, threading.Event):
+                # flush или close ждут, пока записано все, что было до них
+                item.set()
+                if item is self._closing:
+                    return
+
+    def export(self, spans: Sequence[Span], service_name: str):
+        self._queue.put((spans, service_name))
+
+    def flush(self, timeout: Optional[float] = None):
+        """Ожидание записи трасс, переданных до вызова"""
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def close(self):
+        if self._closing is not None:
+            return
+        self._closing = threading.Event()
+        self._queue.put(self._closing)
+        self._thread.join()
+        self._file.close()
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    """Значение атрибута в формате OTLP"""
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(spans: Sequence[Span], service_name: str) -> Dict[str, Any]:
+    """Отрезки в формате OTLP/JSON (ExportTraceServiceRequest)"""
+    otlp_spans = []
+    for s in spans:
+        otlp_span = {
+            "traceId": s.trace_id,
+            "spanId": s.span_id,
+            "name": s.name,
+            "kind": 1,
+            "startTimeUnixNano": str(s.start_time),
+            "endTimeUnixNano": str(s.end_time),
+            "attributes": [
+                {"key": key, "value": _otlp_value(value)} for key, value in s.attributes.items()
+            ],
+            "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+        }
+        if s.parent_id:
+            otlp_span["parentSpanId"] = s.parent_id
+        otlp_spans.append(otlp_span)
+    return {
+        "resourceSpans": [{
+            "resource": {
+                "attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]
+            },
+            "scopeSpans": [{"scope": {"name": "max_bot"}, "spans": otlp_spans}],
+        }]
+    }
+
+
+class OTLPJSONExporter(JSONLinesExporter):
+    """Трассы в формате OTLP/JSON, по одному запросу в строке
+
+    Такой файл читает OpenTelemetry Collector (приемник otlpjsonfile),
+    а строку можно без изменений отправить POST запросом на /v1/traces.
+    """
+
+    def _format(self, spans: Sequence[Span], service_name: str) -> List[str]:
+        return [json.dumps(to_otlp(spans, service_name), ensure_ascii=False) + "\n"]
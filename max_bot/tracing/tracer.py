@@ -0,0 +1,196 @@
+"""
+Трассировка обработки обновлений
+"""
+
+import logging
+import random
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Sequence, TYPE_CHECKING
+from ..core.types import Update
+
+if TYPE_CHECKING:
+    from .exporters import BaseSpanExporter
+
+
+_current_span: ContextVar[Optional['Span']] = ContextVar("max_bot_current_span", default=None)
+
+
+class Span:
+    """Отрезок обработки обновления
+
+    Время начала и конца - наносекунды unix времени.
+    """
+
+    __slots__ = (
+        "name", "trace_id", "span_id", "parent_id", "start_time", "end_time",
+        "attributes", "error", "_spans", "_token",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_id: Optional[str],
+        spans: List['Span'],
+        attributes: Optional[Dict[str, Any]] = None
+    ):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.start_time = 0
+        self.end_time = 0
+        self.attributes = attributes or {}
+        self.error: Optional[str] = None
+        self._spans = spans
+        self._token = None
+
+    @property
+    def duration(self) -> float:
+        """Длительность в секундах"""
+        return (self.end_time - self.start_time) / 1e9
+
+    def set_attribute(self, key: str, value: Any):
+        """Добавление атрибута"""
+        self.attributes[key] = value
+
+    def __enter__(self) -> 'Span':
+        self._token = _current_span.set(self)
+        self.start_time = time.time_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.end_time = time.time_ns()
+        if exc_val is not None:
+            self.error = f"{exc_type.__name__}: {exc_val}"
+        _current_span.reset(self._token)
+        self._spans.append(self)
+        return False
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Представление для экспорта"""
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "duration": self.duration,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _NoopSpan:
+    """Заглушка вне трассируемого обновления"""
+
+    __slots__ = ()
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def span(name: str, attributes: Optional[Dict[str, Any]] = None):
+    """Дочерний отрезок текущей трассы
+
+    Если обновление не попало в выборку, возвращается заглушка,
+    и трассировка почти ничего не стоит.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return NOOP_SPAN
+    return Span(name, parent.trace_id, parent.span_id, parent._spans, attributes)
+
+
+def current_span() -> Optional[Span]:
+    """Текущий отрезок трассы"""
+    return _current_span.get()
+
+
+def current_trace_id() -> Optional[str]:
+    """Идентификатор трассы обрабатываемого обновления"""
+    current = _current_span.get()
+    return current.trace_id if current is not None else None
+
+
+class TraceIdFilter(logging.Filter):
+    """Фильтр логов, добавляющий trace_id в записи
+
+    Пример формата: "%(asctime)s [%(trace_id)s] %(message)s".
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = current_trace_id() or "-"
+        return True
+
+
+class Tracer:
+    """Трассировщик обновлений
+
+    sample_rate - доля трассируемых обновлений (0..1), sampler -
+    собственное правило выборки по обновлению. Отрезки трассы
+    передаются экспортерам целиком после обработки обновления.
+    """
+
+    def __init__(
+        self,
+        exporters: Sequence['BaseSpanExporter'] = (),
+        sample_rate: float = 1.0,
+        sampler: Optional[Callable[[Update], bool]] = None,
+        service_name: str = "max_bot"
+    ):
+        if not 0 <= sample_rate <= 1:
+            raise ValueError("sample_rate must be between 0 and 1")
+        self.exporters = list(exporters)
+        self.sample_rate = sample_rate
+        self.sampler = sampler
+        self.service_name = service_name
+        self.logger = logging.getLogger(__name__)
+
+    def add_exporter(self, exporter: 'BaseSpanExporter'):
+        """Добавление экспортера"""
+        self.exporters.append(exporter)
+
+    def should_sample(self, update: Update) -> bool:
+        """Попадает ли обновление в выборку"""
+        if self.sampler is not None:
+            return self.sampler(update)
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def start_trace(self, update: Update) -> Optional[Span]:
+        """Корневой отрезок для обновления или None вне выборки"""
+        if not self.should_sample(update):
+            return None
+        root = Span(
+            "update",
+            f"{random.getrandbits(128):032x}",
+            None,
+            [],
+            {"update_id": update.update_id, "update_type": update.event_type}
+        )
+        return root
+
+    def finish_trace(self, root: Span):
+        """Передача отрезков трассы экспортерам"""
+        spans = root._spans
+        for exporter in self.exporters:
+            try:
+                exporter.export(spans, self.service_name)
+            except Exception as e:
+                self.logger.error(f"Span export failed: {e}")
+
+    def close(self):
+        """Закрытие экспортеров"""
+        for exporter in self.exporters:
+            exporter.close()
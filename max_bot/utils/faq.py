@@ -0,0 +1,278 @@
+"""
+Поиск ответов на частые вопросы
+"""
+
+import heapq
+import json
+import math
+import re
+import sys
+from array import array
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from ..core.text import normalize_text
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# Версия формата файла индекса (save/load)
+FORMAT_VERSION = 1
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+@dataclass
+class FAQMatch:
+    """Найденный вопрос
+
+    score - близость к запросу от 0 до 1: 1 - все слова и n-граммы
+    запроса есть в вопросе.
+    """
+    id: int
+    question: str
+    answer: Any
+    score: float
+
+
+class FAQIndex:
+    """Индекс вопросов с ранжированием BM25
+
+    Признаки вопроса - слова и символьные n-граммы слов, поэтому опечатки
+    и другие формы слова снижают близость, но не обнуляют ее. Индекс
+    хранит для каждого признака списки вопросов и частот, а веса BM25
+    вычисляются при поиске только для признаков запроса. С numpy
+    вычисление векторное, без него - в цикле по спискам.
+
+    Добавление и удаление вопроса меняют только списки его признаков,
+    число вопросов и их суммарную длину, поэтому пересчета всего индекса
+    нет ни после изменений, ни после load.
+    """
+
+    def __init__(
+        self,
+        ngram: int = 3,
+        k1: float = 1.2,
+        b: float = 0.75,
+        use_numpy: Optional[bool] = None
+    ):
+        if use_numpy and np is None:
+            raise ImportError("numpy is not installed")
+        self.ngram = ngram
+        self.k1 = k1
+        self.b = b
+        self.use_numpy = np is not None if use_numpy is None else use_numpy
+        self.questions: List[str] = []
+        self.answers: List[Any] = []
+        self.deleted: Set[int] = set()
+        self._terms: Dict[str, int] = {}
+        # Списки вопросов и частот по признакам, удаленные вопросы из них убираются
+        self._postings: List[array] = []
+        self._frequencies: List[array] = []
+        self._lengths = array("f")
+        self._total_length = 0.0
+
+    def features(self, text: str) -> Counter:
+        """Признаки текста: слова и n-граммы слов"""
+        counts: Counter = Counter()
+        n = self.ngram
+        for word in _TOKEN_RE.findall(normalize_text(text)):
+            padded = f" {word} "
+            counts[padded] += 1
+            for i in range(len(padded) - n + 1):
+                counts[padded[i:i + n]] += 1
+        return counts
+
+    def add(self, question: str, answer: Any) -> int:
+        """Добавление вопроса, возвращает его id"""
+        entry_id = len(self.questions)
+        self.questions.append(question)
+        self.answers.append(answer)
+        counts = self.features(question)
+        for term, count in counts.items():
+            term_id = self._terms.get(term)
+            if term_id is None:
+                term_id = self._terms[term] = len(self._postings)
+                self._postings.append(array("i"))
+                self._frequencies.append(array("f"))
+            self._postings[term_id].append(entry_id)
+            self._frequencies[term_id].append(count)
+        length = sum(counts.values())
+        self._lengths.append(length)
+        self._total_length += length
+        return entry_id
+
+    def add_many(self, entries: Iterable[Tuple[str, Any]]) -> List[int]:
+        """Добавление пар вопрос-ответ"""
+        return [self.add(question, answer) for question, answer in entries]
+
+    def remove(self, entry_id: int):
+        """Удаление вопроса
+
+        id остальных вопросов не меняются, вопрос убирается из списков
+        своих признаков.
+        """
+        if not 0 <= entry_id < len(self.questions) or entry_id in self.deleted:
+            raise KeyError(entry_id)
+        for term in self.features(self.questions[entry_id]):
+            term_id = self._terms[term]
+            postings = self._postings[term_id]
+            position = postings.index(entry_id)
+            del postings[position]
+            del self._frequencies[term_id][position]
+        self.deleted.add(entry_id)
+        self._total_length -= self._lengths[entry_id]
+
+    def __len__(self) -> int:
+        return len(self.questions) - len(self.deleted)
+
+    @staticmethod
+    def _idf(count: int, frequency: int) -> float:
+        return math.log(1 + (count - frequency + 0.5) / (frequency + 0.5))
+
+    def search(self, query: str, k: int = 3, threshold: float = 0.0) -> List[FAQMatch]:
+        """До k самых близких вопросов с близостью не ниже threshold"""
+        counts = self.features(query)
+        count = len(self)
+        if not counts or not count:
+            return []
+
+        known = []
+        norm = 0.0
+        for term, term_count in counts.items():
+            term_id = self._terms.get(term)
+            frequency = len(self._postings[term_id]) if term_id is not None else 0
+            idf = self._idf(count, frequency)
+            norm += term_count * idf
+            if frequency:
+                known.append((term_id, term_count * idf))
+        if not known or norm <= 0:
+            return []
+
+        # Знаменатель BM25: tf + a + c * длина вопроса
+        avgdl = self._total_length / count or 1.0
+        a = self.k1 * (1 - self.b)
+        c = self.k1 * self.b / avgdl
+        if self.use_numpy:
+            top = self._search_numpy(known, k, a, c)
+        else:
+            top = self._search_python(known, k, a, c)
+
+        result = []
+        for entry_id, raw in top:
+            score = min(1.0, raw / norm)
+            if raw <= 0 or score < threshold:
+                break
+            result.append(FAQMatch(entry_id, self.questions[entry_id], self.answers[entry_id], score))
+        return result
+
+    def _search_numpy(
+        self, known: List[Tuple[int, float]], k: int, a: float, c: float
+    ) -> List[Tuple[int, float]]:
+        scores = np.zeros(len(self.questions), dtype=np.float32)
+        lengths = np.frombuffer(self._lengths, dtype=np.float32)
+        k1 = self.k1 + 1
+        for term_id, weight in known:
+            ids = np.frombuffer(self._postings[term_id], dtype=np.intc)
+            tfs = np.frombuffer(self._frequencies[term_id], dtype=np.float32)
+            scores[ids] += (weight * k1) * tfs / (tfs + a + c * lengths[ids])
+        if k >= len(scores):
+            top = np.argsort(-scores)
+        else:
+            top = np.argpartition(-scores, k)[:k]
+            top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top[:k]]
+
+    def _search_python(
+        self, known: List[Tuple[int, float]], k: int, a: float, c: float
+    ) -> List[Tuple[int, float]]:
+        scores: Dict[int, float] = {}
+        get = scores.get
+        lengths = self._lengths
+        k1 = self.k1 + 1
+        for term_id, weight in known:
+            weight *= k1
+            for entry_id, tf in zip(self._postings[term_id], self._frequencies[term_id]):
+                scores[entry_id] = get(entry_id, 0.0) + weight * tf / (tf + a + c * lengths[entry_id])
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def answer(self, query: str, threshold: float = 0.4) -> Optional[FAQMatch]:
+        """Лучший вопрос, если его близость не ниже threshold"""
+        matches = self.search(query, 1, threshold)
+        return matches[0] if matches else None
+
+    def save(self, path: str):
+        """Сохранение индекса в файл
+
+        Первая строка - JSON с вопросами, ответами и словарем признаков,
+        дальше - списки признаков и длины вопросов в двоичном виде.
+        Ответы должны сериализоваться в JSON.
+        """
+        header = {
+            "version": FORMAT_VERSION,
+            "byteorder": sys.byteorder,
+            "ngram": self.ngram,
+            "k1": self.k1,
+            "b": self.b,
+            "questions": self.questions,
+            "answers": self.answers,
+            "deleted": sorted(self.deleted),
+            "terms": list(self._terms),
+        }
+        sizes = array("i", (len(p) for p in self._postings))
+        with open(path, "wb") as f:
+            f.write(json.dumps(header, ensure_ascii=False).encode() + b"\n")
+            f.write(sizes.tobytes())
+            for postings in self._postings:
+                f.write(postings.tobytes())
+            for frequencies in self._frequencies:
+                f.write(frequencies.tobytes())
+            f.write(self._lengths.tobytes())
+
+    @classmethod
+    def load(cls, path: str, use_numpy: Optional[bool] = None) -> 'FAQIndex':
+        """Загрузка индекса, сохраненного save
+
+        Вопросы не разбираются заново, индекс готов к поиску сразу.
+        """
+        with open(path, "rb") as f:
+            header = json.loads(f.readline())
+            data = memoryview(f.read())
+        version = header.get("version")
+        if version != FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported FAQ index version {version!r} in {path}, expected {FORMAT_VERSION}; "
+                "rebuild the index and save it again"
+            )
+
+        index = cls(header["ngram"], header["k1"], header["b"], use_numpy)
+        index.questions = header["questions"]
+        index.answers = header["answers"]
+        index.deleted = set(header["deleted"])
+        terms = header["terms"]
+        index._terms = {term: term_id for term_id, term in enumerate(terms)}
+        swap = header["byteorder"] != sys.byteorder
+
+        def read(typecode: str, offset: int, count: int) -> Tuple[array, int]:
+            values = array(typecode)
+            end = offset + count * values.itemsize
+            values.frombytes(data[offset:end])
+            if swap:
+                values.byteswap()
+            return values, end
+
+        sizes, offset = read("i", 0, len(terms))
+        for size in sizes:
+            postings, offset = read("i", offset, size)
+            index._postings.append(postings)
+        for size in sizes:
+            frequencies, offset = read("f", offset, size)
+            index._frequencies.append(frequencies)
+        index._lengths, offset = read("f", offset, len(index.questions))
+        index._total_length = sum(
+            length for entry_id, length in enumerate(index._lengths) if entry_id not in index.deleted
+        )
+        return index
@@ -2,54 +2,115 @@
 HTTP клиент для MAX API
 """
 
-import aiohttp
 import json
-from typing import Dict, Any, Optional
+import time
+from typing import Dict, Any, Optional, TYPE_CHECKING
 from ..core.types import Update, BotInfo
+from ..tracing.tracer import span
+
+if TYPE_CHECKING:
+    import aiohttp
 
 
 class MaxAPIClient:
-    """Клиент для работы с MAX API"""
+    """Клиент для работы с MAX API
+    
+    metrics - метрики бота (BotMetrics), в которые записывается время
+    и ошибки запросов по методам API. aiohttp импортируется при
+    открытии клиента, а не при импорте модуля.
+    """
     
-    def __init__(self, token: str, base_url: str = "https://api.max.ru"):
+    # Запас HTTP таймаута сверх времени long polling (в секундах)
+    LONG_POLL_MARGIN = 10
+    
+    def __init__(
+        self,
+        token: str,
+        base_url: str = "https://api.max.ru",
+        session: Optional['aiohttp.ClientSession'] = None,
+        metrics=None
+    ):
         self.token = token
+        self.metrics = metrics
         self.base_url = base_url
-        self.session: Optional[aiohttp.ClientSession] = None
+        self.session: Optional['aiohttp.ClientSession'] = session
+        # Переданная извне сессия общая для нескольких клиентов и не закрывается
+        self._owns_session = session is None
     
     async def __aenter__(self):
-        self.session = aiohttp.ClientSession()
+        if self._owns_session:
+            import aiohttp
+            self.session = aiohttp.ClientSession()
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self.session:
+        if self.session and self._owns_session:
             await self.session.close()
     
-    async def _request(self, method: str, endpoint: str, data: Dict = None) -> Dict[str, Any]:
+    async def _request(
+        self,
+        method: str,
+        endpoint: str,
+        data: Dict = None,
+        timeout: float = None
+    ) -> Dict[str, Any]:
         """Выполнение HTTP запроса"""
         if not self.session:
             raise RuntimeError("Session not initialized. Use async context manager.")
         
         url = f"{self.base_url}/bot{self.token}/{endpoint}"
         headers = {"Content-Type": "application/json"}
+        kwargs = {}
+        if timeout is not None:
+            import aiohttp
+            kwargs["timeout"] = aiohttp.ClientTimeout(total=timeout)
         
-        async with self.session.request(method, url, json=data, headers=headers) as response:
-            return await response.json()
+        with span(f"api {endpoint}") as request_span:
+            if self.metrics is None:
+                async with self.session.request(method, url, json=data, headers=headers, **kwargs) as response:
+                    request_span.set_attribute("status", response.status)
+                    return await response.json()
+            
+            latency, errors = self.metrics.api_request(endpoint)
+            started = time.perf_counter()
+            try:
+                async with self.session.request(method, url, json=data, headers=headers, **kwargs) as response:
+                    request_span.set_attribute("status", response.status)
+                    return await response.json()
+            except Exception:
+                errors.inc()
+                raise
+            finally:
+                latency.observe(time.perf_counter() - started)
     
     async def get_me(self) -> BotInfo:
         """Получение информации о боте"""
         data = await self._request("GET", "getMe")
         return BotInfo(**data["result"])
     
-    async def get_updates(self, offset: int = None, limit: int = 100) -> list[Update]:
-        """Получение обновлений"""
+    async def get_updates(
+        self,
+        offset: int = None,
+        limit: int = 100,
+        timeout: int = 0
+    ) -> list[Update]:
+        """Получение обновлений
+        
+        timeout - время long polling в секундах: сервер держит запрос,
+        пока не появятся обновления или не истечет timeout.
+        """
         params = {}
         if offset:
             params["offset"] = offset
         if limit:
             params["limit"] = limit
+        if timeout:
+            params["timeout"] = timeout
         
-        data = await self._request("GET", "getUpdates", params)
-        return [Update(**update) for update in data["result"]]
+        # HTTP таймаут должен превышать время ожидания на сервере
+        request_timeout = timeout + self.LONG_POLL_MARGIN if timeout else None
+        data = await self._request("GET", "getUpdates", params, timeout=request_timeout)
+        return [Update.from_dict(update) for update in data["result"]]
     
     async def send_message(self, chat_id: int, text: str, **kwargs) -> Dict[str, Any]:
         """Отправка сообщения"""
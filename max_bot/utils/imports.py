@@ -0,0 +1,33 @@
+"""
+Импорт объектов по строковому пути
+"""
+
+import importlib
+from typing import Any, Tuple
+
+
+def split_import_path(path: str) -> Tuple[str, str]:
+    """Имя модуля и атрибута из пути вида "package.module:attribute"
+
+    Вместо двоеточия допускается последняя точка: "package.module.attribute".
+    """
+    if ":" in path:
+        module_name, _, attribute = path.partition(":")
+    else:
+        module_name, _, attribute = path.rpartition(".")
+    if not module_name or not attribute:
+        raise ImportError(f"Invalid import path: {path!r}")
+    return module_name, attribute
+
+
+def import_object(path: str) -> Any:
+    """Импорт объекта по пути из split_import_path"""
+    module_name, attribute = split_import_path(path)
+    module = importlib.import_module(module_name)
+    obj = module
+    for name in attribute.split("."):
+        try:
+            obj = getattr(obj, name)
+        except AttributeError:
+            raise ImportError(f"{module_name!r} has no attribute {attribute!r}") from None
+    return obj
@@ -0,0 +1,18 @@
+"""
+Настройка логирования
+"""
+
+import logging
+from typing import Union
+
+
+DEFAULT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+
+def setup_logging(level: Union[int, str] = logging.INFO, format: str = DEFAULT_FORMAT):
+    """Вывод логов в stderr
+
+    Библиотека сама логирование не настраивает: приложение вызывает
+    эту функцию или настраивает logging по-своему.
+    """
+    logging.basicConfig(level=level, format=format)
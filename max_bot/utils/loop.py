@@ -0,0 +1,103 @@
+"""
+Создание и настройка цикла событий для запуска ботов
+"""
+
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Awaitable, Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class LoopSettings:
+    """Настройки цикла событий
+
+    use_uvloop - использовать uvloop, если он установлен;
+    executor_workers - размер пула потоков для run_in_executor и to_thread;
+    slow_callback_duration - порог в секундах, после которого в лог пишется
+    предупреждение о медленном callback (включает режим отладки цикла).
+    """
+    use_uvloop: bool = True
+    executor_workers: Optional[int] = None
+    slow_callback_duration: Optional[float] = None
+    debug: bool = False
+
+
+def new_event_loop(use_uvloop: bool = True) -> asyncio.AbstractEventLoop:
+    """Новый цикл событий: uvloop при наличии, иначе стандартный"""
+    if use_uvloop:
+        try:
+            import uvloop
+        except ImportError:
+            pass
+        else:
+            return uvloop.new_event_loop()
+    return asyncio.new_event_loop()
+
+
+def loop_name(loop: asyncio.AbstractEventLoop) -> str:
+    """Название реализации цикла событий"""
+    cls = type(loop)
+    return f"{cls.__module__}.{cls.__qualname__}"
+
+
+def run(main: Awaitable[Any], settings: Optional[LoopSettings] = None) -> Any:
+    """Запуск корутины в новом цикле событий
+
+    Замена asyncio.run, которую используют все точки запуска ботов.
+    """
+    settings = settings or LoopSettings()
+    debug = settings.debug or settings.slow_callback_duration is not None
+
+    def factory() -> asyncio.AbstractEventLoop:
+        loop = new_event_loop(settings.use_uvloop)
+        if settings.executor_workers:
+            loop.set_default_executor(ThreadPoolExecutor(
+                max_workers=settings.executor_workers,
+                thread_name_prefix="max-bot"
+            ))
+        if settings.slow_callback_duration is not None:
+            loop.slow_callback_duration = settings.slow_callback_duration
+        logger.info(f"Event loop: {loop_name(loop)}")
+        return loop
+
+    if hasattr(asyncio, "Runner"):
+        with asyncio.Runner(debug=debug or None, loop_factory=factory) as runner:
+            return runner.run(main)
+
+    # Python < 3.11: то же, что делает asyncio.Runner
+    loop = factory()
+    try:
+        asyncio.set_event_loop(loop)
+        if debug:
+            loop.set_debug(True)
+        return loop.run_until_complete(main)
+    finally:
+        try:
+            _cancel_all_tasks(loop)
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.run_until_complete(loop.shutdown_default_executor())
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+
+
+def _cancel_all_tasks(loop: asyncio.AbstractEventLoop):
+    """Отмена задач, оставшихся в цикле после завершения main"""
+    tasks = asyncio.all_tasks(loop)
+    if not tasks:
+        return
+    for task in tasks:
+        task.cancel()
+    loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+    for task in tasks:
+        if not task.cancelled() and task.exception() is not None:
+            loop.call_exception_handler({
+                "message": "unhandled exception during shutdown",
+                "exception": task.exception(),
+                "task": task,
+            })
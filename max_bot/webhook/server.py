@@ -0,0 +1,168 @@
+"""
+Webhook сервер для получения обновлений от MAX API
+"""
+
+import asyncio
+import hmac
+import json
+import logging
+from typing import Dict, Optional, TYPE_CHECKING
+from aiohttp import web
+from ..core.scheduler import UpdateScheduler
+from ..core.types import Update
+
+if TYPE_CHECKING:
+    from ..core.dispatcher import Dispatcher
+
+
+SECRET_HEADER = "X-Max-Bot-Api-Secret-Token"
+
+
+class WebhookServer:
+    """Webhook сервер
+
+    Запрос подтверждается сразу после разбора обновления, а само
+    обновление попадает в ограниченную очередь, которую разбирает
+    диспетчер. При переполнении очереди сервер отвечает 429,
+    во время остановки - 503, чтобы MAX API повторил доставку позже.
+    """
+
+    def __init__(
+        self,
+        dispatcher: 'Dispatcher',
+        path: str = "/webhook",
+        secret: Optional[str] = None,
+        host: str = "0.0.0.0",
+        port: int = 8080,
+        queue_size: int = 1000,
+        concurrency: int = 10,
+        max_pending: int = 1000,
+        secret_header: str = SECRET_HEADER,
+        limiter: Optional[asyncio.Semaphore] = None,
+        lanes: Optional[Dict[str, int]] = None
+    ):
+        self.dispatcher = dispatcher
+        self.path = path
+        self.secret = secret
+        self.host = host
+        self.port = port
+        self.secret_header = secret_header
+        self.logger = logging.getLogger(__name__)
+
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.scheduler = UpdateScheduler(
+            dispatcher.process_update,
+            max_concurrency=concurrency,
+            max_pending=max_pending,
+            track_offset=False,
+            limiter=limiter,
+            lanes=lanes
+        )
+        self.accepted = 0
+        self.rejected = 0
+        self._accepting = False
+        self._closing = asyncio.Event()
+        self._runner: Optional[web.AppRunner] = None
+        self._drain_task: Optional[asyncio.Task] = None
+
+    def create_app(self) -> web.Application:
+        """Создание aiohttp приложения"""
+        app = web.Application()
+        app.router.add_post(self.path, self.handle)
+        return app
+
+    async def handle(self, request: web.Request) -> web.Response:
+        """Прием обновления"""
+        if not self._accepting:
+            self.rejected += 1
+            return web.Response(status=503, headers={"Retry-After": "1"})
+
+        if self.secret is not None:
+            token = request.headers.get(self.secret_header, "")
+            if not hmac.compare_digest(token, self.secret):
+                return web.Response(status=403)
+
+        try:
+            update = Update.from_dict(await request.json())
+        except (json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+            self.logger.warning(f"Invalid webhook payload: {e}")
+            return web.Response(status=400)
+
+        try:
+            self.queue.put_nowait(update)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return web.Response(status=429, headers={"Retry-After": "1"})
+
+        self.accepted += 1
+        return web.Response(status=200)
+
+    async def _drain(self):
+        """Передача обновлений из очереди в обработку"""
+        while True:
+            update = await self.queue.get()
+            try:
+                await self.scheduler.submit(update)
+            finally:
+                self.queue.task_done()
+
+    def start_processing(self):
+        """Начало приема и обработки обновлений"""
+        if self._drain_task is None:
+            self._drain_task = asyncio.create_task(self._drain())
+        self._accepting = True
+
+    async def stop_processing(self, timeout: float = 30.0):
+        """Прекращение приема и обработка уже принятых обновлений
+
+        Принятые обновления обрабатываются не дольше timeout секунд,
+        после чего незавершенные обработки отменяются.
+        """
+        self._accepting = False
+        try:
+            await asyncio.wait_for(self._wait_drained(), timeout)
+        except asyncio.TimeoutError:
+            self.logger.warning("Webhook drain timed out, cancelling in-flight updates")
+            await self.scheduler.cancel()
+
+        if self._drain_task:
+            self._drain_task.cancel()
+            await asyncio.gather(self._drain_task, return_exceptions=True)
+            self._drain_task = None
+
+    async def start(self):
+        """Запуск сервера"""
+        self._runner = web.AppRunner(self.create_app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.start_processing()
+        self.logger.info(f"Webhook server listening on {self.host}:{self.port}{self.path}")
+
+    async def stop(self, timeout: float = 30.0):
+        """Плавная остановка
+
+        Новые запросы отклоняются, уже принятые обновления
+        обрабатываются, но не дольше timeout секунд.
+        """
+        await self.stop_processing(timeout)
+        if self._runner:
+            await self._runner.cleanup()
+        self.logger.info("Webhook server stopped")
+
+    async def _wait_drained(self):
+        """Ожидание обработки всех принятых обновлений"""
+        await self.queue.join()
+        await self.scheduler.join()
+
+    def shutdown(self):
+        """Запрос остановки сервера, запущенного через serve"""
+        self._closing.set()
+
+    async def serve(self, drain_timeout: float = 30.0):
+        """Работа сервера до вызова shutdown"""
+        await self.start()
+        try:
+            await self._closing.wait()
+        finally:
+            await self.stop(drain_timeout)
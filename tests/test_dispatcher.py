@@ -0,0 +1,624 @@
+"""
+Тесты для диспетчера и обработки обновлений
+"""
+
+import pytest
+import asyncio
+from datetime import datetime
+from max_bot.core.types import User, Chat, Message, Update, CallbackQuery
+from max_bot.core.dispatcher import Dispatcher
+from max_bot.core.handler import HandlerTimeoutError
+from max_bot.core.host import BotHost
+from max_bot.core.lanes import DEFAULT_LANE_WEIGHTS, PriorityLimiter, get_update_lane
+from max_bot.core.router import Router
+from max_bot.core.polling import PollingPolicy, PollingStats
+from max_bot.core.scheduler import OffsetTracker, UpdateScheduler
+from max_bot.middleware.base import BaseMiddleware, ThrottlingMiddleware
+from max_bot.storage.dedup import DedupWindow, SQLiteDedupStore
+from max_bot.storage.offset import (
+    FileOffsetStore, MemoryOffsetStore, SQLiteOffsetStore, offset_key
+)
+
+
+def make_update(update_id: int, chat_id: int = 1, text: str = "test") -> Update:
+    """Создание обновления с сообщением"""
+    message = Message(
+        message_id=update_id,
+        date=datetime.now(),
+        chat=Chat(id=chat_id, type="private"),
+        from_user=User(id=chat_id),
+        text=text
+    )
+    return Update(update_id=update_id, message=message)
+
+
+class FakeAPIClient:
+    """Подмена MaxAPIClient, отдающая заранее заданные пачки обновлений"""
+
+    def __init__(self, batches, dispatcher):
+        self.batches = list(batches)
+        self.dispatcher = dispatcher
+        self.calls = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    async def get_updates(self, offset=None, limit=100, timeout=0):
+        self.calls.append({"offset": offset, "limit": limit, "timeout": timeout})
+        if not self.batches:
+            self.dispatcher.stop_polling()
+            return []
+        return self.batches.pop(0)
+
+
+def patch_api_client(monkeypatch, dispatcher, batches) -> FakeAPIClient:
+    """Подмена API клиента в модуле диспетчера"""
+    client = FakeAPIClient(batches, dispatcher)
+    monkeypatch.setattr("max_bot.core.dispatcher.MaxAPIClient", lambda token, **kwargs: client)
+    return client
+
+
+class TestOffsetTracker:
+    """Тесты для отслеживания offset"""
+
+    def test_offset_waits_for_earliest(self):
+        """Offset не продвигается за незавершенное обновление"""
+        tracker = OffsetTracker()
+        for update_id in (10, 11, 12):
+            tracker.register(update_id)
+
+        tracker.done(11)
+        assert tracker.offset == 10
+        tracker.done(10)
+        assert tracker.offset == 12
+        tracker.done(12)
+        assert tracker.offset == 13
+
+    def test_known_updates(self):
+        """Повторно полученные обновления не регистрируются"""
+        tracker = OffsetTracker()
+        assert tracker.register(5)
+        assert not tracker.register(5)
+        assert tracker.is_known(5)
+        assert not tracker.is_known(6)
+
+
+class TestUpdateScheduler:
+    """Тесты для планировщика обновлений"""
+
+    @pytest.mark.asyncio
+    async def test_chat_order_preserved(self):
+        """Обновления одного чата обрабатываются по порядку"""
+        processed = []
+
+        async def process(update):
+            await asyncio.sleep(0.01 if update.update_id % 2 else 0)
+            processed.append((update.chat_id, update.update_id))
+
+        scheduler = UpdateScheduler(process, max_concurrency=4)
+        for update_id in range(1, 9):
+            await scheduler.submit(make_update(update_id, chat_id=update_id % 2))
+        await scheduler.join()
+
+        for chat_id in (0, 1):
+            ids = [u for c, u in processed if c == chat_id]
+            assert ids == sorted(ids)
+        assert scheduler.offset == 9
+
+    @pytest.mark.asyncio
+    async def test_chats_run_concurrently(self):
+        """Медленный чат не блокирует остальные"""
+        release = asyncio.Event()
+        processed = []
+
+        async def process(update):
+            if update.chat_id == 1:
+                await release.wait()
+            processed.append(update.update_id)
+
+        scheduler = UpdateScheduler(process, max_concurrency=2)
+        await scheduler.submit(make_update(1, chat_id=1))
+        await scheduler.submit(make_update(2, chat_id=2))
+        await scheduler.submit(make_update(3, chat_id=2))
+        await asyncio.sleep(0.01)
+
+        assert processed == [2, 3]
+        assert scheduler.offset == 1
+        assert scheduler.in_flight == 1
+
+        release.set()
+        await scheduler.join()
+        assert scheduler.offset == 4
+
+    @pytest.mark.asyncio
+    async def test_failed_update_is_finished(self):
+        """Ошибка в обработчике не останавливает очередь чата"""
+        processed = []
+
+        async def process(update):
+            if update.update_id == 1:
+                raise RuntimeError("boom")
+            processed.append(update.update_id)
+
+        scheduler = UpdateScheduler(process)
+        await scheduler.submit(make_update(1))
+        await scheduler.submit(make_update(2))
+        await scheduler.join()
+
+        assert processed == [2]
+        assert scheduler.offset == 3
+        assert not await scheduler.submit(make_update(2))
+
+
+class TestPolling:
+    """Тесты для polling"""
+
+    def test_policy_limit_follows_capacity(self):
+        """Лимит не превышает свободное место в очереди"""
+        policy = PollingPolicy(limit=100)
+        assert policy.next_limit() == 100
+        assert policy.next_limit(capacity=30) == 30
+        assert policy.next_limit(capacity=0) == 1
+
+    def test_policy_backoff(self):
+        """Задержка после ошибок растет и сбрасывается"""
+        policy = PollingPolicy(backoff_base=1.0, backoff_max=4.0)
+        delays = [policy.on_error() for _ in range(5)]
+        assert delays[0] <= 1.0
+        assert 2.0 <= delays[4] <= 4.0
+        policy.on_success()
+        assert policy.on_error() <= 1.0
+        assert PollingPolicy(timeout=0).empty_delay() > 0
+        assert PollingPolicy(timeout=30).empty_delay() == 0
+
+    def test_stats(self):
+        """Статистика запросов"""
+        stats = PollingStats()
+        stats.record(10, 0.2)
+        stats.record(0, 0.8)
+        assert stats.empty_ratio == 0.5
+        assert stats.avg_batch_size == 5
+        assert stats.avg_wait_time == pytest.approx(0.5)
+
+    @pytest.mark.asyncio
+    async def test_long_polling(self, monkeypatch):
+        """timeout передается серверу, offset сдвигается после обработки"""
+        dp = Dispatcher("TOKEN")
+        processed = []
+
+        @dp.message_handler()
+        async def handler(message):
+            processed.append(message.message_id)
+            return True
+
+        client = patch_api_client(monkeypatch, dp, [
+            [make_update(1), make_update(2)],
+            [],
+            [make_update(3)],
+        ])
+        await asyncio.wait_for(dp.start_polling(timeout=25, limit=50), 1)
+
+        assert processed == [1, 2, 3]
+        assert all(call["timeout"] == 25 for call in client.calls)
+        offsets = [call["offset"] for call in client.calls]
+        assert offsets == sorted(offsets)
+        assert dp.scheduler.offset == 4
+        assert dp.polling_stats.updates == 3
+        assert dp.polling_stats.empty_polls == 2
+
+    @pytest.mark.asyncio
+    async def test_fetching_overlaps_processing(self, monkeypatch):
+        """Следующие пачки загружаются, пока обрабатывается предыдущая"""
+        dp = Dispatcher("TOKEN")
+        release = asyncio.Event()
+
+        @dp.message_handler()
+        async def handler(message):
+            await release.wait()
+            return True
+
+        client = patch_api_client(monkeypatch, dp, [
+            [make_update(1)],
+            [make_update(2)],
+            [make_update(3)],
+        ])
+        polling = asyncio.create_task(dp.start_polling(prefetch=1))
+        for _ in range(10):
+            await asyncio.sleep(0)
+
+        assert len(client.calls) >= 3
+        assert dp.polling_stats.max_queue_depth <= 1
+        assert dp.scheduler.offset == 1
+
+        release.set()
+        await asyncio.wait_for(polling, 1)
+        assert dp.scheduler.stats.processed == 3
+
+
+class RecordingMiddleware(BaseMiddleware):
+    """Middleware, записывающий порядок вызова"""
+
+    def __init__(self, name, calls):
+        self.name = name
+        self.calls = calls
+
+    async def __call__(self, handler, update):
+        self.calls.append(self.name)
+        update.context[self.name] = True
+        return await handler(update)
+
+
+class TestMiddleware:
+    """Тесты для цепочки middleware"""
+
+    @pytest.mark.asyncio
+    async def test_chain_order_and_context(self):
+        """Middleware вызываются по порядку и передают контекст обработчику"""
+        dp = Dispatcher()
+        calls = []
+        router = Router("inner")
+        router.add_middleware(RecordingMiddleware("router", calls))
+
+        @router.message_handler()
+        async def handler(message, outer, router=None):
+            return (outer, router)
+
+        dp.include_router(router)
+        dp.add_middleware(RecordingMiddleware("outer", calls))
+        dp.add_middleware(RecordingMiddleware("second", calls))
+
+        assert await dp.process_update(make_update(1)) == (True, True)
+        assert calls == ["outer", "second", "router"]
+
+    @pytest.mark.asyncio
+    async def test_chain_is_reused(self):
+        """Цепочка собирается один раз и пересобирается при изменениях"""
+        dp = Dispatcher()
+        calls = []
+        dp.add_middleware(RecordingMiddleware("first", calls))
+
+        pipeline = dp.build_pipeline()
+        await dp.process_update(make_update(1))
+        assert dp._pipeline is pipeline
+
+        dp.add_middleware(RecordingMiddleware("second", calls))
+        await dp.process_update(make_update(2))
+        assert dp._pipeline is not pipeline
+        assert calls == ["first", "first", "second"]
+
+    @pytest.mark.asyncio
+    async def test_throttling(self):
+        """ThrottlingMiddleware пропускает обновления и запоминает время пользователя"""
+        dp = Dispatcher()
+        dp.add_middleware(ThrottlingMiddleware(rate_limit=0))
+
+        @dp.message_handler()
+        async def handler(message):
+            return message.text
+
+        assert await dp.process_update(make_update(1, chat_id=7)) == "test"
+        assert await dp.process_update(make_update(2, chat_id=7, text="again")) == "again"
+        assert 7 in dp.middlewares[0].last_request
+
+
+class TestBotHost:
+    """Тесты для хоста множества ботов"""
+
+    @pytest.mark.asyncio
+    async def test_noisy_bot_does_not_starve_others(self, monkeypatch):
+        """Медленный бот занимает не больше своей доли общего лимита"""
+        host = BotHost(concurrency=3, bot_concurrency=2)
+        release = asyncio.Event()
+        quiet_done = asyncio.Event()
+
+        noisy = host.add_bot("NOISY")
+        quiet = host.add_bot("QUIET")
+
+        @noisy.message_handler()
+        async def slow_handler(message):
+            await release.wait()
+            return True
+
+        @quiet.message_handler()
+        async def fast_handler(message):
+            quiet_done.set()
+            return True
+
+        clients = {
+            "NOISY": FakeAPIClient([[make_update(i, chat_id=i) for i in range(1, 20)]], noisy),
+            "QUIET": FakeAPIClient([[], [make_update(1)]], quiet),
+        }
+        monkeypatch.setattr(
+            "max_bot.core.dispatcher.MaxAPIClient", lambda token, **kwargs: clients[token]
+        )
+
+        running = asyncio.create_task(host.start_polling())
+        await asyncio.wait_for(quiet_done.wait(), 1)
+        assert noisy.scheduler.in_flight == 2
+
+        release.set()
+        await asyncio.wait_for(running, 1)
+        assert noisy.scheduler.stats.processed == 19
+        assert host.bots[BotHost.bot_name("QUIET")] is quiet
+
+    def test_router_per_bot(self):
+        """Роутер нельзя разделить между ботами, фабрика создает свой каждому"""
+        host = BotHost()
+        shared = Router()
+        host.add_router("FIRST", shared)
+        with pytest.raises(ValueError):
+            host.add_router("SECOND", shared)
+        with pytest.raises(TypeError):
+            host.add_router("SECOND", "test_import:lazy_router")
+        assert len(host.bots) == 1
+
+        first = host.add_router("THIRD", Router)
+        second = host.add_router("FOURTH", Router)
+        assert first.router.children[0] is not second.router.children[0]
+
+
+class TestOffsetCheckpointing:
+    """Тесты для сохранения offset и плавной остановки"""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("store_class", [FileOffsetStore, SQLiteOffsetStore])
+    async def test_store_roundtrip(self, tmp_path, store_class):
+        """Сохраненный offset читается новым экземпляром хранилища"""
+        path = str(tmp_path / "offsets")
+        store = store_class(path)
+        assert await store.load("bot") is None
+        await store.save("bot", 10)
+        await store.save("bot", 15)
+        await store.close()
+
+        store = store_class(path)
+        assert await store.load("bot") == 15
+        assert await store.load("other") is None
+        await store.close()
+
+    @pytest.mark.asyncio
+    async def test_polling_resumes_from_store(self, monkeypatch):
+        """Polling начинается с сохраненного offset и сохраняет итоговый"""
+        store = MemoryOffsetStore()
+        await store.save(offset_key("TOKEN"), 5)
+        dp = Dispatcher("TOKEN")
+        processed = []
+
+        @dp.message_handler()
+        async def handler(message):
+            processed.append(message.message_id)
+            return True
+
+        client = patch_api_client(monkeypatch, dp, [
+            [make_update(4), make_update(5), make_update(6)],
+        ])
+        await asyncio.wait_for(dp.start_polling(offset_store=store), 1)
+
+        assert client.calls[0]["offset"] == 5
+        assert processed == [5, 6]
+        assert await store.load(offset_key("TOKEN")) == 7
+
+    @pytest.mark.asyncio
+    async def test_drain_deadline_keeps_unfinished(self, monkeypatch):
+        """Необработанные к сроку обновления не проходят в offset"""
+        store = MemoryOffsetStore()
+        dp = Dispatcher("TOKEN")
+
+        @dp.message_handler()
+        async def handler(message):
+            if message.message_id == 2:
+                await asyncio.sleep(10)
+            return True
+
+        patch_api_client(monkeypatch, dp, [
+            [make_update(1), make_update(2, chat_id=2), make_update(3)],
+        ])
+        await asyncio.wait_for(
+            dp.start_polling(concurrency=2, offset_store=store, drain_timeout=0.1), 1
+        )
+
+        assert dp.scheduler.stats.processed == 3
+        assert await store.load(offset_key("TOKEN")) == 2
+
+
+class TestDeadlines:
+    """Тесты для ограничения времени обработки"""
+
+    @pytest.mark.asyncio
+    async def test_handler_timeout(self):
+        """Зависший обработчик отменяется и вызывается обработчик таймаута"""
+        dp = Dispatcher()
+        cancelled = []
+
+        @dp.message_handler(timeout=0.05)
+        async def slow_handler(message):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(message.message_id)
+                raise
+
+        @dp.timeout_handler()
+        async def on_timeout(update, error):
+            return f"timeout {error.handler.name}"
+
+        result = await dp.process_update(make_update(1))
+        assert result == "timeout TestDeadlines.test_handler_timeout.<locals>.slow_handler"
+        assert cancelled == [1]
+        assert dp.timeouts == 1
+        assert dp.router.handlers[0].timeouts == 1
+
+    @pytest.mark.asyncio
+    async def test_own_timeout_error_is_not_a_deadline(self):
+        """TimeoutError из самого обработчика пробрасывается без изменений"""
+        dp = Dispatcher(update_timeout=30)
+
+        @dp.message_handler(timeout=30)
+        async def handler(message):
+            raise asyncio.TimeoutError("read timeout")
+
+        with pytest.raises(asyncio.TimeoutError) as info:
+            await dp.process_update(make_update(1))
+        assert not isinstance(info.value, HandlerTimeoutError)
+        assert str(info.value) == "read timeout"
+        assert dp.timeouts == 0
+        assert dp.router.handlers[0].timeouts == 0
+
+    @pytest.mark.asyncio
+    async def test_update_timeout(self):
+        """Общее ограничение времени распространяется на middleware"""
+        dp = Dispatcher(update_timeout=0.05)
+
+        class SlowMiddleware(BaseMiddleware):
+            async def __call__(self, handler, update):
+                await asyncio.sleep(10)
+
+        dp.add_middleware(SlowMiddleware())
+        assert await dp.process_update(make_update(1)) is None
+        assert dp.timeouts == 1
+
+
+class TestPriorityLanes:
+    """Тесты для приоритетных полос"""
+
+    def test_lane_classification(self):
+        """Обновления распределяются по полосам"""
+        callback = Update(update_id=1, callback_query=CallbackQuery(id="1", from_user=User(id=1)))
+        edited = Update(update_id=2, edited_message=make_update(2).message)
+        assert get_update_lane(callback) == "callback_query"
+        assert get_update_lane(make_update(1, text="/start")) == "command"
+        assert get_update_lane(make_update(1)) == "message"
+        assert get_update_lane(edited) == "edited_message"
+        edited_post = Update(update_id=3, edited_channel_post=make_update(3).message)
+        assert get_update_lane(edited_post) == "edited_channel_post"
+
+    async def _grant_order(self, limiter, lanes):
+        """Порядок выдачи слотов ожидающим полосам"""
+        order = []
+
+        async def wait(lane):
+            await limiter.acquire(lane)
+            order.append(lane)
+
+        await limiter.acquire("message")
+        tasks = []
+        for lane in lanes:
+            tasks.append(asyncio.create_task(wait(lane)))
+            await asyncio.sleep(0)
+        for _ in lanes:
+            limiter.release()
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+        return order
+
+    @pytest.mark.asyncio
+    async def test_weighted_order(self):
+        """Нажатия кнопок обгоняют обычные сообщения, но не вытесняют их"""
+        limiter = PriorityLimiter(1, {"callback_query": 2, "message": 1}, max_wait=60)
+        order = await self._grant_order(limiter, ["message"] * 3 + ["callback_query"] * 3)
+        assert order[0] == "callback_query"
+        assert "message" in order[:3]
+        assert limiter.stats["callback_query"].acquired == 3
+
+    @pytest.mark.asyncio
+    async def test_starvation_protection(self):
+        """Долго ждущая полоса получает слот вне очереди"""
+        limiter = PriorityLimiter(1, {"callback_query": 100, "message": 1}, max_wait=0)
+        order = await self._grant_order(limiter, ["message", "callback_query"])
+        assert order == ["message", "callback_query"]
+        assert limiter.stats["message"].starvation_grants == 1
+
+    @pytest.mark.asyncio
+    async def test_scheduler_with_lanes(self):
+        """Планировщик с полосами обрабатывает все обновления"""
+        processed = []
+
+        async def process(update):
+            await asyncio.sleep(0)
+            processed.append(update.update_id)
+
+        scheduler = UpdateScheduler(process, max_concurrency=2, lanes=DEFAULT_LANE_WEIGHTS)
+        for update_id in range(1, 11):
+            await scheduler.submit(make_update(update_id, chat_id=update_id))
+        await scheduler.join()
+        assert sorted(processed) == list(range(1, 11))
+        assert scheduler.lanes.in_use == 0
+
+
+class TestDeduplication:
+    """Тесты для отсева повторных обновлений"""
+
+    def test_window_eviction(self):
+        """Окно помнит только последние update_id"""
+        window = DedupWindow(3)
+        assert all(window.add(update_id) for update_id in (1, 2, 3))
+        assert not window.add(2)
+        assert window.add(4)
+        assert 1 not in window
+        assert len(window) == 3
+
+        # Повторно добавленный после discard id не вытесняется старым слотом
+        window = DedupWindow(3)
+        window.add(1)
+        window.discard(1)
+        assert window.add(1) and window.add(2) and window.add(3)
+        assert 1 in window and len(window) == 3
+
+    @pytest.mark.asyncio
+    async def test_duplicates_are_skipped(self):
+        """Повторное обновление не доходит до обработчиков"""
+        dp = Dispatcher()
+        processed = []
+
+        @dp.message_handler()
+        async def handler(message):
+            processed.append(message.message_id)
+            return True
+
+        for update_id in (1, 2, 1, 2, 3):
+            await dp.process_update(make_update(update_id))
+        assert processed == [1, 2, 3]
+        assert dp.duplicates == 2
+
+        dp = Dispatcher(dedup_window=0)
+        dp.include_router(Router())
+        await dp.process_update(make_update(1))
+        await dp.process_update(make_update(1))
+        assert dp.duplicates == 0
+
+    @pytest.mark.asyncio
+    async def test_cancelled_update_is_forgotten(self):
+        """Прерванное обновление можно обработать снова"""
+        dp = Dispatcher()
+        started = asyncio.Event()
+
+        @dp.message_handler()
+        async def handler(message):
+            started.set()
+            await asyncio.sleep(10)
+
+        task = asyncio.create_task(dp.process_update(make_update(1)))
+        await started.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert await dp.dedup_store.add(dp._dedup_key(), 1)
+
+    @pytest.mark.asyncio
+    async def test_shared_sqlite_store(self, tmp_path):
+        """Экземпляры с общим хранилищем не обрабатывают обновление дважды"""
+        path = str(tmp_path / "dedup.db")
+        first, second = SQLiteDedupStore(path, window=10), SQLiteDedupStore(path, window=10)
+        try:
+            assert await first.add("bot", 1)
+            assert not await second.add("bot", 1)
+            assert await second.add("other", 1)
+            for update_id in range(2, 30):
+                await first.add("bot", update_id)
+            assert await second.add("bot", 1)
+        finally:
+            await first.close()
+            await second.close()
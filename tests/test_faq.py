@@ -0,0 +1,88 @@
+"""
+Тесты для индекса частых вопросов
+"""
+
+import pytest
+from max_bot.utils import faq
+from max_bot.utils.faq import FAQIndex
+
+
+BACKENDS = [
+    False,
+    pytest.param(True, marks=pytest.mark.skipif(faq.np is None, reason="numpy is not installed")),
+]
+
+ENTRIES = [
+    ("Как работает бот", "Отвечает на вопросы"),
+    ("Где получить помощь", "Напишите администратору"),
+    ("Контакты службы поддержки", "support@example.com"),
+    ("Сроки доставки заказа", "1-3 дня"),
+    ("Как оформить возврат товара", "В течение 14 дней"),
+]
+
+
+@pytest.mark.parametrize("use_numpy", BACKENDS)
+class TestFAQIndex:
+    """Тесты для FAQIndex"""
+
+    def test_search(self, use_numpy):
+        """Перефразированный вопрос и опечатки находят ответ"""
+        index = FAQIndex(use_numpy=use_numpy)
+        index.add_many(ENTRIES)
+        assert index.answer("сроки доставки").answer == "1-3 дня"
+        assert index.answer("какие СРОКИ у доставки?", threshold=0.3).answer == "1-3 дня"
+        assert index.answer("оформить возвратт").answer == "В течение 14 дней"
+        assert index.answer("погода в москве") is None
+
+        matches = index.search("как работает возврат", k=2)
+        assert len(matches) == 2
+        assert matches[0].score >= matches[1].score
+        assert {m.id for m in matches} == {0, 4}
+
+    def test_incremental(self, use_numpy):
+        """Добавление и удаление учитываются при следующем поиске"""
+        index = FAQIndex(use_numpy=use_numpy)
+        index.add_many(ENTRIES)
+        assert index.answer("оплата картой") is None
+        entry_id = index.add("Можно ли оплатить картой", "Да")
+        assert index.answer("оплата картой").id == entry_id
+
+        index.remove(entry_id)
+        assert index.answer("оплата картой") is None
+        assert len(index) == len(ENTRIES)
+        with pytest.raises(KeyError):
+            index.remove(entry_id)
+
+    def test_remove_updates_statistics(self, use_numpy):
+        """После удаления близость такая же, как у индекса без этого вопроса"""
+        index = FAQIndex(use_numpy=use_numpy)
+        index.add_many(ENTRIES)
+        index.remove(3)
+        fresh = FAQIndex(use_numpy=use_numpy)
+        fresh.add_many(ENTRIES[:3] + ENTRIES[4:])
+        for query in ("сроки доставки", "как оформить заказ", "служба поддержки"):
+            assert [(m.question, pytest.approx(m.score)) for m in index.search(query, k=5)] == [
+                (m.question, m.score) for m in fresh.search(query, k=5)
+            ]
+
+    def test_save_load(self, use_numpy, tmp_path):
+        """Загруженный индекс ищет так же, как исходный"""
+        index = FAQIndex(use_numpy=use_numpy)
+        index.add_many(ENTRIES)
+        index.remove(1)
+        path = str(tmp_path / "faq.idx")
+        index.save(path)
+
+        loaded = FAQIndex.load(path, use_numpy=use_numpy)
+        assert len(loaded) == len(index)
+        for query in ("доставка заказа", "поддержка", "где помощь"):
+            assert loaded.search(query) == index.search(query)
+        loaded.add("Где получить помощь", "Позвоните нам")
+        assert loaded.answer("где получить помощь").answer == "Позвоните нам"
+
+    def test_load_unknown_version(self, use_numpy, tmp_path):
+        """Файл другой версии формата не загружается"""
+        path = tmp_path / "faq.idx"
+        path.write_bytes(b'{"version": 2}\n')
+        with pytest.raises(ValueError, match="version 2"):
+            FAQIndex.load(str(path), use_numpy=use_numpy)
@@ -0,0 +1,287 @@
+"""
+Тесты для фильтров
+"""
+
+import pytest
+from max_bot.core.handler import MessageHandler
+from max_bot.core.router import Router
+from max_bot.core.text import ParsedText
+from max_bot.filters.base import (
+    AndFilter,
+    BaseFilter,
+    OrFilter,
+    SyncFilter,
+    TextFilter,
+    by_cost,
+    command,
+    text,
+    user,
+)
+from max_bot.filters.triggers import AhoCorasick, TriggerSet
+from test_dispatcher import make_update
+
+
+class TestSyncFilters:
+    """Тесты для синхронных фильтров"""
+
+    def test_builtin_filters_are_sync(self):
+        """Встроенные фильтры проверяются без корутины"""
+        update = make_update(1, chat_id=5, text="/start")
+        assert command("start").is_sync
+        assert command("start").check_sync(update)
+        assert user(5).check_sync(update)
+        assert not TextFilter("hi").check_sync(update)
+
+    @pytest.mark.asyncio
+    async def test_sync_filter_awaitable(self):
+        """check синхронного фильтра по-прежнему можно ждать"""
+        assert await command("start").check(make_update(1, text="/start"))
+
+    @pytest.mark.asyncio
+    async def test_mixed_filters_order(self):
+        """Синхронные и асинхронные фильтры проверяются по порядку"""
+        calls = []
+
+        class Recording(SyncFilter):
+            def __init__(self, name, result=True):
+                self.name = name
+                self.result = result
+
+            def check_sync(self, update):
+                calls.append(self.name)
+                return self.result
+
+            async def check(self, update):
+                raise AssertionError("check_sync expected")
+
+        class AsyncRecording(BaseFilter):
+            def __init__(self, name, result=True):
+                self.name = name
+                self.result = result
+
+            async def check(self, update):
+                calls.append(self.name)
+                return self.result
+
+        async def callback(message):
+            return "ok"
+
+        handler = MessageHandler(callback, [Recording("a"), AsyncRecording("b"), Recording("c")])
+        assert await handler.handle(make_update(1)) == "ok"
+        assert calls == ["a", "b", "c"]
+
+        calls.clear()
+        handler = MessageHandler(callback, [Recording("a"), AsyncRecording("b", False), Recording("c")])
+        assert await handler.handle(make_update(1)) is None
+        assert calls == ["a", "b"]
+
+        calls.clear()
+        router = Router(filters=Recording("router"))
+        router.add_handler(MessageHandler(callback, [Recording("a"), Recording("b", False)]))
+        router.add_handler(MessageHandler(callback, Recording("c")))
+        assert await router.handle(make_update(1)) == "ok"
+        assert calls == ["router", "a", "b", "c"]
+
+
+class CountingFilter(BaseFilter):
+    """Асинхронный фильтр, считающий проверки"""
+
+    memoize = True
+
+    def __init__(self, result=True, cost=10, calls=None):
+        self.result = result
+        self.cost = cost
+        self.calls = calls if calls is not None else []
+
+    async def check(self, update):
+        self.calls.append(self)
+        return self.result
+
+
+class TestFilterExpressions:
+    """Тесты для выражений из фильтров"""
+
+    @pytest.mark.asyncio
+    async def test_operators(self):
+        """&, | и ~ дают ожидаемые результаты"""
+        update = make_update(1, chat_id=5, text="/start")
+        assert (command("start") & user(5)).check_sync(update)
+        assert not (command("start") & user(6)).check_sync(update)
+        assert (command("stop") | user(5)).check_sync(update)
+        assert (~command("stop")).check_sync(update)
+        assert await (~CountingFilter(False) & command("start")).check(update)
+
+        expression = command("a") & command("b") & user(5)
+        assert isinstance(expression, AndFilter)
+        assert len(expression.filters) == 3
+        assert expression.is_sync
+        assert not (command("a") | CountingFilter()).is_sync
+
+    @pytest.mark.asyncio
+    async def test_short_circuit_and_cost(self):
+        """Дешевые фильтры проверяются первыми, лишние не проверяются"""
+        calls = []
+        expensive = CountingFilter(True, cost=100, calls=calls)
+        cheap = CountingFilter(False, cost=1, calls=calls)
+        assert not await (expensive & cheap).check(make_update(1))
+        assert calls == [cheap]
+
+        calls.clear()
+        cheap.result = True
+        assert await OrFilter(expensive, cheap).check(make_update(2))
+        assert calls == [cheap]
+
+    @pytest.mark.asyncio
+    async def test_memoized_per_update(self):
+        """Общий фильтр проверяется один раз на обновление"""
+        router = Router()
+        is_admin = CountingFilter(False)
+
+        @router.message_handler([command("ban"), is_admin])
+        async def ban(message):
+            return "ban"
+
+        @router.message_handler(is_admin | command("kick"))
+        async def kick(message):
+            return "kick"
+
+        @router.message_handler(~is_admin)
+        async def denied(message):
+            return "denied"
+
+        assert await router.handle(make_update(1, text="/ban")) == "denied"
+        assert len(is_admin.calls) == 1
+        assert await router.handle(make_update(2, text="/kick")) == "kick"
+        assert len(is_admin.calls) == 1
+        assert await router.handle(make_update(3, text="/ban")) == "denied"
+        assert len(is_admin.calls) == 2
+
+    @pytest.mark.asyncio
+    async def test_side_effect_filters_keep_order(self):
+        """Асинхронные фильтры без memoize не запоминаются и не переставляются"""
+        calls = []
+
+        class Audit(BaseFilter):
+            async def check(self, update):
+                calls.append("audit")
+                return True
+
+        audit = Audit()
+        cheap = CountingFilter(False, cost=1, calls=calls)
+        assert by_cost([audit, cheap]) == [audit, cheap]
+        assert by_cost([cheap, CountingFilter(cost=5), audit])[-1] is audit
+
+        router = Router()
+
+        @router.message_handler([audit, TextFilter("never")])
+        async def first(message):
+            return "first"
+
+        @router.message_handler(audit)
+        async def second(message):
+            return "second"
+
+        assert await router.handle(make_update(1)) == "second"
+        assert calls == ["audit", "audit"]
+
+
+class TestParsedText:
+    """Тесты для разобранного текста сообщения"""
+
+    def test_parse(self):
+        """Команда, упоминание, аргументы и слова"""
+        parsed = ParsedText("  /Start@My_Bot  ref  42 ")
+        assert parsed.command == "Start"
+        assert parsed.mention == "My_Bot"
+        assert parsed.args == "ref  42"
+        assert parsed.arg_list == ["ref", "42"]
+
+        parsed = ParsedText("Ёлка  и  ЕЖИК!")
+        assert not parsed.is_command
+        assert parsed.normalized == "елка и ежик!"
+        assert parsed.tokens == ["елка", "и", "ежик"]
+
+    def test_parsed_once(self):
+        """Разбор выполняется один раз на обновление"""
+        update = make_update(1, text="/help me")
+        assert update.parsed_text is update.parsed_text
+        assert make_update(2, text="").parsed_text is None
+
+    @pytest.mark.asyncio
+    async def test_command_args(self):
+        """Обработчик команды получает аргументы и разобранную команду"""
+        router = Router()
+
+        @router.message_handler(command("add", bot_username="@shop_bot"))
+        async def add(message, args, command):
+            return f"{command.command}: {command.arg_list}, {args!r}"
+
+        @router.message_handler(text("привет", ignore_case=True))
+        async def hello(message):
+            return "hello"
+
+        assert await router.handle(make_update(1, text="/add 1 2")) == "add: ['1', '2'], '1 2'"
+        assert await router.handle(make_update(2, text="/add@Shop_Bot 3")) == "add: ['3'], '3'"
+        assert await router.handle(make_update(3, text="/add@other_bot 3")) is None
+        assert await router.handle(make_update(4, text="  ПРИВЕТ ")) == "hello"
+
+
+class TestTriggers:
+    """Тесты для фильтров по ключевым словам"""
+
+    def test_automaton(self):
+        """Автомат находит все вхождения, в том числе перекрывающиеся"""
+        automaton = AhoCorasick()
+        for word in ("he", "she", "his", "hers"):
+            automaton.add(word, word)
+        assert sorted(value for _, _, value in automaton.iter_matches("ushers")) == ["he", "hers", "she"]
+        automaton.add("us", "us")
+        assert [m for m in automaton.iter_matches("ushers")][0] == (0, 2, "us")
+
+    def test_normalization_and_words(self):
+        """Регистр, е/ё и границы слов"""
+        triggers = TriggerSet()
+        delivery = triggers.filter(["Доставка", "сроки доставки"])
+        price = triggers.filter("цены")
+        assert [m.keyword for m in triggers.matches("сроки доставки? доставка и цены")] == [
+            "сроки доставки", "Доставка", "цены"
+        ]
+        assert triggers.matches("бесценный") == []
+        best = triggers.best("где цены и сроки доставки")
+        assert best.keyword == "сроки доставки" and best.trigger_filter is delivery
+        triggers.prefer = "first"
+        assert triggers.best("где цены и сроки доставки").trigger_filter is price
+
+    def test_automaton_matches_linear_scan(self, monkeypatch):
+        """Большие наборы ищутся автоматом с тем же результатом"""
+        triggers = TriggerSet()
+        triggers.filter(["да", "дада", "нет"])
+        text = "дадада нет да"
+        linear = triggers.matches(text)
+        monkeypatch.setattr("max_bot.filters.triggers.LINEAR_SCAN_LIMIT", 0)
+        assert triggers.matches(text) == linear
+        assert [(m.keyword, m.start) for m in linear] == [("нет", 7), ("да", 11)]
+
+        triggers.whole_words = False
+        automaton = triggers.matches(text)
+        monkeypatch.undo()
+        assert triggers.matches(text) == automaton
+        assert len(automaton) == 7
+
+    @pytest.mark.asyncio
+    async def test_routing_to_best_match(self):
+        """Обновление получает обработчик с лучшим совпадением"""
+        router = Router()
+        triggers = TriggerSet()
+
+        @router.message_handler(triggers.filter(["елка", "новый год"]))
+        async def holiday(message, trigger):
+            return f"holiday {trigger.keyword}"
+
+        @router.message_handler(triggers.filter("новый год скидки"))
+        async def sale(message, trigger):
+            return "sale"
+
+        assert await router.handle(make_update(1, text="Купить ЁЛКУ")) is None
+        assert await router.handle(make_update(2, text="Ёлка на Новый  год")) == "holiday новый год"
+        assert await router.handle(make_update(3, text="новый год скидки!")) == "sale"
@@ -0,0 +1,86 @@
+"""
+Тесты для ленивой загрузки пакета
+"""
+
+import os
+import re
+import subprocess
+import sys
+import pytest
+from max_bot.core.router import Router
+from max_bot.filters.base import command
+from test_dispatcher import make_update
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Бюджет на import max_bot: около 3 мс, с запасом в три раза;
+# без ленивой загрузки импорт занимал около 300 мс
+IMPORT_BUDGET_US = 10_000
+
+
+def run_python(code: str, *options: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *options, "-c", code],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+
+
+class TestLazyImport:
+    """Тесты для импорта max_bot"""
+
+    def test_import_time(self):
+        """import max_bot укладывается в бюджет"""
+        result = run_python("import max_bot", "-X", "importtime")
+        match = re.search(r"^import time:\s+\d+ \|\s+(\d+) \| max_bot$", result.stderr, re.M)
+        assert match, result.stderr
+        assert int(match.group(1)) < IMPORT_BUDGET_US
+
+    def test_heavy_modules_deferred(self):
+        """import max_bot не загружает asyncio, aiohttp и typing, aiohttp - до работы с сетью"""
+        result = run_python(
+            "import sys, max_bot\n"
+            "print(*(name in sys.modules for name in ('asyncio', 'aiohttp', 'typing')))\n"
+            "max_bot.Dispatcher, max_bot.Router\n"
+            "print('aiohttp' in sys.modules)\n"
+        )
+        assert result.stdout.split() == ["False", "False", "False", "False"]
+
+    def test_attributes(self):
+        """Атрибуты пакета загружаются по запросу"""
+        import max_bot
+        assert max_bot.Router is Router
+        assert "Dispatcher" in dir(max_bot)
+        with pytest.raises(AttributeError):
+            max_bot.missing
+
+
+lazy_router = Router(name="lazy")
+
+
+@lazy_router.message_handler(command("lazy"))
+async def lazy_handler(message):
+    return "lazy"
+
+
+class TestLazyRouter:
+    """Тесты для роутеров по пути импорта"""
+
+    @pytest.mark.asyncio
+    async def test_include_by_path(self):
+        """Роутер загружается при сборке и занимает свое место"""
+        root, first, last = Router(name="root"), Router(name="first"), Router(name="last")
+        root.include_router(first)
+        root.include_router("test_import:lazy_router")
+        root.include_router(last)
+        assert len(root.children) == 2
+
+        assert await root.handle(make_update(1, text="/lazy")) == "lazy"
+        assert [r.name for r in root.children] == ["first", "lazy", "last"]
+
+    def test_not_a_router(self):
+        """Путь должен указывать на Router"""
+        root = Router()
+        root.include_router("test_import:lazy_handler")
+        with pytest.raises(TypeError):
+            root.build_chain()
@@ -0,0 +1,59 @@
+"""
+Тесты для запуска цикла событий
+"""
+
+import asyncio
+import sys
+import threading
+from max_bot.utils.loop import LoopSettings, loop_name, new_event_loop, run
+
+
+class TestLoop:
+    """Тесты для настройки цикла событий"""
+
+    def test_fallback_without_uvloop(self, monkeypatch):
+        """Без uvloop используется стандартный цикл"""
+        monkeypatch.setitem(sys.modules, "uvloop", None)
+        loop = new_event_loop()
+        try:
+            assert loop_name(loop).startswith("asyncio.")
+        finally:
+            loop.close()
+
+    def test_run_with_settings(self):
+        """Настройки применяются к циклу, результат корутины возвращается"""
+
+        async def main():
+            loop = asyncio.get_running_loop()
+            threads = await asyncio.gather(*(
+                loop.run_in_executor(None, lambda: threading.current_thread().name)
+                for _ in range(4)
+            ))
+            return loop.get_debug(), loop.slow_callback_duration, threads
+
+        debug, slow, threads = run(
+            main(), LoopSettings(executor_workers=2, slow_callback_duration=0.5)
+        )
+        assert debug is True
+        assert slow == 0.5
+        assert all(name.startswith("max-bot") for name in threads)
+
+    def test_run_without_runner(self, monkeypatch):
+        """На Python < 3.11 цикл создается без asyncio.Runner"""
+        monkeypatch.delattr(asyncio, "Runner", raising=False)
+        cancelled = []
+
+        async def background():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        async def main():
+            asyncio.get_running_loop().create_task(background())
+            await asyncio.sleep(0)
+            return asyncio.get_running_loop().get_debug()
+
+        assert run(main(), LoopSettings(slow_callback_duration=0.5)) is True
+        assert cancelled == [True]
@@ -0,0 +1,127 @@
+"""
+Тесты для метрик
+"""
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+from max_bot.core.dispatcher import Dispatcher
+from max_bot.core.scheduler import UpdateScheduler
+from max_bot.metrics.registry import MetricsRegistry
+from max_bot.metrics.server import MetricsServer
+from max_bot.middleware.base import BaseMiddleware
+from test_dispatcher import make_update
+
+
+class PassMiddleware(BaseMiddleware):
+    """Middleware без собственной работы"""
+
+    async def __call__(self, handler, update):
+        return await handler(update)
+
+
+class TestRegistry:
+    """Тесты для реестра метрик"""
+
+    def test_render(self):
+        """Вывод в текстовом формате Prometheus"""
+        registry = MetricsRegistry()
+        counter = registry.counter("requests_total", "Requests", ("method",))
+        counter.labels("get").inc()
+        counter.labels("get").inc(2)
+        gauge = registry.gauge("depth", "Queue depth").labels()
+        gauge.set_function(lambda: 7)
+        histogram = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0)).labels()
+        for value in (0.05, 0.1, 0.5, 5.0):
+            histogram.observe(value)
+
+        text = registry.render()
+        assert '# TYPE requests_total counter' in text
+        assert 'requests_total{method="get"} 3' in text
+        assert 'depth 7' in text
+        assert 'latency_seconds_bucket{le="0.1"} 2' in text
+        assert 'latency_seconds_bucket{le="1"} 3' in text
+        assert 'latency_seconds_bucket{le="+Inf"} 4' in text
+        assert 'latency_seconds_count 4' in text
+        assert registry.counter("requests_total", "Requests", ("method",)) is counter
+        with pytest.raises(ValueError):
+            registry.gauge("requests_total", "Requests")
+
+    def test_label_escaping(self):
+        """Значения меток экранируются"""
+        registry = MetricsRegistry()
+        registry.counter("c_total", "C", ("name",)).labels('a"b\\c').inc()
+        assert 'c_total{name="a\\"b\\\\c"} 1' in registry.render()
+
+
+class TestDispatcherMetrics:
+    """Тесты для метрик диспетчера"""
+
+    @pytest.mark.asyncio
+    async def test_update_metrics(self):
+        """Обновления, обработчики и middleware попадают в метрики"""
+        registry = MetricsRegistry()
+        dp = Dispatcher(metrics=registry, name="shop")
+        dp.add_middleware(PassMiddleware())
+
+        @dp.message_handler()
+        async def handler(message):
+            if message.text == "fail":
+                raise RuntimeError("fail")
+            return True
+
+        await dp.process_update(make_update(1))
+        await dp.process_update(make_update(1))
+        with pytest.raises(RuntimeError):
+            await dp.process_update(make_update(2, text="fail"))
+
+        metrics = dp.metrics
+        assert metrics.received["message"].value == 3
+        assert metrics.processed["message"].value == 1
+        assert metrics.failed["message"].value == 1
+        assert metrics.duplicates.value == 1
+        assert metrics.handler_latency(handler.__qualname__).count == 2
+        assert metrics.middleware_latency("PassMiddleware").count == 2
+
+        text = registry.render()
+        assert 'max_bot_updates_processed_total{bot="shop",type="message"} 1' in text
+        assert 'max_bot_updates_pending{bot="shop"} 0' in text
+
+    @pytest.mark.asyncio
+    async def test_lane_gauges(self):
+        """Глубина и время ожидания полос видны в метриках"""
+        registry = MetricsRegistry()
+        dp = Dispatcher(metrics=registry, name="shop")
+        dp.build_pipeline()
+        text = registry.render()
+        assert 'max_bot_lane_waiting{bot="shop",lane="edited_channel_post"} 0' in text
+
+        dp.scheduler = UpdateScheduler(dp.process_update, lanes={"message": 1})
+        dp.scheduler.lanes.stats["message"].waiting = 2
+        dp.scheduler.lanes.stats["message"].record(0.5)
+        text = registry.render()
+        assert 'max_bot_lane_waiting{bot="shop",lane="message"} 2' in text
+        assert 'max_bot_lane_wait_seconds{bot="shop",lane="message"} 0.5' in text
+
+    @pytest.mark.asyncio
+    async def test_disabled(self):
+        """Метрики можно отключить"""
+        dp = Dispatcher(metrics=False)
+
+        @dp.message_handler()
+        async def handler(message):
+            return True
+
+        assert await dp.process_update(make_update(1))
+        assert dp.metrics is None
+
+    @pytest.mark.asyncio
+    async def test_endpoint(self):
+        """Метрики доступны по HTTP"""
+        registry = MetricsRegistry()
+        registry.counter("hits_total", "Hits").labels().inc()
+        server = MetricsServer(registry)
+        async with TestClient(TestServer(server.create_app())) as client:
+            response = await client.get("/metrics")
+            assert response.status == 200
+            assert response.headers["Content-Type"].startswith("text/plain")
+            assert "hits_total 1" in await response.text()
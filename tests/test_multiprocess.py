@@ -0,0 +1,103 @@
+"""
+Тесты для многопроцессного запуска
+"""
+
+import os
+import pytest
+import asyncio
+from max_bot.core.dispatcher import Dispatcher
+from max_bot.core.multiprocess import ShardedRunner, get_shard, load_dispatcher
+from test_dispatcher import make_update
+
+
+CRASH_MARKER_ENV = "MAX_BOT_TEST_CRASH_MARKER"
+
+
+def create_dispatcher() -> Dispatcher:
+    """Фабрика диспетчера для рабочих процессов"""
+    dp = Dispatcher()
+
+    @dp.message_handler()
+    async def handler(message):
+        marker = os.environ.get(CRASH_MARKER_ENV)
+        if message.text == "crash" and marker and not os.path.exists(marker):
+            open(marker, "w").close()
+            os._exit(1)
+        return True
+
+    return dp
+
+
+async def wait_for(condition, timeout: float = 30.0):
+    """Ожидание выполнения условия"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not condition():
+        if loop.time() > deadline:
+            raise TimeoutError
+        await asyncio.sleep(0.05)
+
+
+class TestShardedRunner:
+    """Тесты для многопроцессного запуска"""
+
+    def test_shard_is_stable_per_chat(self):
+        """Обновления одного чата попадают в один процесс"""
+        shards = {get_shard(make_update(i, chat_id=42), 4) for i in range(20)}
+        assert len(shards) == 1
+        assert {get_shard(make_update(1, chat_id=c), 4) for c in range(100)} == {0, 1, 2, 3}
+
+    def test_load_dispatcher(self):
+        """Фабрика задается функцией или путем импорта"""
+        assert isinstance(load_dispatcher(create_dispatcher), Dispatcher)
+        assert isinstance(load_dispatcher("test_multiprocess:create_dispatcher"), Dispatcher)
+
+    @pytest.mark.asyncio
+    async def test_workers_process_and_restart(self, tmp_path, monkeypatch):
+        """Процессы обрабатывают обновления, упавший процесс перезапускается"""
+        monkeypatch.setenv(CRASH_MARKER_ENV, str(tmp_path / "crashed"))
+        runner = ShardedRunner(
+            "test_multiprocess:create_dispatcher",
+            token="TOKEN",
+            workers=2,
+            check_interval=0.1
+        )
+        async with runner.running(drain_timeout=10):
+            for update_id in range(1, 11):
+                await runner.feed(make_update(update_id, chat_id=update_id))
+            await runner.feed(make_update(11, chat_id=1, text="crash"))
+
+            await wait_for(lambda: runner.tracker.pending == 0)
+            assert runner.tracker.offset == 12
+            assert runner.restarts == 1
+            assert sum(runner.worker_stats()) >= 11
+
+        assert not any(process.is_alive() for process in runner._processes)
+
+    @pytest.mark.asyncio
+    async def test_stop_cancels_long_poll(self, monkeypatch):
+        """stop прерывает запрос getUpdates, не дожидаясь таймаута"""
+        requested = asyncio.Event()
+
+        class HangingClient:
+            def __init__(self, token):
+                pass
+
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc_info):
+                pass
+
+            async def get_updates(self, **kwargs):
+                requested.set()
+                await asyncio.sleep(3600)
+
+        monkeypatch.setattr("max_bot.core.multiprocess.MaxAPIClient", HangingClient)
+        runner = ShardedRunner("test_multiprocess:create_dispatcher", token="TOKEN", workers=1)
+        runner._running = True
+        poll = asyncio.create_task(runner._poll())
+        await asyncio.wait_for(requested.wait(), 1)
+        runner.stop()
+        await asyncio.wait_for(poll, 1)
+        assert runner.polling_stats.errors == 0
@@ -0,0 +1,175 @@
+"""
+Тесты для перезагрузки роутеров
+"""
+
+import asyncio
+import itertools
+import os
+import signal
+import sys
+import pytest
+from max_bot.core.dispatcher import Dispatcher
+from test_dispatcher import make_update
+
+
+HANDLERS = '''
+import asyncio
+from max_bot.core.router import Router
+from max_bot.filters.base import command
+from .texts import reply
+
+router = Router(name="greet")
+
+
+@router.message_handler(command("hi"))
+async def hi(message):
+    await asyncio.sleep({delay})
+    return reply("{version}")
+'''
+
+TEXTS = '''
+def reply(version):
+    return "{prefix}" + version
+'''
+
+_packages = itertools.count()
+
+
+class BotPackage:
+    """Пакет с обработчиками во временном каталоге"""
+
+    def __init__(self, tmp_path):
+        self.name = f"reload_bot_{next(_packages)}"
+        self.root = tmp_path / self.name
+        self.root.mkdir()
+        (self.root / "__init__.py").write_text("")
+        self.generation = 0
+        self.write("texts.py", TEXTS.format(prefix=""))
+        self.write("handlers.py", HANDLERS.format(version="v1", delay=0))
+
+    def write(self, filename: str, source: str):
+        """Запись модуля с новым временем изменения"""
+        path = self.root / filename
+        path.write_text(source)
+        self.generation += 1
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + self.generation * 10**9))
+
+    def cleanup(self):
+        for name in list(sys.modules):
+            if name == self.name or name.startswith(self.name + "."):
+                del sys.modules[name]
+
+
+@pytest.fixture
+def package(tmp_path, monkeypatch):
+    monkeypatch.syspath_prepend(str(tmp_path))
+    package = BotPackage(tmp_path)
+    yield package
+    package.cleanup()
+
+
+def make_dispatcher(package: BotPackage):
+    dp = Dispatcher(metrics=False)
+    dp.include_router(f"{package.name}.handlers:router")
+    dp.build_pipeline()
+    return dp, dp.enable_reload(interval=0, signal=None)
+
+
+class TestRouterReloader:
+    """Тесты для RouterReloader"""
+
+    @pytest.mark.asyncio
+    async def test_reload_changed_module(self, package):
+        """Новые обновления идут в перезагруженный роутер"""
+        dp, reloader = make_dispatcher(package)
+        assert await dp.process_update(make_update(1, text="/hi")) == "v1"
+        old_router = dp.router.children[0]
+        assert reloader.check() is False
+
+        package.write("handlers.py", HANDLERS.format(version="v2", delay=0))
+        assert reloader.changed_modules() == [f"{package.name}.handlers"]
+        assert reloader.check() is True
+        assert await dp.process_update(make_update(2, text="/hi")) == "v2"
+        assert dp.router.children[0] is not old_router
+        assert reloader.reloads == 1
+
+    @pytest.mark.asyncio
+    async def test_dependent_modules(self, package):
+        """Модули, импортирующие из измененного модуля, загружаются заново"""
+        dp, reloader = make_dispatcher(package)
+        package.write("texts.py", TEXTS.format(prefix="new "))
+        assert reloader.check() is True
+        assert await dp.process_update(make_update(1, text="/hi")) == "new v1"
+
+    @pytest.mark.asyncio
+    async def test_in_flight_update(self, package):
+        """Начатое обновление дорабатывает на прежнем дереве"""
+        package.write("handlers.py", HANDLERS.format(version="v1", delay=0.05))
+        dp, reloader = make_dispatcher(package)
+        in_flight = asyncio.create_task(dp.process_update(make_update(1, text="/hi")))
+        await asyncio.sleep(0.01)
+
+        package.write("handlers.py", HANDLERS.format(version="v2", delay=0))
+        assert reloader.check() is True
+        assert await dp.process_update(make_update(2, text="/hi")) == "v2"
+        assert await in_flight == "v1"
+
+    @pytest.mark.asyncio
+    async def test_rollback(self, package):
+        """Неудачная перезагрузка оставляет прежние модули и роутеры"""
+        dp, reloader = make_dispatcher(package)
+        module = sys.modules[f"{package.name}.handlers"]
+        router = dp.router.children[0]
+
+        package.write("handlers.py", "router = (")
+        assert reloader.check() is False
+        assert isinstance(reloader.last_error, SyntaxError)
+        assert sys.modules[f"{package.name}.handlers"] is module
+        assert dp.router.children[0] is router
+        assert await dp.process_update(make_update(1, text="/hi")) == "v1"
+        # Та же версия файла повторно не загружается
+        assert reloader.check() is False and reloader.failures == 1
+
+        package.write("handlers.py", "router = None")
+        assert reloader.check() is False
+        assert isinstance(reloader.last_error, TypeError)
+        assert dp.router.children[0] is router
+
+        package.write("handlers.py", HANDLERS.format(version="v3", delay=0))
+        assert reloader.check() is True
+        assert await dp.process_update(make_update(2, text="/hi")) == "v3"
+
+    @pytest.mark.asyncio
+    async def test_watch(self, package):
+        """Изменения подхватываются при опросе файлов"""
+        dp, reloader = make_dispatcher(package)
+        reloader.interval = 0.01
+        reloader.start()
+        try:
+            package.write("handlers.py", HANDLERS.format(version="v2", delay=0))
+            for _ in range(100):
+                if reloader.reloads:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await reloader.stop()
+        assert await dp.process_update(make_update(1, text="/hi")) == "v2"
+
+    @pytest.mark.asyncio
+    @pytest.mark.skipif(not hasattr(signal, "SIGHUP"), reason="SIGHUP is not available")
+    async def test_signal(self, package):
+        """Перезагрузка по сигналу"""
+        dp, reloader = make_dispatcher(package)
+        reloader.signal = signal.SIGHUP
+        reloader.start()
+        try:
+            package.write("handlers.py", HANDLERS.format(version="v2", delay=0))
+            os.kill(os.getpid(), signal.SIGHUP)
+            for _ in range(100):
+                if reloader.reloads:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await reloader.stop()
+        assert await dp.process_update(make_update(1, text="/hi")) == "v2"
@@ -0,0 +1,294 @@
+"""
+Тесты для роутера
+"""
+
+import pytest
+from max_bot.core.handler import Handler
+from max_bot.core.router import Router
+from max_bot.core.types import CallbackQuery, Update, User
+from max_bot.filters.base import BaseFilter, TextFilter, UserFilter, callback_data, command
+from max_bot.filters.callback_data import CallbackData
+from max_bot.middleware.base import BaseMiddleware
+from test_dispatcher import make_update
+
+
+def make_router() -> Router:
+    """Роутер с командами и обработчиками без индекса"""
+    router = Router()
+
+    @router.message_handler(command("start"))
+    async def start(message):
+        return "start"
+
+    @router.message_handler(TextFilter("/help"))
+    async def help_text(message):
+        return "help text"
+
+    @router.message_handler(command(["help", "h", "?"]))
+    async def help_command(message):
+        return "help"
+
+    @router.message_handler()
+    async def default(message):
+        return "default"
+
+    @router.message_handler(command("late"))
+    async def late(message):
+        return "late"
+
+    return router
+
+
+class TestCommandIndex:
+    """Тесты для индекса команд"""
+
+    @pytest.mark.asyncio
+    async def test_commands_resolve(self):
+        """Команды и их синонимы находят свой обработчик"""
+        router = make_router()
+        assert await router.handle(make_update(1, text="/start")) == "start"
+        assert await router.handle(make_update(1, text="  /h arg")) == "help"
+        assert await router.handle(make_update(1, text="/?")) == "help"
+        assert await router.handle(make_update(1, text="/unknown")) == "default"
+        assert await router.handle(make_update(1, text="hello")) == "default"
+        assert sorted(router._commands) == ["?", "h", "help", "late", "start"]
+
+    @pytest.mark.asyncio
+    async def test_registration_order(self):
+        """Обработчики без индекса сохраняют порядок регистрации"""
+        router = make_router()
+        # Обработчик текста зарегистрирован раньше команды help
+        assert await router.handle(make_update(1, text="/help")) == "help text"
+        # Обработчик по умолчанию зарегистрирован раньше команды late
+        assert await router.handle(make_update(1, text="/late")) == "default"
+
+    @pytest.mark.asyncio
+    async def test_index_rebuilt(self):
+        """Обработчики, добавленные после первого обновления, учитываются"""
+        router = Router()
+
+        @router.message_handler(command("a"))
+        async def a(message):
+            return "a"
+
+        assert await router.handle(make_update(1, text="/b")) is None
+
+        @router.message_handler(command("b"))
+        async def b(message):
+            return "b"
+
+        assert await router.handle(make_update(1, text="/b")) == "b"
+
+
+class TestUpdateBuckets:
+    """Тесты для таблиц обработчиков по типам обновлений"""
+
+    @pytest.mark.asyncio
+    async def test_handlers_by_type(self):
+        """Обновление проходит только через обработчики своего типа"""
+        router = Router()
+        checked = []
+
+        class RecordingFilter(BaseFilter):
+            def __init__(self, name):
+                self.name = name
+
+            async def check(self, update):
+                checked.append(self.name)
+                return True
+
+        @router.message_handler(RecordingFilter("message"))
+        async def on_message(message):
+            return "message"
+
+        @router.callback_query_handler(RecordingFilter("callback"))
+        async def on_callback(callback_query):
+            return callback_query.data
+
+        @router.edited_message_handler()
+        async def on_edit(message):
+            return f"edited {message.text}"
+
+        @router.channel_post_handler()
+        async def on_post(message):
+            return "post"
+
+        @router.edited_channel_post_handler()
+        async def on_post_edit(message):
+            return "post edited"
+
+        async def on_any(update):
+            return "any"
+
+        router.add_handler(Handler(on_any))
+
+        router.freeze()
+        assert router.frozen
+        assert isinstance(router._buckets["message"], tuple)
+
+        callback = Update(
+            update_id=1,
+            callback_query=CallbackQuery(id="1", from_user=User(id=1), data="menu")
+        )
+        assert await router.handle(callback) == "menu"
+        assert checked == ["callback"]
+
+        message = make_update(2, text="hi").message
+        assert await router.handle(Update(update_id=2, edited_message=message)) == "edited hi"
+        assert await router.handle(Update(update_id=3, channel_post=message)) == "post"
+        assert await router.handle(Update(update_id=4, edited_channel_post=message)) == "post edited"
+        assert await router.handle(Update(update_id=5)) == "any"
+        assert checked == ["callback"]
+
+        @router.message_handler()
+        async def late(message):
+            return "late"
+
+        assert not router.frozen
+        assert await router.handle(make_update(6)) == "message"
+
+
+def make_callback(update_id: int, data: str) -> Update:
+    """Создание обновления с нажатием кнопки"""
+    return Update(
+        update_id=update_id,
+        callback_query=CallbackQuery(id=str(update_id), from_user=User(id=1), data=data)
+    )
+
+
+class TestCallbackData:
+    """Тесты для данных кнопок и префиксного дерева"""
+
+    def test_pack_parse(self):
+        """Значения полей переживают упаковку и разбор"""
+        product_cb = CallbackData("product", action=str, id=int, gift=bool)
+        data = product_cb.new(action="buy", id=42, gift=True)
+        assert data == "product:buy:42:1"
+        value = product_cb.parse(data)
+        assert value == product_cb.model(action="buy", id=42, gift=True)
+        assert product_cb.parse("product:buy:x:1") is None
+        assert product_cb.parse("cart:buy:42:1") is None
+        assert product_cb.parse("product:buy") is None
+
+    def test_limits(self):
+        """Разделитель в значениях и слишком длинные данные запрещены"""
+        cb = CallbackData("p", max_length=16, name=str)
+        with pytest.raises(ValueError):
+            cb.new(name="a:b")
+        with pytest.raises(ValueError):
+            cb.new(name="x" * 20)
+        with pytest.raises(ValueError):
+            cb.filter(unknown=1)
+        with pytest.raises(TypeError):
+            CallbackData("p", items=list)
+
+    @pytest.mark.asyncio
+    async def test_trie_routing(self):
+        """Кнопка проверяет только обработчики своего префикса"""
+        router = Router()
+        product_cb = CallbackData("product", action=str, id=int)
+        checked = []
+
+        class RecordingFilter(BaseFilter):
+            async def check(self, update):
+                checked.append(update.callback_query.data)
+                return False
+
+        @router.callback_query_handler(RecordingFilter())
+        async def never(callback_query):
+            return "never"
+
+        for i in range(100):
+            @router.callback_query_handler(callback_data(f"menu:{i}"))
+            async def menu(callback_query):
+                return callback_query.data
+
+        @router.callback_query_handler(product_cb.filter(action="buy"))
+        async def buy(callback_query, callback_data):
+            return f"buy {callback_data.id}"
+
+        @router.callback_query_handler(product_cb.filter())
+        async def other(callback_query, callback_data):
+            return f"{callback_data.action} {callback_data.id}"
+
+        assert await router.handle(make_callback(1, product_cb.new(action="buy", id=7))) == "buy 7"
+        assert await router.handle(make_callback(2, "product:show:8")) == "show 8"
+        assert await router.handle(make_callback(3, "menu:42")) == "menu:42"
+        assert await router.handle(make_callback(4, "menu:100")) is None
+        assert await router.handle(make_callback(5, "unknown")) is None
+        assert checked == ["product:buy:7", "product:show:8", "menu:42", "menu:100", "unknown"]
+        assert len(router._buckets["callback_query"]) == 1
+
+
+class TestRouterTree:
+    """Тесты для дерева роутеров"""
+
+    @pytest.mark.asyncio
+    async def test_router_filters_and_middlewares(self):
+        """Фильтр роутера отсекает поддерево, middleware действуют только в нем"""
+        checked = []
+        wrapped = []
+
+        class RecordingFilter(BaseFilter):
+            async def check(self, update):
+                checked.append(update.update_id)
+                return True
+
+        class RecordingMiddleware(BaseMiddleware):
+            async def __call__(self, handler, update):
+                wrapped.append(update.update_id)
+                return await handler(update)
+
+        root = Router("root")
+        admin = Router("admin", filters=UserFilter(1))
+        admin.add_middleware(RecordingMiddleware())
+        users = Router("users")
+        root.include_router(admin)
+        root.include_router(users)
+
+        @admin.message_handler(RecordingFilter())
+        async def admin_only(message):
+            return "admin"
+
+        @users.message_handler()
+        async def everyone(message):
+            return "user"
+
+        @users.message_handler()
+        async def unreachable(message):
+            return "unreachable"
+
+        assert await root.handle(make_update(1, chat_id=2)) == "user"
+        assert checked == [] and wrapped == []
+        assert await root.handle(make_update(2, chat_id=1)) == "admin"
+        assert checked == [2] and wrapped == [2]
+        assert len(root) == 3
+        assert [r.name for r in root.iter_routers()] == ["root", "admin", "users"]
+
+    @pytest.mark.asyncio
+    async def test_nested_order(self):
+        """Обработчики роутера проверяются раньше дочерних роутеров"""
+        root, child, grandchild = Router(), Router(), Router()
+        child.include_router(grandchild)
+        root.include_router(child)
+
+        @grandchild.message_handler(command("deep"))
+        async def deep(message):
+            return "deep"
+
+        @root.message_handler(command("top"))
+        async def top(message):
+            return "top"
+
+        assert await root.handle(make_update(1, text="/deep")) == "deep"
+        assert await root.handle(make_update(1, text="/top")) == "top"
+        assert await root.handle(make_update(1, text="/none")) is None
+
+    def test_cycles_rejected(self):
+        """Роутер нельзя включить в его собственное поддерево"""
+        root, child = Router(), Router()
+        root.include_router(child)
+        with pytest.raises(ValueError):
+            child.include_router(root)
+        with pytest.raises(ValueError):
+            root.include_router(root)
@@ -0,0 +1,119 @@
+"""
+Тесты для трассировки
+"""
+
+import json
+import pytest
+from max_bot.core.dispatcher import Dispatcher
+from max_bot.filters.base import TextFilter
+from max_bot.middleware.base import BaseMiddleware
+from max_bot.tracing.exporters import JSONLinesExporter, OTLPJSONExporter, RingBufferExporter
+from max_bot.tracing.tracer import NOOP_SPAN, Tracer, current_trace_id, span
+from test_dispatcher import make_update
+
+
+class PassMiddleware(BaseMiddleware):
+    """Middleware без собственной работы"""
+
+    async def __call__(self, handler, update):
+        return await handler(update)
+
+
+def make_dispatcher(tracer: Tracer) -> Dispatcher:
+    """Диспетчер с middleware, фильтром и обработчиком"""
+    dp = Dispatcher(tracer=tracer, metrics=False)
+    dp.add_middleware(PassMiddleware())
+    seen = []
+
+    @dp.message_handler(TextFilter(["hello", "fail"]))
+    async def greet(message, trace_id=None):
+        seen.append((trace_id, current_trace_id()))
+        with span("db query"):
+            pass
+        if message.text == "fail":
+            raise RuntimeError("boom")
+        return True
+
+    dp.seen = seen
+    return dp
+
+
+class TestTracing:
+    """Тесты для трассировки обновлений"""
+
+    @pytest.mark.asyncio
+    async def test_spans(self):
+        """Отрезки образуют дерево одной трассы"""
+        exporter = RingBufferExporter()
+        dp = make_dispatcher(Tracer([exporter]))
+
+        assert await dp.process_update(make_update(1, text="hello"))
+        spans = {s.name: s for s in exporter.spans}
+        assert set(spans) == {
+            "update", "middleware PassMiddleware", "filter TextFilter",
+            f"handler {dp.router.handlers[0].name}", "db query",
+        }
+        root = spans["update"]
+        assert root.parent_id is None
+        assert len({s.trace_id for s in spans.values()}) == 1
+        assert spans["middleware PassMiddleware"].parent_id == root.span_id
+        assert spans["filter TextFilter"].attributes["passed"] is True
+        assert spans["db query"].parent_id == spans[f"handler {dp.router.handlers[0].name}"].span_id
+        assert dp.seen == [(root.trace_id, root.trace_id)]
+        assert exporter.trace(root.trace_id)[0] is root
+
+    @pytest.mark.asyncio
+    async def test_errors_and_sampling(self):
+        """Ошибка записывается в отрезок, вне выборки отрезков нет"""
+        exporter = RingBufferExporter()
+        dp = make_dispatcher(Tracer([exporter]))
+        with pytest.raises(RuntimeError):
+            await dp.process_update(make_update(1, text="fail"))
+        assert exporter.slowest(1)[0].error == "RuntimeError: boom"
+
+        exporter = RingBufferExporter()
+        dp = make_dispatcher(Tracer([exporter], sample_rate=0))
+        assert await dp.process_update(make_update(1, text="hello"))
+        assert not exporter.spans
+        assert dp.seen == [(None, None)]
+        assert span("outside") is NOOP_SPAN
+
+    @pytest.mark.asyncio
+    async def test_file_exporters(self, tmp_path):
+        """Отрезки пишутся в JSON lines и OTLP/JSON"""
+        jsonl = JSONLinesExporter(str(tmp_path / "spans.jsonl"))
+        otlp = OTLPJSONExporter(str(tmp_path / "spans.otlp.jsonl"))
+        tracer = Tracer([jsonl, otlp], service_name="shop")
+        dp = make_dispatcher(tracer)
+        await dp.process_update(make_update(1, text="hello"))
+        await dp.process_update(make_update(2, text="bye"))
+        tracer.close()
+
+        lines = (tmp_path / "spans.jsonl").read_text().splitlines()
+        records = [json.loads(line) for line in lines]
+        assert {r["service"] for r in records} == {"shop"}
+        assert any(r["name"] == "update" and r["attributes"]["update_id"] == 2 for r in records)
+
+        requests = [json.loads(line) for line in (tmp_path / "spans.otlp.jsonl").read_text().splitlines()]
+        assert len(requests) == 2
+        resource_spans = requests[0]["resourceSpans"][0]
+        assert resource_spans["resource"]["attributes"][0]["value"] == {"stringValue": "shop"}
+        otlp_spans = resource_spans["scopeSpans"][0]["spans"]
+        assert len(otlp_spans) == 5
+        assert all(len(s["traceId"]) == 32 and len(s["spanId"]) == 16 for s in otlp_spans)
+
+    def test_file_exporter_buffers_writes(self, tmp_path):
+        """Запись в файл идет в отдельном потоке и сбрасывается пачками"""
+        path = tmp_path / "spans.jsonl"
+        exporter = JSONLinesExporter(str(path), flush_interval=60)
+        tracer = Tracer([exporter])
+        root = tracer.start_trace(make_update(1))
+        with root:
+            pass
+        tracer.finish_trace(root)
+        assert path.read_text() == ""
+
+        exporter.flush(timeout=5)
+        assert len(path.read_text().splitlines()) == 1
+        exporter.close()
+        exporter.close()
@@ -0,0 +1,70 @@
+"""
+Тесты для webhook сервера
+"""
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+from max_bot.core.dispatcher import Dispatcher
+from max_bot.webhook.server import WebhookServer, SECRET_HEADER
+
+
+def make_payload(update_id: int, chat_id: int = 1, text: str = "test") -> dict:
+    """Данные обновления в формате API"""
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 1700000000,
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id},
+            "text": text,
+        },
+    }
+
+
+class TestWebhookServer:
+    """Тесты для webhook сервера"""
+
+    @pytest.mark.asyncio
+    async def test_updates_are_processed(self):
+        """Принятые обновления попадают в обработчики"""
+        dp = Dispatcher()
+        processed = []
+
+        @dp.message_handler()
+        async def handler(message):
+            processed.append(message.text)
+            return True
+
+        server = WebhookServer(dp, secret="s3cret")
+        server.start_processing()
+        async with TestClient(TestServer(server.create_app())) as client:
+            response = await client.post(
+                "/webhook", json=make_payload(1, text="hi"), headers={SECRET_HEADER: "s3cret"}
+            )
+            assert response.status == 200
+
+            response = await client.post("/webhook", json=make_payload(2))
+            assert response.status == 403
+
+            response = await client.post(
+                "/webhook", data="not json", headers={SECRET_HEADER: "s3cret"}
+            )
+            assert response.status == 400
+
+            await server.stop_processing()
+
+        assert processed == ["hi"]
+
+    @pytest.mark.asyncio
+    async def test_backpressure(self):
+        """Переполненная очередь и остановка отклоняют запросы"""
+        server = WebhookServer(Dispatcher(), queue_size=1)
+        server._accepting = True
+        async with TestClient(TestServer(server.create_app())) as client:
+            assert (await client.post("/webhook", json=make_payload(1))).status == 200
+            assert (await client.post("/webhook", json=make_payload(2))).status == 429
+
+            server._accepting = False
+            assert (await client.post("/webhook", json=make_payload(3))).status == 503
+        assert server.rejected == 2